@@ -2,28 +2,31 @@
 Flask 애플리케이션 메인 파일 - 단일 URL 구조 버전 (스트리밍 우선)
 """
 import atexit
+import gc
 import logging
 import re
 import uuid
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from urllib.parse import quote, urlparse
 
 import psutil
 import requests
-from flask import Flask, render_template, request, send_file, send_from_directory, url_for, redirect, abort, Response, jsonify
+from flask import Flask, render_template, request, send_from_directory, url_for, redirect, abort, Response, jsonify
 from flask_limiter import Limiter
 from flask_limiter.errors import RateLimitExceeded
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-from infrastructure import redis_client
+from infrastructure import redis_client, http_pool, metadata_cache, codec
 # 분리된 모듈들 import
 from config import *  # noqa: F403
-from services.download_manager import download_video
+from services import disk_admission, job_queue, range_cache, scheduler, stream_refresher, ydl_pool
+from services.edge_tokens import issue_proxy_url, events_url
 from services.stats import load_download_stats, update_download_stats
-from services.status_manager import update_status, get_status, start_cleanup_thread
-from utils.general import safe_path_join, safely_access_files, generate_error_id, check_ip_allowed, readable_size
-from utils.web import get_client_ip, add_cache_headers
+from services.status_manager import update_status, get_status, start_cleanup_thread, find_completed_result, \
+    track_folder, PROGRESS_FIELDS, SERVER_DOWNLOAD_FIELDS
+from utils.general import safe_path_join, safely_access_files, generate_error_id, check_ip_allowed, readable_size, \
+    attachment_disposition
+from utils.web import get_client_ip, add_cache_headers, send_server_file
 
 # Flask 앱 초기화
 app = Flask(__name__)
@@ -33,9 +36,6 @@ app.wsgi_app = ProxyFix(
     x_for=1, x_proto=1, x_host=1, x_port=1
 )
 
-# 전역 변수
-executor = None
-
 # 로깅 설정
 logging.basicConfig(
     filename='logs/app.log',
@@ -93,11 +93,18 @@ def download():
         return render_template('index.html', error='Please enter a URL.')
 
     try:
+        # 같은 URL의 유효한 완료 결과가 있으면 작업 없이 결과 페이지로
+        existing_id = find_completed_result(video_url, MAX_VIDEO_HEIGHT)
+        if existing_id:
+            logging.info(f"완료된 결과 재사용: {existing_id} (URL: {video_url[:60]})")
+            return redirect(url_for('result', file_id=existing_id))
+
         file_id = str(uuid.uuid4())
         download_path = safe_path_join(DOWNLOAD_FOLDER, file_id)
 
         if not os.path.exists(download_path):
             os.makedirs(download_path)
+        track_folder(file_id)
 
         # 초기 상태 먼저 설정 (레이스 컨디션 방지)
         update_status(file_id, {
@@ -107,10 +114,13 @@ def download():
             'timestamp': datetime.now().timestamp()
         })
 
-        executor.submit(download_video, video_url, file_id, download_path, update_status)
+        job_queue.submit('extract', get_client_ip(), file_id, 'download_video', url=video_url, download_path=download_path)
         update_download_stats('started')
         return redirect(url_for('download_waiting', file_id=file_id))
 
+    except scheduler.QueueFullError as e:
+        update_status(file_id, {'status': 'error', 'error': str(e)})
+        return render_template('index.html', error=str(e)), e.status_code
     except Exception as e:
         logging.error(f"예상치 못한 오류 (URL: {video_url}): {str(e)}", exc_info=True)
         return render_template('index.html', error=f'An error occurred during download: {str(e)}')
@@ -123,11 +133,12 @@ def download_waiting(file_id):
         logging.warning(f"유효하지 않은 file_id 접근 시도: {file_id}")
         return redirect(url_for('index'))
 
-    status = get_status(file_id)
+    status = get_status(file_id, fields=PROGRESS_FIELDS)
     if status['status'] == 'completed':
         return redirect(url_for('result', file_id=file_id))
 
-    return render_template('download_waiting.html', file_id=file_id, status=status)
+    return render_template('download_waiting.html', file_id=file_id, status=status,
+                           status_events_url=events_url(file_id))
 
 
 @app.route('/check-status/<file_id>')
@@ -137,7 +148,7 @@ def check_status(file_id):
         logging.warning(f"유효하지 않은 file_id 상태 확인 시도: {file_id}")
         return {'status': 'error', 'error': 'Invalid file ID'}
 
-    status = get_status(file_id)
+    status = get_status(file_id, fields=PROGRESS_FIELDS)
     if status.get('status') == 'completed':
         return {
             'status': 'completed',
@@ -162,6 +173,7 @@ def result(file_id):
     # 스트리밍 정보가 있는 경우 (우선순위 1)
     if status.get('streaming_info'):
         streaming_info = status.get('streaming_info')
+        stream_refresher.touch(file_id)
         return render_template('download_result.html',
                               title=status.get('title', 'Unknown Title'),
                               file_id=file_id,
@@ -246,41 +258,92 @@ def has_ip_parameter(url):
         return False
 
 
-def proxy_stream_video(url, force_download=False, filename=None):
+def _proxy_from_range_cache(entry, url, headers):
+    """구간 캐시 항목으로 Range 응답 — 다중 구간 요청이면 None (원본 프록시로 처리)"""
+    byte_range = request.range
+    if byte_range is None:
+        start, end, status_code = 0, entry.size, 200
+    elif len(byte_range.ranges) != 1:
+        return None
+    else:
+        span = byte_range.range_for_length(entry.size)
+        if span is None:
+            response = Response(status=416)
+            response.headers['Content-Range'] = f"bytes */{entry.size}"
+            return response
+        (start, end), status_code = span, 206
+
+    def generate():
+        try:
+            yield from entry.stream(start, end, url, headers)
+        except Exception as e:
+            logging.error(f"구간 캐시 중계 중 오류: {str(e)}")
+
+    flask_response = Response(generate(), status=status_code, mimetype='video/mp4')
+    flask_response.headers['Content-Length'] = str(end - start)
+    flask_response.headers['Accept-Ranges'] = 'bytes'
+    if status_code == 206:
+        flask_response.headers['Content-Range'] = f"bytes {start}-{end - 1}/{entry.size}"
+    return flask_response
+
+
+def proxy_stream_video(url, force_download=False, filename=None, cache_key=None):
     """스트리밍 URL을 프록시로 제공
 
     Args:
         url: 스트리밍 URL
         force_download: True면 Content-Disposition: attachment 헤더 추가 (다운로드 강제)
         filename: 다운로드 시 파일명 (없으면 기본값 사용)
+        cache_key: 구간 캐시 키 (range_cache.cache_key) — 있으면 중계한 바이트를 저장하고 이후 요청에 재사용
     """
+    # 엣지 서버가 켜져 있으면 이벤트 루프 프록시로 넘겨 HTTP 스레드를 점유하지 않음
+    edge_url = issue_proxy_url(url, force_download=force_download, filename=filename)
+    if edge_url:
+        return redirect(edge_url)
+
     try:
-        # Range 헤더 처리를 위한 요청 헤더 설정
-        headers = {}
+        # User-Agent 설정
+        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+
+        # 이미 캐시 항목(전체 크기)을 알면 있는 블록은 디스크에서, 빈 구간만 원본에서
+        entry = range_cache.open_entry(cache_key)
+        if entry is not None:
+            flask_response = _proxy_from_range_cache(entry, url, headers)
+            if flask_response is not None:
+                if force_download:
+                    flask_response.headers['Content-Disposition'] = attachment_disposition(filename if filename else 'video.mp4')
+                return flask_response
 
         # 클라이언트의 Range 헤더가 있으면 전달
         if 'Range' in request.headers:
             headers['Range'] = request.headers['Range']
 
-        # User-Agent 설정
-        headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-
-        # 원본 URL에서 스트리밍 데이터 요청
-        response = requests.get(url, headers=headers, stream=True, timeout=30)
+        # 원본 URL에서 스트리밍 데이터 요청 (호스트별 keep-alive 연결 재사용)
+        response = http_pool.get_session(url).get(url, headers=headers, stream=True, timeout=30)
 
         # 응답 상태 코드 확인 - 4xx, 5xx 에러 시 조기 반환
         if response.status_code >= 400:
+            response.close()
             logging.error(f"프록시 대상 URL에서 에러 응답: {response.status_code}, URL: {url[:100]}...")
             return render_error(f"Video source returned error ({response.status_code}). Please try again.")
 
+        # 첫 요청은 응답 헤더로 전체 크기를 알아낸 뒤 중계하면서 캐시에 기록
+        entry, offset = range_cache.entry_for_response(cache_key, response)
+        chunks = response.iter_content(chunk_size=1048576)
+        if entry is not None:
+            chunks = entry.tee(chunks, offset)
+
         # 응답 헤더 설정
         def generate():
             try:
-                for chunk in response.iter_content(chunk_size=1048576):
+                for chunk in chunks:
                     if chunk:
                         yield chunk
             except Exception as e:
                 logging.error(f"스트리밍 중 청크 읽기 오류: {str(e)}")
+            finally:
+                chunks.close()
+                response.close()
 
         # Flask Response 객체 생성
         flask_response = Response(generate(), mimetype='video/mp4')
@@ -297,11 +360,7 @@ def proxy_stream_video(url, force_download=False, filename=None):
 
         # 다운로드 강제 모드: Content-Disposition: attachment 헤더 추가
         if force_download:
-            safe_filename = filename if filename else 'video.mp4'
-            # ASCII 안전한 파일명 (fallback용)
-            ascii_filename = re.sub(r'[^\x00-\x7F]', '_', safe_filename)
-            encoded_filename = quote(safe_filename)
-            flask_response.headers['Content-Disposition'] = f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{encoded_filename}"
+            flask_response.headers['Content-Disposition'] = attachment_disposition(filename if filename else 'video.mp4')
 
         flask_response.status_code = response.status_code
 
@@ -326,7 +385,7 @@ def stream_video(file_id):
             return render_error("Invalid file ID.")
 
         # 상태 확인
-        status = get_status(file_id)
+        status = get_status(file_id, fields=('status', 'url', 'streaming_info'))
         if not status or status.get('status') != 'completed':
             return render_error("Download not completed.")
 
@@ -334,12 +393,14 @@ def stream_video(file_id):
         streaming_info = status.get('streaming_info')
         if not streaming_info or not streaming_info.get('best_url'):
             return render_error("Streaming URL not found.")
+        stream_refresher.touch(file_id)
 
         # 요청된 품질 파라미터 확인
         quality = request.args.get('quality', 'best')
 
         # 적절한 스트리밍 URL 선택
         selected_url = streaming_info.get('best_url')
+        format_id = streaming_info.get('best_format_id')
 
         if quality != 'best':
             try:
@@ -347,6 +408,7 @@ def stream_video(file_id):
                 for stream in streaming_info.get('streaming_urls', []):
                     if stream.get('quality') == quality_num:
                         selected_url = stream.get('url')
+                        format_id = stream.get('format_id')
                         break
             except ValueError:
                 pass
@@ -357,7 +419,7 @@ def stream_video(file_id):
         # 스트리밍 모드 확인 및 IP 파라미터 검사
         if IP_HIDE_MODE and has_ip_parameter(selected_url):
             logging.info(f"스트리밍 모드 활성화 - IP 파라미터 감지, 프록시로 제공: {file_id}")
-            return proxy_stream_video(selected_url)
+            return proxy_stream_video(selected_url, cache_key=range_cache.cache_key(status.get('url'), format_id))
         else:
             # 기존 방식: 직접 리다이렉트
             logging.info(f"스트리밍 리다이렉트: {file_id} -> {selected_url}")
@@ -368,46 +430,6 @@ def stream_video(file_id):
         return render_error("An error occurred during streaming")
 
 
-def do_server_download(file_id, video_url, download_path, quality='best'):
-    """서버 다운로드 실행 (백그라운드 태스크)"""
-    from services.download_utils import try_download_enhanced
-
-    try:
-        # 다운로드 시작 상태 업데이트
-        update_status(file_id, {'server_download_status': 'downloading', 'server_download_progress': 0})
-
-        logging.info(f"서버 다운로드 시작: {file_id}, URL: {video_url[:50]}...")
-
-        # 실제 다운로드 실행
-        success = try_download_enhanced(video_url, download_path, use_cookies=True)
-
-        if success:
-            # 다운로드된 파일 확인
-            files = safely_access_files(download_path)
-            if files:
-                file_name = files[0]
-                file_path = safe_path_join(download_path, file_name)
-                if os.path.isfile(file_path):
-                    file_size = os.path.getsize(file_path)
-                    logging.info(f"서버 다운로드 성공: {file_name} ({readable_size(file_size)})")
-
-                    update_status(file_id, {
-                        'server_download_status': 'completed',
-                        'server_download_progress': 100,
-                        'server_file_name': file_name,
-                        'server_file_size': readable_size(file_size)
-                    })
-                    return
-
-        # 다운로드 실패
-        logging.error(f"서버 다운로드 실패: {file_id}")
-        update_status(file_id, {'server_download_status': 'failed', 'server_download_error': 'Download failed'})
-
-    except Exception as e:
-        logging.error(f"서버 다운로드 오류: {file_id} - {str(e)}", exc_info=True)
-        update_status(file_id, {'server_download_status': 'failed', 'server_download_error': str(e)})
-
-
 @app.route('/api/start-server-download/<file_id>', methods=['POST'])
 def api_start_server_download(file_id):
     """서버 다운로드 시작 API"""
@@ -416,14 +438,15 @@ def api_start_server_download(file_id):
         if not check_valid_file_id(file_id):
             return jsonify({'success': False, 'error': 'Invalid file ID'}), 400
 
-        status = get_status(file_id)
+        status = get_status(file_id, fields=('status', 'url', 'server_download_status', 'server_file_name',
+                                             'is_direct_link', 'direct_url'))
         if not status or status.get('status') != 'completed':
             return jsonify({'success': False, 'error': 'Video info not found'}), 400
 
         # 이미 다운로드 중이거나 완료된 경우
         server_status = status.get('server_download_status')
-        if server_status == 'downloading':
-            return jsonify({'success': True, 'status': 'downloading', 'message': 'Download already in progress'})
+        if server_status in ('queued', 'downloading'):
+            return jsonify({'success': True, 'status': server_status, 'message': 'Download already in progress'})
         if server_status == 'completed' and status.get('server_file_name'):
             return jsonify({'success': True, 'status': 'completed', 'message': 'File already downloaded'})
 
@@ -435,12 +458,20 @@ def api_start_server_download(file_id):
         # 다운로드 경로 설정
         download_path = safe_path_join(DOWNLOAD_FOLDER, file_id)
         os.makedirs(download_path, exist_ok=True)
+        track_folder(file_id)
 
         # 백그라운드에서 다운로드 시작
         quality = request.args.get('quality', 'best')
-        executor.submit(do_server_download, file_id, video_url, download_path, quality)
+        update_status(file_id, {'server_download_status': 'queued', 'server_download_progress': 0})
+        try:
+            job_queue.submit('server', get_client_ip(), file_id, 'server_download',
+                             url=video_url, download_path=download_path, quality=quality,
+                             direct_url=status.get('direct_url') if status.get('is_direct_link') else None)
+        except scheduler.QueueFullError as e:
+            update_status(file_id, {'server_download_status': 'not_started'})
+            return jsonify({'success': False, 'error': str(e)}), e.status_code
 
-        return jsonify({'success': True, 'status': 'started', 'message': 'Download started'})
+        return jsonify({'success': True, 'status': 'queued', 'message': 'Download queued'})
 
     except Exception as e:
         logging.error(f"서버 다운로드 시작 오류: {str(e)}", exc_info=True)
@@ -455,7 +486,7 @@ def api_download_status(file_id):
         if not check_valid_file_id(file_id):
             return jsonify({'success': False, 'error': 'Invalid file ID'}), 400
 
-        status = get_status(file_id)
+        status = get_status(file_id, fields=SERVER_DOWNLOAD_FIELDS)
         if not status:
             return jsonify({'success': False, 'error': 'Status not found'}), 404
 
@@ -467,6 +498,12 @@ def api_download_status(file_id):
             'progress': status.get('server_download_progress', 0),
         }
 
+        if server_status == 'queued':
+            response['queue_position'] = status.get('server_download_queue_position')
+        elif server_status == 'downloading':
+            response['speed'] = status.get('server_download_speed')
+            response['eta'] = status.get('server_download_eta')
+
         if server_status == 'completed':
             response['file_name'] = status.get('server_file_name')
             response['file_size'] = status.get('server_file_size')
@@ -488,7 +525,7 @@ def serve_server_file(file_id):
         if not check_valid_file_id(file_id):
             return render_error("Invalid file ID.")
 
-        status = get_status(file_id)
+        status = get_status(file_id, fields=('server_download_status', 'server_file_name', 'title'))
         if not status or status.get('server_download_status') != 'completed':
             return render_error("File is not ready.")
 
@@ -512,10 +549,9 @@ def serve_server_file(file_id):
         ascii_filename = re.sub(r'[^\x00-\x7F]', '_', download_filename)
         encoded_filename = quote(download_filename)
 
-        response = send_file(file_path, as_attachment=True, mimetype='video/mp4')
-        response.headers["Content-Disposition"] = f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{encoded_filename}"
-
-        return response
+        track_folder(file_id)  # 제공 중인 파일은 정리 시각을 뒤로 미룸
+        disposition = f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{encoded_filename}"
+        return send_server_file(file_path, disposition)
 
     except Exception as e:
         logging.error(f"파일 제공 오류: {str(e)}", exc_info=True)
@@ -536,7 +572,7 @@ def download_prepare(file_id):
             return render_error("Invalid file ID.")
 
         # 상태 확인
-        status = get_status(file_id)
+        status = get_status(file_id, fields=('status', 'title', 'thumbnail', 'server_download_status', 'server_file_name'))
         if not status or status.get('status') != 'completed':
             return render_error("Download not completed.")
 
@@ -553,7 +589,8 @@ def download_prepare(file_id):
                                file_id=file_id,
                                quality=quality,
                                server_status=server_status,
-                               server_file_ready=server_file_ready)
+                               server_file_ready=server_file_ready,
+                               status_events_url=events_url(file_id))
 
     except Exception as e:
         logging.error(f"다운로드 준비 중 오류: {str(e)}", exc_info=True)
@@ -582,7 +619,7 @@ def download_file(file_id):
             return render_error("Invalid file ID.")
 
         # 상태 확인
-        status = get_status(file_id)
+        status = get_status(file_id, fields=('status', 'title', 'url', 'streaming_info', 'is_direct_link', 'direct_url'))
         if not status or status.get('status') != 'completed':
             return render_error("Download not completed.")
 
@@ -595,9 +632,12 @@ def download_file(file_id):
         safe_title = re.sub(r'[<>:"/\\|?*]', '', title)[:100]
         download_filename = f"{safe_title}.mp4"
 
-        # 스트리밍 정보가 있는 경우 처리
+        # 스트리밍 정보가 있는 경우 처리 (만료된 경우에만 요청 안에서 갱신 — 평소에는 백그라운드 갱신)
         streaming_info = status.get('streaming_info')
         if streaming_info:
+            stream_refresher.touch(file_id)
+            if stream_refresher.is_expired(streaming_info) and stream_refresher.refresh(file_id):
+                streaming_info = get_status(file_id, fields=('streaming_info',)).get('streaming_info') or streaming_info
             # 특정 품질이 요청된 경우
             if quality != 'best' and streaming_info.get('streaming_urls'):
                 try:
@@ -609,6 +649,7 @@ def download_file(file_id):
                     for stream in streaming_info.get('streaming_urls', []):
                         if stream.get('quality') == quality_num and stream.get('url'):
                             matching_url = stream.get('url')
+                            cache_key = range_cache.cache_key(status.get('url'), stream.get('format_id'))
                             logging.info(f"매칭된 품질 URL 발견: {quality_num}p")
                             break
 
@@ -617,7 +658,8 @@ def download_file(file_id):
                         # 프록시 모드이거나 IP 파라미터가 있으면 프록시로 제공
                         if force_proxy or (IP_HIDE_MODE and has_ip_parameter(matching_url)):
                             logging.info(f"다운로드 - 프록시로 제공: {quality_num}p (force_proxy={force_proxy})")
-                            return proxy_stream_video(matching_url, force_download=force_proxy, filename=download_filename)
+                            return proxy_stream_video(matching_url, force_download=force_proxy, filename=download_filename,
+                                                      cache_key=cache_key)
                         else:
                             logging.info(f"선택된 품질({quality_num}p)로 리다이렉트: {matching_url[:50]}...")
                             return redirect(matching_url)
@@ -634,7 +676,9 @@ def download_file(file_id):
                 # 프록시 모드이거나 IP 파라미터가 있으면 프록시로 제공
                 if force_proxy or (IP_HIDE_MODE and has_ip_parameter(best_url)):
                     logging.info(f"다운로드 - 프록시로 제공: best({best_quality}p) (force_proxy={force_proxy})")
-                    return proxy_stream_video(best_url, force_download=force_proxy, filename=download_filename)
+                    cache_key = range_cache.cache_key(status.get('url'), streaming_info.get('best_format_id'))
+                    return proxy_stream_video(best_url, force_download=force_proxy, filename=download_filename,
+                                              cache_key=cache_key)
                 else:
                     logging.info(f"최고 품질({best_quality}p)로 리다이렉트")
                     return redirect(best_url)
@@ -646,7 +690,8 @@ def download_file(file_id):
             # 프록시 모드이거나 IP 파라미터가 있으면 프록시로 제공
             if force_proxy or (IP_HIDE_MODE and has_ip_parameter(direct_url)):
                 logging.info(f"다운로드 - 직접 링크 프록시로 제공 (force_proxy={force_proxy})")
-                return proxy_stream_video(direct_url, force_download=force_proxy, filename=download_filename)
+                return proxy_stream_video(direct_url, force_download=force_proxy, filename=download_filename,
+                                          cache_key=range_cache.cache_key(status.get('url'), 'direct'))
             else:
                 logging.info(f"직접 다운로드 링크로 리다이렉트: {direct_url[:50]}...")
                 return redirect(direct_url)
@@ -663,10 +708,10 @@ def download_file(file_id):
                     file_size = os.path.getsize(file_path)
                     logging.info(f"서버 파일 제공: {filename} ({readable_size(file_size)})")
                     safe_filename = f"download-{file_id}.mp4"
-                    response = send_file(file_path, as_attachment=True, mimetype='video/mp4')
+                    track_folder(file_id)
                     encoded_filename = quote(filename)
-                    response.headers["Content-Disposition"] = f"attachment; filename=\"{safe_filename}\"; filename*=UTF-8''{encoded_filename}"
-                    return response
+                    disposition = f"attachment; filename=\"{safe_filename}\"; filename*=UTF-8''{encoded_filename}"
+                    return send_server_file(file_path, disposition)
 
         # 실시간으로 스트리밍 URL 추출 재시도
         original_url = status.get('url', '')
@@ -742,6 +787,14 @@ def health_check():
             "timestamp": datetime.now().isoformat(),
             "version": os.getenv('APP_VERSION', '1.0.0'),
             "redis": "ok" if redis_ok else "unavailable",
+            "http_pool": http_pool.stats(),
+            "metadata_l1": metadata_cache.l1_stats(),
+            "redis_codec": codec.stats(),
+            "job_queue": job_queue.stats(),
+            "disk": disk_admission.stats(),
+            "range_cache": range_cache.stats(),
+            "ydl_pool": ydl_pool.stats(),
+            "file_offload": FILE_OFFLOAD_MODE,
             "downloads": {
                 "total": stats.get('total', 0),
                 "completed": stats.get('completed', 0),
@@ -795,16 +848,14 @@ def cleanup_on_exit():
 
     gunicorn --graceful-timeout 시간 내에 끝나지 않으면 SIGKILL로 강제 종료됨.
     """
-    if executor:
-        logging.info("graceful shutdown: 진행 중 다운로드 완료 대기...")
-        executor.shutdown(wait=True, cancel_futures=True)
+    logging.info("graceful shutdown: 진행 중 다운로드 완료 대기...")
+    scheduler.shutdown(wait=True, cancel_futures=True)
+    http_pool.close_all()
     logging.info("애플리케이션 종료: 리소스 정리 완료")
 
 
 def init_app():
     """애플리케이션 초기화"""
-    global executor
-
     # 멀티워커 시 워커당 다운로드 스레드 수를 분배
     gunicorn_workers = int(os.environ.get('GUNICORN_WORKERS', 1))
     effective_max_workers = max(1, MAX_WORKERS // gunicorn_workers)
@@ -813,7 +864,11 @@ def init_app():
             f"MAX_WORKERS={MAX_WORKERS}을 {gunicorn_workers}워커에 분배: "
             f"워커당 {effective_max_workers}개 (총 {effective_max_workers * gunicorn_workers}개)"
         )
-    executor = ThreadPoolExecutor(max_workers=effective_max_workers)
+    scheduler.start(
+        {'extract': effective_max_workers, 'server': max(1, SERVER_DOWNLOAD_WORKERS // gunicorn_workers)},
+        queue_limit=JOB_QUEUE_LIMIT,
+        per_client_limit=JOB_QUEUE_PER_CLIENT,
+    )
 
     # Redis 헬스체크
     redis_ok = redis_client.check_health()
@@ -855,12 +910,41 @@ def init_app():
     # 상태 정리 스레드 시작
     start_cleanup_thread()
 
+    # 스트리밍 URL 갱신 스레드 시작
+    stream_refresher.start_refresh_thread()
+
     # 종료 시 정리 등록
     atexit.register(cleanup_on_exit)
 
 
-# 앱 초기화
-init_app()
+def warm_preload():
+    """gunicorn preload 마스터에서 fork 전 1회 — yt-dlp 추출기 목록을 올리고 gc.freeze로 공유 페이지 고정
+
+    추출기 모듈은 첫 YoutubeDL 생성 때 import되므로 마스터에서 한 번 만들어 두면 워커가 fork로 공유한다.
+    gc.freeze 후 객체는 워커의 GC 대상에서 빠져 참조 카운트 외에는 공유 페이지를 복사하지 않는다.
+    """
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}):
+        pass
+    gc.collect()
+    gc.freeze()
+    logging.info(f"preload 완료: 공유 객체 {gc.get_freeze_count()}개 고정")
+
+
+def init_worker():
+    """gunicorn preload 워커 초기화 (post_fork) — fork 이후에 만들어야 하는 자원 생성
+
+    마스터의 Redis/HTTP 연결 풀은 버리고, 스케줄러/정리/갱신 스레드는 워커마다 init_app에서 시작한다.
+    """
+    redis_client.reset_after_fork()
+    http_pool.reset_after_fork()
+    init_app()
+
+
+# 앱 초기화 — preload 모드에서는 마스터가 import만 하고 워커가 fork 후 init_worker 호출
+if not APP_PRELOAD:
+    init_app()
 
 if __name__ == '__main__':
     host = os.getenv('FLASK_HOST', '127.0.0.1')
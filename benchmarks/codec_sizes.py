@@ -0,0 +1,161 @@
+"""
+Redis 값 크기 측정 — 상태/메타데이터 값의 코덱별 키당 바이트와 인코딩/디코딩 시간
+
+기본: 서명 URL 스트리밍 포맷을 흉내 낸 합성 값으로 json / zlib / msgpack 비교
+--scan: REDIS_URL의 실제 dl:status:*(HASH) / dl:meta:* 키를 표본 조회해 현재 저장 크기와 코덱별 재인코딩 크기 보고
+
+실행: python -m benchmarks.codec_sizes --formats 24 --output codec_sizes.json
+      python -m benchmarks.codec_sizes --scan --sample 500
+"""
+import argparse
+import json
+import random
+import string
+import sys
+import time
+
+from infrastructure import codec
+
+_CODECS = ('json', 'zlib', 'msgpack')
+_PREFIXES = ('dl:status:', 'dl:meta:')
+
+
+def _signed_url(rng: random.Random, itag: int, expire: int) -> str:
+    """googlevideo 형태의 서명 URL — 서명/세션 값은 난수라 압축되지 않는 부분"""
+    token = lambda n: ''.join(rng.choices(string.ascii_letters + string.digits + '-_', k=n))  # noqa: E731
+    return (f"https://rr{rng.randint(1, 8)}---sn-{token(8)}.googlevideo.com/videoplayback?expire={expire}"
+            f"&ei={token(22)}&ip=203.0.113.{rng.randint(1, 254)}&id=o-{token(44)}&itag={itag}"
+            f"&source=youtube&requiressl=yes&mime=video%2Fmp4&dur=212.400&lmt=1700000000000000"
+            f"&sparams=expire%2Cei%2Cip%2Cid%2Citag%2Csource%2Crequiressl&sig={token(72)}")
+
+
+def sample_payloads(formats: int, seed: int = 1) -> dict:
+    """대표 값 — 완료 상태(streaming_info 포함), 진행 중 상태, 메타데이터 캐시"""
+    rng = random.Random(seed)
+    expire = int(time.time()) + 21600
+    heights = [144, 240, 360, 480, 720, 1080]
+    streams = [{'quality': heights[i % len(heights)], 'url': _signed_url(rng, 100 + i, expire),
+                'ext': 'mp4', 'format_id': str(100 + i)} for i in range(formats)]
+    streaming_info = {
+        'best_url': streams[-1]['url'], 'best_quality': streams[-1]['quality'],
+        'streaming_urls': streams, 'title': 'Benchmark Video ' * 3, 'duration': 212,
+        'thumbnail': f"https://i.ytimg.com/vi/{'x' * 11}/maxresdefault.jpg",
+    }
+    description = ' '.join(rng.choice(['video', 'music', 'official', 'live', 'remix', 'subscribe'])
+                           for _ in range(300))
+    return {
+        'status_completed': {
+            'status': 'completed', 'progress': 100, 'title': 'Benchmark Video', 'url': 'https://example.com/watch?v=x',
+            'is_direct_link': False, 'max_height': 1080, 'timestamp': time.time(),
+            'streaming_info': streaming_info, 'thumbnail': streaming_info['thumbnail'], 'duration': 212,
+        },
+        'status_processing': {'status': 'processing', 'progress': 30, 'queue_position': 0, 'timestamp': time.time()},
+        'metadata': {
+            'title': 'Benchmark Video', 'duration': 212, 'uploader': 'bench', 'description': description,
+            'view_count': 123456, 'extractor': 'youtube', 'url': streams[-1]['url'],
+            'formats': [{'format_id': s['format_id'], 'url': s['url'], 'ext': 'mp4', 'height': s['quality'],
+                         'vcodec': 'avc1.64001F', 'acodec': 'mp4a.40.2', 'protocol': 'https'} for s in streams],
+        },
+    }
+
+
+def _measure(obj, name: str, rounds: int) -> dict:
+    raw = codec.encode(obj, codec=name)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        codec.encode(obj, codec=name)
+    encode_us = (time.perf_counter() - start) / rounds * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds):
+        codec.decode(raw)
+    decode_us = (time.perf_counter() - start) / rounds * 1e6
+    return {'bytes': len(raw), 'encode_us': round(encode_us, 1), 'decode_us': round(decode_us, 1)}
+
+
+def compare(payloads: dict, rounds: int) -> dict:
+    codecs = [c for c in _CODECS if c != 'msgpack' or codec.msgpack is not None]
+    result = {}
+    for kind, obj in payloads.items():
+        result[kind] = {name: _measure(obj, name, rounds) for name in codecs}
+    return result
+
+
+def _format_of(raw: bytes) -> str:
+    return {0x01: 'zlib', 0x02: 'msgpack', 0x03: 'msgpack+zlib'}.get(raw[0], 'json')
+
+
+def _encoded_size(value, name: str, is_hash: bool) -> int:
+    if is_hash:
+        return sum(len(k) + len(codec.encode(v, codec=name)) for k, v in value.items())
+    return len(codec.encode(value, codec=name))
+
+
+def scan(sample: int) -> dict:
+    """실제 Redis 키 표본의 키당 바이트 (현재 저장 포맷 + 코덱별 재인코딩)"""
+    from infrastructure import redis_client
+
+    r = redis_client.get_redis_binary()
+    result = {}
+    for prefix in _PREFIXES:
+        sizes, formats, values = [], {}, []  # values: (값, HASH 여부)
+        for key in r.scan_iter(match=f"{prefix}*".encode(), count=500):
+            key_type = r.type(key)
+            if key_type == b'hash':
+                # 상태 HASH — 필드별 값 크기 합, 재인코딩은 필드별 인코딩 합으로 비교
+                fields = r.hgetall(key)
+                if not fields:
+                    continue
+                sizes.append(sum(len(k) + len(v) for k, v in fields.items()))
+                fmt = 'hash'
+                values.append(({k.decode(): codec.decode(v) for k, v in fields.items()}, True))
+            elif key_type == b'string':
+                raw = r.get(key)
+                if not raw:
+                    continue
+                sizes.append(len(raw))
+                fmt = _format_of(raw)
+                values.append((codec.decode(raw), False))
+            else:
+                continue
+            formats[fmt] = formats.get(fmt, 0) + 1
+            if len(sizes) >= sample:
+                break
+        if not sizes:
+            result[prefix] = {'keys': 0}
+            continue
+        reencoded = {name: sum(_encoded_size(v, name, is_hash) for v, is_hash in values) // len(values)
+                     for name in _CODECS if name != 'msgpack' or codec.msgpack is not None}
+        result[prefix] = {
+            'keys': len(sizes),
+            'avg_bytes': sum(sizes) // len(sizes),
+            'max_bytes': max(sizes),
+            'formats': formats,
+            'avg_bytes_if': reencoded,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--formats', type=int, default=24, help='합성 streaming_urls 개수')
+    parser.add_argument('--rounds', type=int, default=2000, help='인코딩/디코딩 반복 횟수')
+    parser.add_argument('--scan', action='store_true', help='REDIS_URL의 실제 키 표본 측정')
+    parser.add_argument('--sample', type=int, default=500, help='--scan 시 접두사별 최대 키 수')
+    parser.add_argument('--output', help='결과 JSON 파일 경로')
+    args = parser.parse_args()
+
+    result = {'python': sys.version.split()[0], 'default_codec': codec.CODEC}
+    if args.scan:
+        result['redis'] = scan(args.sample)
+    else:
+        result['config'] = {'formats': args.formats, 'rounds': args.rounds}
+        result['synthetic'] = compare(sample_payloads(args.formats), args.rounds)
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
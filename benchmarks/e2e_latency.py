@@ -0,0 +1,197 @@
+"""
+오프라인 종단 지연 벤치마크 — POST /download → completed, 프록시 처리량, 서버 다운로드 시간, 요청당 Redis 명령 수
+
+실제 사이트 대신 yt-dlp 스텁(지연/포맷 설정 가능)과 로컬 원본 서버(Range + HLS)를 사용하고,
+Redis는 로컬 서버 → fakeredis → 앱 fallback 모드 순으로 선택한다.
+결과를 JSON으로 저장해 변경 전후 실행을 비교한다.
+
+실행: python -m benchmarks.e2e_latency --requests 40 --concurrency 8 --output bench_e2e.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeExtractor, RedisOpCounter, add_hls_routes, hls_formats, progressive_formats, \
+    setup_redis
+from benchmarks.origin import LocalOrigin
+from benchmarks.proxy_load import _percentile
+
+
+def _summary(values: list[float]) -> dict:
+    return {
+        'count': len(values),
+        'p50': _percentile(values, 50),
+        'p95': _percentile(values, 95),
+        'p99': _percentile(values, 99),
+        'max': _percentile(values, 100),
+    }
+
+
+def bench_extraction(web_app, counter: RedisOpCounter, args) -> dict:
+    """POST /download부터 상태 completed까지 — 요청마다 다른 URL (--repeat 비율만큼 같은 URL 재요청)"""
+    from services.status_manager import get_status
+
+    def one(i: int):
+        url = f"https://bench.example/watch/{i % max(1, int(args.requests * (1 - args.repeat)))}"
+        client = web_app.app.test_client()
+        start = time.perf_counter()
+        resp = client.post('/download', data={'video_url': url},
+                           environ_base={'REMOTE_ADDR': f'10.0.{i // 250}.{i % 250}'})
+        location = resp.headers.get('Location', '')
+        file_id = location.rstrip('/').rsplit('/', 1)[-1]
+
+        deadline = start + args.timeout
+        status = {}
+        while time.perf_counter() < deadline:
+            with counter.paused():
+                status = get_status(file_id)
+            if status.get('status') in ('completed', 'error') or '/result/' in location:
+                break
+            time.sleep(args.poll_interval)
+        elapsed = time.perf_counter() - start
+        outcome = 'completed' if '/result/' in location else status.get('status') or 'timeout'
+        return elapsed, outcome, file_id
+
+    ops_start = counter.count
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    total_ops = counter.count - ops_start
+
+    latencies = [r[0] for r in results if r[1] == 'completed']
+    outcomes = {}
+    for r in results:
+        outcomes[r[1]] = outcomes.get(r[1], 0) + 1
+    return {
+        'latency_seconds': _summary(latencies),
+        'outcomes': outcomes,
+        'redis_ops_total': total_ops,
+        'redis_ops_per_request': round(total_ops / max(1, len(results)), 1),
+        'completed_file_ids': [r[2] for r in results if r[1] == 'completed'],
+    }
+
+
+def bench_proxy(web_app, file_id: str, origin: LocalOrigin, args) -> dict:
+    """/stream/<file_id> (IP_HIDE_MODE 동기 프록시) 동시 스트림 처리량"""
+    def one(_):
+        client = web_app.app.test_client()
+        start = time.perf_counter()
+        ttfb = None
+        received = 0
+        resp = client.get(f'/stream/{file_id}', buffered=False)
+        for chunk in resp.response:
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            received += len(chunk)
+        resp.close()
+        return ttfb or 0.0, time.perf_counter() - start, received
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.streams) as pool:
+        results = list(pool.map(one, range(args.streams)))
+    wall = time.perf_counter() - started
+
+    total_bytes = sum(r[2] for r in results)
+    return {
+        'streams': args.streams,
+        'complete_streams': sum(1 for r in results if r[2] == origin.size),
+        'ttfb_seconds': _summary([r[0] for r in results]),
+        'throughput_mb_s': round(total_bytes / wall / 1048576, 2),
+        'wall_seconds': round(wall, 3),
+    }
+
+
+def bench_server_download(counter: RedisOpCounter, args) -> dict:
+    """try_download_enhanced (HLS 포맷 스텁 → 세그먼트 수신 → 파일 저장) 소요 시간"""
+    from services.download_utils import try_download_enhanced
+
+    durations = []
+    ops_start = counter.count
+    for i in range(args.downloads):
+        directory = tempfile.mkdtemp(prefix='bench-dl-')
+        try:
+            start = time.perf_counter()
+            ok = try_download_enhanced(f"https://bench.example/hls/{i}", directory, max_height=720)
+            if ok:
+                durations.append(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return {
+        'duration_seconds': _summary(durations),
+        'succeeded': len(durations),
+        'redis_ops_per_download': round((counter.count - ops_start) / max(1, args.downloads), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--repeat', type=float, default=0.0, help='같은 URL 재요청 비율 (0~1)')
+    parser.add_argument('--extract-latency', type=float, default=0.5, help='스텁 extract_info 지연 (초)')
+    parser.add_argument('--streams', type=int, default=8)
+    parser.add_argument('--downloads', type=int, default=5)
+    parser.add_argument('--size-mb', type=float, default=4)
+    parser.add_argument('--rate-kb', type=int, default=0, help='원본 연결당 전송 속도 (KB/s, 0=무제한)')
+    parser.add_argument('--poll-interval', type=float, default=0.05)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--output', help='결과 JSON 파일 경로')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-e2e-')
+    os.environ.update({
+        'DOWNLOAD_FOLDER': os.path.join(workdir, 'downloads'),
+        'ARTIFACT_DISK_BUDGET_MB': '0',
+        'EDGE_ENABLED': 'false',
+        'IP_HIDE_MODE': 'true',
+        'MAX_WORKERS': str(args.concurrency),
+        'JOB_QUEUE_MODE': 'local',
+        'JOB_QUEUE_LIMIT': str(args.requests * 2),
+        'JOB_QUEUE_PER_CLIENT': str(args.requests),
+    })
+
+    origin = LocalOrigin(int(args.size_mb * 1024 * 1024), rate_bytes=args.rate_kb * 1024)
+    add_hls_routes(origin)
+    origin.start()
+
+    from config import REDIS_URL
+    backend = setup_redis(REDIS_URL)
+    counter = RedisOpCounter().install()
+    extractor = FakeExtractor(
+        lambda url: hls_formats(origin) if '/hls/' in url else progressive_formats(origin),
+        latency=args.extract_latency,
+    ).install()
+
+    import app as web_app
+    web_app.limiter.enabled = False  # 벤치마크 요청은 Rate Limit 제외
+
+    try:
+        extraction = bench_extraction(web_app, counter, args)
+        file_ids = extraction.pop('completed_file_ids')
+        extraction['origin_extractions'] = extractor.extractions
+        result = {
+            'config': {k: v for k, v in vars(args).items() if k != 'output'},
+            'redis_backend': backend,
+            'python': sys.version.split()[0],
+            'extraction': extraction,
+            'proxy': bench_proxy(web_app, file_ids[0], origin, args) if file_ids else None,
+            'server_download': bench_server_download(counter, args),
+        }
+    finally:
+        origin.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    sys.stdout.flush()
+    os._exit(0)  # 앱 스케줄러/정리 스레드 대기 없이 종료
+
+
+if __name__ == '__main__':
+    main()
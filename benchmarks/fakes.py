@@ -0,0 +1,253 @@
+"""
+벤치마크용 대역 — yt-dlp 추출기 스텁, HLS 원본 경로, Redis 백엔드 선택 및 명령 수 계측
+
+실제 사이트/네트워크 없이 download_video 전체 경로를 재현하기 위한 부품 모음.
+"""
+import asyncio
+import contextlib
+import os
+import threading
+import time
+
+import requests
+from aiohttp import web
+
+from benchmarks.origin import LocalOrigin
+
+
+# ── HLS 원본 ──────────────────────────────────────────────────────
+
+def add_hls_routes(origin: LocalOrigin, segments: int = 8):
+    """origin payload를 segments개로 나눈 HLS 플레이리스트(/hls/index.m3u8, /hls/seg<N>.ts) 등록 (start 이전 호출)"""
+    seg_size = max(1, origin.size // segments)
+
+    async def playlist(request: web.Request) -> web.Response:
+        origin.requests += 1
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:4', '#EXT-X-MEDIA-SEQUENCE:0']
+        for i in range(segments):
+            lines += ['#EXTINF:4.0,', f'seg{i}.ts']
+        lines.append('#EXT-X-ENDLIST')
+        return web.Response(text='\n'.join(lines) + '\n', content_type='application/vnd.apple.mpegurl')
+
+    async def segment(request: web.Request) -> web.Response:
+        origin.requests += 1
+        i = int(request.match_info['n'])
+        start = i * seg_size
+        end = origin.size if i == segments - 1 else start + seg_size
+        body = origin.payload[start:end]
+        origin.bytes_sent += len(body)
+        if origin.rate_bytes:
+            await asyncio.sleep(len(body) / origin.rate_bytes)
+        return web.Response(body=body, content_type='video/mp2t')
+
+    origin.add_route('/hls/index.m3u8', playlist)
+    origin.add_route('/hls/seg{n}.ts', segment)
+
+
+# ── yt-dlp 스텁 ───────────────────────────────────────────────────
+
+def progressive_formats(origin: LocalOrigin) -> list[dict]:
+    """브라우저 직접 재생 가능한 mp4 (스트리밍 경로 성공) — ip= 파라미터로 IP_HIDE_MODE 프록시 경로 유도"""
+    return [
+        {'format_id': '18', 'url': origin.url('/video.mp4') + '?expire=9999999999&ip=127.0.0.1',
+         'ext': 'mp4', 'height': 360, 'vcodec': 'avc1', 'acodec': 'mp4a', 'protocol': 'https'},
+        {'format_id': '22', 'url': origin.url('/video.mp4') + '?expire=9999999999&ip=127.0.0.1',
+         'ext': 'mp4', 'height': 720, 'vcodec': 'avc1', 'acodec': 'mp4a', 'protocol': 'https'},
+    ]
+
+
+def hls_formats(origin: LocalOrigin) -> list[dict]:
+    """HLS 전용 (스트리밍 필터에서 제외 → 직접 링크/서버 다운로드 경로)"""
+    return [
+        {'format_id': 'hls-720', 'url': origin.url('/hls/index.m3u8'),
+         'ext': 'mp4', 'height': 720, 'vcodec': 'avc1', 'acodec': 'mp4a', 'protocol': 'm3u8_native'},
+    ]
+
+
+class FakeExtractor:
+    """YoutubeDL 대체 클래스 생성기
+
+    latency: extract_info 1회 지연(초) — 원본 사이트 응답 시간 재현
+    formats: URL → 포맷 목록 함수
+    """
+
+    def __init__(self, formats, latency: float = 0.5):
+        self.formats = formats
+        self.latency = latency
+        self.extractions = 0
+        self.downloads = 0
+        self._lock = threading.Lock()
+
+    def install(self):
+        """yt_dlp.YoutubeDL 및 이를 직접 import한 모듈의 참조를 스텁으로 교체"""
+        import yt_dlp
+        from services import download_utils
+        ydl_class = self.make_class()
+        yt_dlp.YoutubeDL = ydl_class
+        download_utils.YoutubeDL = ydl_class
+        return self
+
+    def _info(self, url: str) -> dict:
+        formats = self.formats(url)
+        best = formats[-1]
+        return {
+            'id': str(abs(hash(url))), 'title': 'Benchmark Video', 'extractor': 'generic',
+            'webpage_url': url, 'duration': 60, 'thumbnail': None,
+            'formats': formats, 'url': best['url'], 'ext': best['ext'],
+            'format_id': best['format_id'], 'protocol': best['protocol'],
+        }
+
+    def _fetch(self, info: dict, directory: str, hooks=()):
+        """선택 포맷을 원본에서 실제로 받아 파일로 저장 (HLS는 세그먼트 순차 수신, 조각마다 progress_hooks 호출)"""
+        url = info['url']
+        path = self._filename(info, directory)
+        started = time.monotonic()
+        downloaded = 0
+
+        def notify(**extra):
+            speed = downloaded / max(time.monotonic() - started, 1e-6)
+            for hook in hooks:
+                hook({'status': 'downloading', 'downloaded_bytes': downloaded, 'speed': speed, 'filename': path,
+                      'info_dict': info, **extra})
+
+        with requests.Session() as session, open(path, 'wb') as f:
+            if url.endswith('.m3u8'):
+                base = url.rsplit('/', 1)[0]
+                playlist = session.get(url, timeout=30).text
+                segments = [line for line in playlist.splitlines() if line and not line.startswith('#')]
+                for i, line in enumerate(segments, start=1):
+                    body = session.get(f"{base}/{line}", timeout=30).content
+                    f.write(body)
+                    downloaded += len(body)
+                    notify(fragment_index=i, fragment_count=len(segments))
+            else:
+                with session.get(url, stream=True, timeout=30) as resp:
+                    total = int(resp.headers.get('Content-Length') or 0) or None
+                    for chunk in resp.iter_content(1048576):
+                        f.write(chunk)
+                        downloaded += len(chunk)
+                        notify(total_bytes=total)
+        for hook in hooks:
+            hook({'status': 'finished', 'downloaded_bytes': downloaded, 'filename': path, 'info_dict': info})
+
+    @staticmethod
+    def _filename(info: dict, directory: str) -> str:
+        return os.path.join(directory, f"{info.get('title', 'video')}.mp4")
+
+    def make_class(self):
+        fake = self
+
+        class FakeYoutubeDL:
+            def __init__(self, params=None):
+                self.params = params or {}
+                self._progress_hooks = list(self.params.get('progress_hooks', ()))
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def close(self):
+                pass
+
+            def add_progress_hook(self, hook):
+                self._progress_hooks.append(hook)
+
+            def extract_info(self, url, download=False):
+                with fake._lock:
+                    fake.extractions += 1
+                time.sleep(fake.latency)
+                info = fake._info(url)
+                if download:
+                    self.process_ie_result(info, download=True)
+                return info
+
+            def process_ie_result(self, info, download=True):
+                if download:
+                    with fake._lock:
+                        fake.downloads += 1
+                    fake._fetch(info, self.params.get('paths', {}).get('home', '.'), self._progress_hooks)
+                return info
+
+            def prepare_filename(self, info):
+                return fake._filename(info, self.params.get('paths', {}).get('home', '.'))
+
+            def download(self, urls):
+                for url in urls:
+                    self.extract_info(url, download=True)
+                return 0
+
+        return FakeYoutubeDL
+
+
+# ── Redis ────────────────────────────────────────────────────────
+
+class RedisOpCounter:
+    """redis-py 명령 수 계측 — Redis.execute_command / Pipeline.execute 래핑 (pub/sub 수신 제외)"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def install(self):
+        import redis.client
+
+        counter = self
+        orig_execute_command = redis.client.Redis.execute_command
+        orig_pipeline_execute = redis.client.Pipeline.execute
+
+        def execute_command(self, *args, **kwargs):
+            counter._add(1)
+            return orig_execute_command(self, *args, **kwargs)
+
+        def pipeline_execute(self, *args, **kwargs):
+            counter._add(len(self.command_stack))
+            return orig_pipeline_execute(self, *args, **kwargs)
+
+        redis.client.Redis.execute_command = execute_command
+        redis.client.Pipeline.execute = pipeline_execute
+        return self
+
+    def _add(self, n: int):
+        if getattr(self._local, 'paused', False):
+            return
+        with self._lock:
+            self.count += n
+
+    @contextlib.contextmanager
+    def paused(self):
+        """벤치마크 하네스 자신의 조회(상태 폴링 등)는 집계에서 제외"""
+        self._local.paused = True
+        try:
+            yield
+        finally:
+            self._local.paused = False
+
+
+def setup_redis(redis_url: str) -> str:
+    """Redis 백엔드 선택 — 로컬 Redis 서버 → fakeredis(설치 시) → 앱 fallback 모드 순
+
+    app import 이전에 호출해야 redis_client 싱글톤이 교체된다.
+    """
+    import redis
+    from infrastructure import redis_client
+
+    try:
+        redis.Redis.from_url(redis_url, socket_connect_timeout=0.5).ping()
+        return 'redis'
+    except Exception:
+        pass
+
+    try:
+        import fakeredis
+    except ImportError:
+        redis_client.mark_unavailable()
+        return 'fallback'
+
+    server = fakeredis.FakeServer()
+    redis_client._redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    redis_client._pool = redis_client._redis.connection_pool
+    redis_client._redis_binary = fakeredis.FakeRedis(server=server, decode_responses=False)
+    return 'fakeredis'
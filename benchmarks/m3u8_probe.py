@@ -0,0 +1,127 @@
+"""
+m3u8 폴백 후보 선택 벤치마크 — 응답 없는 후보가 앞에 있을 때 정상 후보 다운로드 완료까지 걸리는 시간
+
+- sequential: 기존 방식 (호스트 점수 순으로 하나씩 다운로드 시도, 후보마다 --timeout초 소켓 타임아웃)
+- ranked    : services.download_utils.rank_m3u8_candidates로 동시 확인 후 1순위만 다운로드
+
+후보 순서: 응답 없는 서버 2개(재생목록 요청이 멈춤) → 404 → 느린 CDN → 정상 CDN
+
+실행: python -m benchmarks.m3u8_probe --timeout 5 --output bench_m3u8_probe.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from urllib.parse import urljoin
+
+from aiohttp import web
+
+from benchmarks.fakes import add_hls_routes
+from benchmarks.origin import LocalOrigin
+
+_PAGE_URL = 'https://page.example/watch/1'
+
+
+def _add_stall_routes(origin: LocalOrigin, stall: float, first_byte: float):
+    """/dead/index.m3u8: stall초 동안 응답 없음 / /slow/...: 세그먼트 첫 응답 first_byte초 지연"""
+
+    async def dead(request: web.Request) -> web.Response:
+        await asyncio.sleep(stall)
+        return web.Response(status=504)
+
+    async def slow_playlist(request: web.Request) -> web.Response:
+        return web.Response(text='#EXTM3U\n#EXT-X-TARGETDURATION:4\n#EXTINF:4.0,\nseg0.ts\n#EXT-X-ENDLIST\n',
+                            content_type='application/vnd.apple.mpegurl')
+
+    async def slow_segment(request: web.Request) -> web.Response:
+        await asyncio.sleep(first_byte)
+        raise web.HTTPFound('/hls/seg0.ts')
+
+    origin.add_route('/dead/index.m3u8', dead)
+    origin.add_route('/slow/index.m3u8', slow_playlist)
+    origin.add_route('/slow/seg0.ts', slow_segment)
+
+
+def _download(url: str, timeout: float) -> int:
+    """재생목록 + 전체 세그먼트 수신 (yt-dlp native HLS 다운로드 대역) — 받은 바이트 수"""
+    from infrastructure import http_pool
+
+    session = http_pool.get_session(url)
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    total = 0
+    for line in response.text.splitlines():
+        if line and not line.startswith('#'):
+            segment = session.get(urljoin(url, line), timeout=timeout)
+            segment.raise_for_status()
+            total += len(segment.content)
+    return total
+
+
+def sequential(candidates: list[str], timeout: float) -> str | None:
+    for url in candidates:
+        try:
+            _download(url, timeout)
+            return url
+        except Exception:
+            continue
+    return None
+
+
+def ranked(candidates: list[str], timeout: float) -> str | None:
+    from services.download_utils import rank_m3u8_candidates
+
+    for url in rank_m3u8_candidates(candidates, _PAGE_URL)[:3]:
+        try:
+            _download(url, timeout)
+            return url
+        except Exception:
+            continue
+    return None
+
+
+def run(timeout: float, first_byte: float) -> dict:
+    origin = LocalOrigin(4 * 1024 * 1024)
+    add_hls_routes(origin)
+    _add_stall_routes(origin, stall=timeout * 2, first_byte=first_byte)
+    origin.start()
+    candidates = [origin.url('/dead/index.m3u8?a'), origin.url('/dead/index.m3u8?b'), origin.url('/gone/index.m3u8'),
+                  origin.url('/slow/index.m3u8'), origin.url('/hls/index.m3u8')]
+    result = {}
+    try:
+        for name, fn in (('sequential', sequential), ('ranked', ranked)):
+            start = time.perf_counter()
+            winner = fn(candidates, timeout)
+            result[name] = {
+                'seconds': round(time.perf_counter() - start, 2),
+                'winner': winner.split('/', 3)[-1] if winner else None,
+            }
+    finally:
+        origin.stop()
+    result['speedup'] = round(result['sequential']['seconds'] / result['ranked']['seconds'], 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--timeout', type=float, default=5, help='소켓 타임아웃 및 M3U8_PROBE_TIMEOUT (초)')
+    parser.add_argument('--first-byte', type=float, default=0.5, help='느린 CDN의 세그먼트 첫 응답 지연 (초)')
+    parser.add_argument('--output', help='결과 JSON 파일 경로')
+    args = parser.parse_args()
+    os.environ['M3U8_PROBE_TIMEOUT'] = str(args.timeout)  # config import 전에 설정
+
+    result = {
+        'python': sys.version.split()[0],
+        'config': {'timeout': args.timeout, 'first_byte': args.first_byte},
+        **run(args.timeout, args.first_byte),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
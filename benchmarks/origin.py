@@ -0,0 +1,110 @@
+"""
+벤치마크용 로컬 원본 서버 — Range 지원 + 연결당 대역폭 제한 (asyncio, 별도 스레드)
+"""
+import asyncio
+import threading
+
+from aiohttp import web
+
+_WRITE_CHUNK = 65536
+
+
+def _parse_range(header: str, size: int):
+    """'bytes=a-b' → (start, end) — 지원하지 않는 형식은 None"""
+    if not header or not header.startswith('bytes='):
+        return None
+    spec = header[len('bytes='):].split(',')[0].strip()
+    start_s, _, end_s = spec.partition('-')
+    if start_s:
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    else:
+        start = max(0, size - int(end_s))
+        end = size - 1
+    if start >= size:
+        return None
+    return start, min(end, size - 1)
+
+
+class LocalOrigin:
+    """고정 크기 바이트열을 제공하는 원본 서버
+
+    rate_bytes: 연결당 초당 전송량 제한 (0이면 무제한) — CDN의 연결당 throttling 재현
+    """
+
+    def __init__(self, size: int, rate_bytes: int = 0, host: str = '127.0.0.1'):
+        self.size = size
+        self.rate_bytes = rate_bytes
+        self.host = host
+        self.port = None
+        self.requests = 0
+        self.bytes_sent = 0
+        self._payload = bytes(i % 251 for i in range(size))
+        self._extra_routes = []
+        self._loop = None
+        self._runner = None
+        self._ready = threading.Event()
+
+    @property
+    def payload(self) -> bytes:
+        return self._payload
+
+    def url(self, path: str = '/video.mp4') -> str:
+        return f"http://{self.host}:{self.port}{path}"
+
+    def add_route(self, path: str, handler):
+        """추가 경로 등록 (start 이전에 호출)"""
+        self._extra_routes.append((path, handler))
+
+    async def _video(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        rng = _parse_range(request.headers.get('Range', ''), self.size)
+        start, end = rng if rng else (0, self.size - 1)
+
+        response = web.StreamResponse(status=206 if rng else 200)
+        response.content_type = 'video/mp4'
+        response.content_length = end - start + 1
+        response.headers['Accept-Ranges'] = 'bytes'
+        if rng:
+            response.headers['Content-Range'] = f"bytes {start}-{end}/{self.size}"
+        await response.prepare(request)
+
+        pos = start
+        try:
+            while pos <= end:
+                chunk = self._payload[pos:min(pos + _WRITE_CHUNK, end + 1)]
+                await response.write(chunk)
+                pos += len(chunk)
+                self.bytes_sent += len(chunk)
+                if self.rate_bytes:
+                    await asyncio.sleep(len(chunk) / self.rate_bytes)
+        except ConnectionResetError:
+            pass
+        return response
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/video.mp4', self._video)
+        for path, handler in self._extra_routes:
+            app.router.add_get(path, handler)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._start())
+            self._ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        self._ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
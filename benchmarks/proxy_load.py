@@ -0,0 +1,191 @@
+"""
+프록시 스트리밍 부하 벤치마크 — gthread 동기 프록시 vs asyncio 엣지 서버
+
+로컬 원본 서버(Range 지원, 연결당 대역폭 제한)를 띄우고 N개의 스트림을 동시에 열어
+워커 1개가 동시에 중계하는 스트림 수와 첫 바이트 지연(TTFB)을 비교한다.
+
+- before: gunicorn gthread 워커 1개 (--threads GUNICORN_THREADS) + app.proxy_stream_video
+- after : 엣지 서버 1프로세스 (services.edge_server)
+
+실행: python -m benchmarks.proxy_load --streams 64 --size-mb 2 --rate-kb 512
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.origin import LocalOrigin
+
+
+def sync_app():
+    """gunicorn 팩토리 — 실제 proxy_stream_video를 그대로 사용하는 최소 Flask 앱"""
+    from flask import Flask, request
+    import app as web_app
+
+    bench = Flask('proxy-bench')
+
+    @bench.route('/stream')
+    def stream():
+        return web_app.proxy_stream_video(request.args['u'])
+
+    return bench
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[idx], 3)
+
+
+async def _run_clients(url: str, streams: int, timeout: float) -> dict:
+    """동시 스트림 N개 실행 — TTFB/완료시간/최대 동시 중계 수 측정"""
+    active = 0
+    max_active = 0
+    ttfb, total, failed = [], [], 0
+
+    async def one(session):
+        nonlocal active, max_active, failed
+        start = time.perf_counter()
+        try:
+            async with session.get(url) as resp:
+                if resp.status >= 400:
+                    failed += 1
+                    return
+                first = True
+                async for _ in resp.content.iter_chunked(65536):
+                    if first:
+                        ttfb.append(time.perf_counter() - start)
+                        active += 1
+                        max_active = max(max_active, active)
+                        first = False
+                if not first:
+                    active -= 1
+                total.append(time.perf_counter() - start)
+        except Exception:
+            failed += 1
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(session) for _ in range(streams)))
+        wall = time.perf_counter() - started
+
+    return {
+        'streams': streams,
+        'completed': len(total),
+        'failed': failed,
+        'max_concurrent_streams': max_active,
+        'ttfb_p50': _percentile(ttfb, 50),
+        'ttfb_p95': _percentile(ttfb, 95),
+        'ttfb_max': _percentile(ttfb, 100),
+        'duration_p50': _percentile(total, 50),
+        'wall_seconds': round(wall, 3),
+    }
+
+
+def _wait_port(port: int, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"port {port} not ready")
+
+
+def bench_gthread(origin: LocalOrigin, args) -> dict:
+    port = _free_port()
+    env = {**os.environ, 'EDGE_ENABLED': 'false'}
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-k', 'gthread', '-w', '1', '--threads', str(args.threads),
+         '-b', f'127.0.0.1:{port}', '--timeout', '600', '--log-level', 'error',
+         'benchmarks.proxy_load:sync_app()'],
+        env=env,
+    )
+    try:
+        _wait_port(port)
+        url = f"http://127.0.0.1:{port}/stream?u={quote(origin.url(), safe='')}"
+        return asyncio.run(_run_clients(url, args.streams, args.timeout))
+    finally:
+        proc.terminate()
+        proc.wait(30)
+
+
+def bench_edge(origin: LocalOrigin, args) -> dict:
+    from services.edge_server import create_app
+
+    tokens = {'bench': {'url': origin.url()}}
+
+    async def resolve(token):
+        return tokens.get(token)
+
+    port = _free_port()
+    ready = threading.Event()
+    holder = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        holder['loop'] = loop
+        runner = web.AppRunner(create_app(resolve), access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', port).start())
+        holder['runner'] = runner
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait(10)
+    try:
+        return asyncio.run(_run_clients(f"http://127.0.0.1:{port}/edge/proxy/bench", args.streams, args.timeout))
+    finally:
+        loop = holder['loop']
+        asyncio.run_coroutine_threadsafe(holder['runner'].cleanup(), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--streams', type=int, default=64)
+    parser.add_argument('--size-mb', type=float, default=2)
+    parser.add_argument('--rate-kb', type=int, default=512, help='원본 연결당 전송 속도 (KB/s)')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('GUNICORN_THREADS', 4)))
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--output', help='결과 JSON 파일 경로')
+    args = parser.parse_args()
+
+    origin = LocalOrigin(int(args.size_mb * 1024 * 1024), rate_bytes=args.rate_kb * 1024).start()
+    try:
+        result = {
+            'config': {k: v for k, v in vars(args).items() if k != 'output'},
+            'gthread': bench_gthread(origin, args),
+            'edge': bench_edge(origin, args),
+        }
+    finally:
+        origin.stop()
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
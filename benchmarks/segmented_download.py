@@ -0,0 +1,97 @@
+"""
+분할 다운로드 벤치마크 — 연결당 대역폭이 제한된 로컬 원본에서 단일 연결 vs services.segmented_download
+
+- single   : yt-dlp와 같은 방식 (연결 1개, 10MB Range 요청을 순서대로)
+- segmented: SEGMENT_SIZE 구간을 처리량이 늘어나는 동안 연결을 추가하며 동시 수신
+
+실행: python -m benchmarks.segmented_download --size-mb 64 --rate-kb 2048 --output bench_segmented.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.origin import LocalOrigin
+
+_YTDLP_CHUNK = 10 * 1024 * 1024  # try_download_enhanced의 http_chunk_size
+
+
+def single_connection(url: str, path: str):
+    """연결 1개로 10MB 구간을 순서대로 수신"""
+    from infrastructure import http_pool
+
+    session = http_pool.get_session(url)
+    pos = 0
+    with open(path, 'wb') as f:
+        while True:
+            response = session.get(url, headers={'Range': f"bytes={pos}-{pos + _YTDLP_CHUNK - 1}"}, stream=True,
+                                   timeout=30)
+            total = int(response.headers['Content-Range'].rsplit('/', 1)[1])
+            for chunk in response.iter_content(chunk_size=256 * 1024):
+                f.write(chunk)
+                pos += len(chunk)
+            response.close()
+            if pos >= total:
+                return
+
+
+def segmented(url: str, path: str):
+    from services import segmented_download
+
+    segmented_download.download(url, path)
+
+
+def _verify(path: str, payload: bytes) -> bool:
+    with open(path, 'rb') as f:
+        return f.read() == payload
+
+
+def run(size_mb: int, rate_kb: int) -> dict:
+    origin = LocalOrigin(size_mb * 1024 * 1024, rate_bytes=rate_kb * 1024).start()
+    url = origin.url()
+    result = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ('single', 'segmented'):
+                path = os.path.join(tmp, f"{name}.mp4")
+                requests_before = origin.requests
+                start = time.perf_counter()
+                (single_connection if name == 'single' else segmented)(url, path)
+                elapsed = time.perf_counter() - start
+                result[name] = {
+                    'seconds': round(elapsed, 2),
+                    'throughput_mb_s': round(size_mb / elapsed, 2),
+                    'origin_requests': origin.requests - requests_before,
+                    'verified': _verify(path, origin.payload),
+                }
+    finally:
+        origin.stop()
+    result['speedup'] = round(result['single']['seconds'] / result['segmented']['seconds'], 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=64, help='원본 파일 크기 (MB)')
+    parser.add_argument('--rate-kb', type=int, default=2048, help='원본 연결당 대역폭 제한 (KB/s)')
+    parser.add_argument('--output', help='결과 JSON 파일 경로')
+    args = parser.parse_args()
+
+    from config import SEGMENT_SIZE, SEGMENT_CONNECTIONS_MIN, SEGMENT_CONNECTIONS_MAX
+
+    result = {
+        'python': sys.version.split()[0],
+        'config': {'size_mb': args.size_mb, 'rate_kb': args.rate_kb, 'segment_mb': SEGMENT_SIZE // 1048576,
+                   'connections': [SEGMENT_CONNECTIONS_MIN, SEGMENT_CONNECTIONS_MAX]},
+        **run(args.size_mb, args.rate_kb),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
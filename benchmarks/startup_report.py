@@ -0,0 +1,174 @@
+"""
+시작 비용 리포트 — app import 시간(모듈별), yt-dlp 추출기 목록 적재 비용, gunicorn 워커별 메모리 (preload 유무 비교)
+
+- import  : 새 프로세스에서 python -X importtime으로 `import app` — 전체 시간과 무거운 최상위 패키지
+- registry: import 이후 첫 YoutubeDL 생성(추출기 모듈 import) 시간과 RSS 증가량
+- gunicorn: gunicorn.conf.py로 --workers N 실행 후 첫 응답까지 시간, 프로세스별 RSS / USS / PSS
+            (GUNICORN_PRELOAD=false: 워커마다 import / true: 마스터 1회 import 후 fork 공유)
+            --warm이면 워커마다 추출기 목록을 올린 상태(실제 추출 1회 이후)로 측정
+
+Redis 없이도 실행된다 (앱 fallback 모드). 임시 디렉토리를 작업 디렉토리로 사용.
+
+실행: python -m benchmarks.startup_report --workers 4 --output startup_report.json
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import psutil
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_HEAVY = ('yt_dlp', 'flask', 'flask_limiter', 'requests', 'psutil', 'redis', 'werkzeug', 'jinja2', 'urllib3')
+_IMPORTTIME = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)')
+
+# 워커 안에서 추출기 목록 적재 (--warm) — 실제 추출 없이 YoutubeDL 생성으로 같은 모듈을 올림
+_WARM_ROUTE = '''
+import app as application
+
+@application.app.route('/_bench/warm')
+def _bench_warm():
+    import yt_dlp
+    with yt_dlp.YoutubeDL({'quiet': True}):
+        pass
+    return 'ok'
+'''
+
+
+def _env(**extra) -> dict:
+    env = {k: v for k, v in os.environ.items() if k != 'APP_PRELOAD'}
+    env.update(PYTHONPATH=ROOT, REDIS_URL=os.getenv('REDIS_URL', 'redis://127.0.0.1:1/0'), **extra)
+    return env
+
+
+def measure_import(workdir: str) -> dict:
+    """`import app` 전체/패키지별 시간 (preload 모드로 import해 스레드 시작 제외)"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=workdir,
+                          env=_env(APP_PRELOAD='true'), capture_output=True, text=True, timeout=120)
+    packages, total = {}, 0
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, name = int(m.group(1)), int(m.group(2)), m.group(3)
+        total += self_us
+        top = name.split('.')[0]
+        if top in _HEAVY and name == top:
+            packages[top] = max(packages.get(top, 0), cumulative_us)
+    return {
+        'total_ms': round(total / 1000, 1),
+        'packages_ms': {k: round(v / 1000, 1) for k, v in sorted(packages.items(), key=lambda kv: -kv[1])},
+    }
+
+
+def measure_registry(workdir: str) -> dict:
+    """import app 이후 첫 YoutubeDL 생성 비용 (추출기 모듈 적재)"""
+    script = (
+        'import time, psutil, app, yt_dlp\n'
+        'p = psutil.Process(); before = p.memory_info().rss; t = time.perf_counter()\n'
+        'with yt_dlp.YoutubeDL({"quiet": True}): pass\n'
+        'print(time.perf_counter() - t, p.memory_info().rss - before)\n'
+    )
+    proc = subprocess.run([sys.executable, '-c', script], cwd=workdir, env=_env(APP_PRELOAD='true'),
+                          capture_output=True, text=True, timeout=120)
+    seconds, rss = proc.stdout.split()[-2:]
+    return {'first_ydl_ms': round(float(seconds) * 1000, 1), 'rss_increase_mb': round(int(rss) / 1048576, 1)}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _memory(pid: int) -> dict:
+    info = psutil.Process(pid).memory_full_info()
+    return {'rss_mb': round(info.rss / 1048576, 1), 'uss_mb': round(info.uss / 1048576, 1),
+            'pss_mb': round(getattr(info, 'pss', 0) / 1048576, 1)}
+
+
+def measure_gunicorn(workdir: str, workers: int, preload: bool, warm: bool) -> dict:
+    port = _free_port()
+    module = 'app'
+    if warm:
+        with open(os.path.join(workdir, 'bench_app.py'), 'w') as f:
+            f.write(_WARM_ROUTE + 'app = application.app\n')
+        module = 'bench_app'
+    command = [sys.executable, '-m', 'gunicorn', '--config', os.path.join(ROOT, 'gunicorn.conf.py'),
+               '--chdir', workdir, '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', '4',
+               '--log-level', 'error', f'{module}:app']
+    started = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=workdir, env=_env(GUNICORN_PRELOAD=str(preload).lower(),
+                                                           GUNICORN_WORKERS=str(workers)))
+    try:
+        url = f'http://127.0.0.1:{port}'
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"gunicorn 종료됨 (코드 {proc.returncode})")
+            try:
+                if requests.get(url + '/', timeout=2).status_code < 500:
+                    break
+            except requests.RequestException:
+                pass
+            if time.perf_counter() - started > 120:
+                raise RuntimeError("gunicorn 응답 없음")
+            time.sleep(0.05)
+        first_response = time.perf_counter() - started
+
+        master = psutil.Process(proc.pid)
+        deadline = time.monotonic() + 60
+        while len(master.children()) < workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if warm:  # 요청은 임의 워커로 가므로 워커 수보다 넉넉히 보냄
+            for _ in range(workers * 8):
+                requests.get(url + '/_bench/warm', timeout=30)
+        time.sleep(1)
+
+        children = [_memory(c.pid) for c in master.children()]
+        return {
+            'first_response_seconds': round(first_response, 2),
+            'master': _memory(proc.pid),
+            'workers': children,
+            'workers_total': {k: round(sum(c[k] for c in children), 1) for k in ('rss_mb', 'uss_mb', 'pss_mb')},
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn 워커 수')
+    parser.add_argument('--warm', action='store_true', help='워커마다 추출기 목록을 올린 뒤 측정')
+    parser.add_argument('--output', help='결과 JSON 파일 경로')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        result = {
+            'python': sys.version.split()[0],
+            'config': {'workers': args.workers, 'warm': args.warm},
+            'import': measure_import(workdir),
+            'registry': measure_registry(workdir),
+            'gunicorn': {
+                'per_worker_import': measure_gunicorn(workdir, args.workers, preload=False, warm=args.warm),
+                'preload': measure_gunicorn(workdir, args.workers, preload=True, warm=args.warm),
+            },
+        }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+YoutubeDL 생성 비용 벤치마크 — 호출마다 새 YoutubeDL vs services.ydl_pool 재사용
+
+- construct: YoutubeDL(opts) 생성 + 종료만 반복 (추출기/쿠키 저장소/HTTP 핸들러 준비 비용)
+- extract  : 로컬 원본의 mp4 URL을 generic 추출기로 추출 (원본 요청 포함, 풀은 yt-dlp 유지 연결 재사용)
+
+실행: python -m benchmarks.ydl_setup --calls 50 --output bench_ydl_setup.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from benchmarks.origin import LocalOrigin
+
+_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'skip_download': True,
+    'socket_timeout': 30,
+    'force_generic_extractor': True,
+}
+
+
+def _timed(fn, calls: int) -> dict:
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'mean_ms': round(statistics.mean(samples), 2), 'p50_ms': round(statistics.median(samples), 2),
+            'first_ms': round(samples[0], 2)}
+
+
+def run(calls: int) -> dict:
+    import yt_dlp
+    from services import ydl_pool
+
+    origin = LocalOrigin(256 * 1024).start()
+    url = origin.url()
+    result = {}
+    try:
+        def fresh_construct():
+            with yt_dlp.YoutubeDL(dict(_OPTS)):
+                pass
+
+        def pooled_construct():
+            with ydl_pool.borrow(_OPTS):
+                pass
+
+        def fresh_extract():
+            with yt_dlp.YoutubeDL(dict(_OPTS)) as ydl:
+                ydl.extract_info(url, download=False)
+
+        def pooled_extract():
+            with ydl_pool.borrow(_OPTS) as ydl:
+                ydl.extract_info(url, download=False)
+
+        for name, fresh, pooled in (('construct', fresh_construct, pooled_construct),
+                                    ('extract', fresh_extract, pooled_extract)):
+            ydl_pool.clear()
+            requests_before = origin.requests
+            result[name] = {'fresh': _timed(fresh, calls)}
+            result[name]['fresh']['origin_requests'] = origin.requests - requests_before
+            requests_before = origin.requests
+            result[name]['pooled'] = _timed(pooled, calls)
+            result[name]['pooled']['origin_requests'] = origin.requests - requests_before
+            result[name]['speedup'] = round(result[name]['fresh']['mean_ms'] / result[name]['pooled']['mean_ms'], 2)
+        result['pool'] = ydl_pool.stats()
+    finally:
+        origin.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=50, help='방식별 반복 횟수')
+    parser.add_argument('--output', help='결과 JSON 파일 경로')
+    args = parser.parse_args()
+
+    import yt_dlp
+
+    result = {
+        'python': sys.version.split()[0],
+        'yt_dlp': yt_dlp.version.__version__,
+        'config': {'calls': args.calls},
+        **run(args.calls),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -14,16 +14,112 @@ MAX_WORKERS = int(os.getenv('MAX_WORKERS', 3))
 DOWNLOAD_FOLDER = os.getenv('DOWNLOAD_FOLDER', 'downloads')
 STATUS_MAX_AGE = int(os.getenv('STATUS_MAX_AGE', 120))  # 2mins
 STATUS_CLEANUP_INTERVAL = int(os.getenv('STATUS_CLEANUP_INTERVAL', 60))  # 1min
+STATUS_PROGRESS_INTERVAL = float(os.getenv('STATUS_PROGRESS_INTERVAL', 1.0))  # 진행률 상태 기록 주기 (초, file_id당 최대 1회)
+STATUS_FULL_SCAN_INTERVAL = int(os.getenv('STATUS_FULL_SCAN_INTERVAL', 21600))  # 다운로드 폴더 전체 스캔 주기 (초) — 평소에는 만료 인덱스만 확인
 MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE_MB', 40000)) * 1024 * 1024
 DOWNLOAD_LIMITS = os.getenv('DOWNLOAD_LIMITS', "20 per hour, 100 per minute").split(',')
 DOWNLOAD_LIMITS = [limit.strip() for limit in DOWNLOAD_LIMITS]
 
+# 작업 스케줄러 (추출 / 서버 다운로드 레인 분리, 클라이언트별 라운드로빈)
+SERVER_DOWNLOAD_WORKERS = int(os.getenv('SERVER_DOWNLOAD_WORKERS', 2))
+JOB_QUEUE_LIMIT = int(os.getenv('JOB_QUEUE_LIMIT', 50))  # 레인별 최대 대기 작업 수
+JOB_QUEUE_PER_CLIENT = int(os.getenv('JOB_QUEUE_PER_CLIENT', 3))  # 클라이언트(IP)별 레인당 최대 대기 작업 수
+# local: 웹 프로세스 내부 스케줄러에서 실행 / redis: 전역 대기열에 등록 후 worker.py 프로세스가 실행
+JOB_QUEUE_MODE = os.getenv('JOB_QUEUE_MODE', 'local').lower()
+
+# 서버 다운로드 공유 저장소 (URL/포맷/해상도 단위, 디스크 예산 초과 시 LRU 제거)
+ARTIFACT_FOLDER = os.getenv('ARTIFACT_FOLDER', os.path.join(DOWNLOAD_FOLDER, '_artifacts'))
+ARTIFACT_DISK_BUDGET = int(os.getenv('ARTIFACT_DISK_BUDGET_MB', 5120)) * 1024 * 1024  # 0이면 비활성화
+
+# 프록시 스트림 구간 캐시 (영상/포맷 단위 블록 파일, 디스크 예산 초과 시 LRU 제거)
+RANGE_CACHE_FOLDER = os.getenv('RANGE_CACHE_FOLDER', os.path.join(DOWNLOAD_FOLDER, '_range_cache'))
+RANGE_CACHE_BUDGET = int(os.getenv('RANGE_CACHE_BUDGET_MB', 2048)) * 1024 * 1024  # 0이면 비활성화
+RANGE_CACHE_BLOCK = int(os.getenv('RANGE_CACHE_BLOCK_KB', 1024)) * 1024  # 블록 크기 (존재 표시 단위)
+
+# 서버 다운로드 디스크 공간 입장 제어 — 예상 크기만큼 예약 후 다운로드
+DISK_MIN_FREE = int(os.getenv('DISK_MIN_FREE_MB', 1024)) * 1024 * 1024  # 항상 남겨 둘 여유 공간
+DISK_ADMISSION_WAIT = int(os.getenv('DISK_ADMISSION_WAIT', 300))  # 공간이 날 때까지 대기할 최대 시간 (초)
+DISK_RESERVATION_TTL = int(os.getenv('DISK_RESERVATION_TTL', 7200))  # 해제되지 않은 예약 자동 만료 (초)
+DISK_DEFAULT_ESTIMATE = int(os.getenv('DISK_DEFAULT_ESTIMATE_MB', 512)) * 1024 * 1024  # 크기 정보가 없을 때
+DISK_ESTIMATE_MARGIN = float(os.getenv('DISK_ESTIMATE_MARGIN', 1.2))  # 예상 크기 여유 배수
+
+# 직접 HTTP 파일 분할 다운로드 (Range 구간을 여러 연결로 동시 수신 — 연결당 속도 제한 회피)
+SEGMENT_DOWNLOAD_ENABLED = os.getenv('SEGMENT_DOWNLOAD_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+SEGMENT_MIN_SIZE = int(os.getenv('SEGMENT_MIN_SIZE_MB', 16)) * 1024 * 1024  # 이보다 작으면 단일 연결
+SEGMENT_SIZE = int(os.getenv('SEGMENT_SIZE_MB', 8)) * 1024 * 1024  # 구간(재시도 단위) 크기
+SEGMENT_CONNECTIONS_MIN = int(os.getenv('SEGMENT_CONNECTIONS_MIN', 2))  # 시작 연결 수
+SEGMENT_CONNECTIONS_MAX = int(os.getenv('SEGMENT_CONNECTIONS_MAX', 8))  # 처리량이 늘어나는 동안 이 수까지 연결 추가
+SEGMENT_RETRIES = int(os.getenv('SEGMENT_RETRIES', 3))  # 구간별 재시도 횟수
+
+# HLS 조각 동시 다운로드 수 — 호스트(CDN)별로 작업마다 처리량/재시도 비율을 보고 범위 안에서 조정
+HLS_CONCURRENCY_MIN = int(os.getenv('HLS_CONCURRENCY_MIN', 1))
+HLS_CONCURRENCY_MAX = int(os.getenv('HLS_CONCURRENCY_MAX', 8))
+HLS_CONCURRENCY_START = int(os.getenv('HLS_CONCURRENCY_START', 2))  # 기록 없는 호스트의 시작값
+HLS_ERROR_RATE_MAX = float(os.getenv('HLS_ERROR_RATE_MAX', 0.05))  # 조각 재시도 비율이 이보다 높으면 줄임
+HLS_EXPLORE_RATE = float(os.getenv('HLS_EXPLORE_RATE', 0.2))  # 이 확률로 최적값 대신 한 칸 옆 값을 시도 (탐색)
+HLS_HOST_TTL = int(os.getenv('HLS_HOST_TTL', 604800))  # 호스트별 기록 유지 (초, 7일)
+
+# m3u8 폴백 후보 사전 확인 — 후보를 동시에 조회해 응답 없는 후보를 거르고 첫 세그먼트 지연으로 순위 조정
+M3U8_PROBE_TIMEOUT = float(os.getenv('M3U8_PROBE_TIMEOUT', 10))  # 확인 1회 전체 제한 시간 (초)
+M3U8_PROBE_CANDIDATES = int(os.getenv('M3U8_PROBE_CANDIDATES', 8))  # 동시에 확인할 최대 후보 수
+
+# YoutubeDL 인스턴스 풀 — 같은 옵션의 추출/다운로드가 미리 만든 인스턴스 재사용 (0이면 매번 생성)
+YDL_POOL_SIZE = int(os.getenv('YDL_POOL_SIZE', 4))  # 프로세스당 유휴 인스턴스 수
+YDL_POOL_MAX_AGE = int(os.getenv('YDL_POOL_MAX_AGE', 600))  # 이 시간(초)이 지난 인스턴스는 새로 생성
+
+# 도메인별 단계 전략 — 단계(스트리밍/직접 링크/서버 다운로드) 결과 통계로 순서/생략/추출 타임아웃 결정
+STRATEGY_HALF_LIFE = int(os.getenv('STRATEGY_HALF_LIFE_HOURS', 72)) * 3600  # 통계 감쇠 반감기
+STRATEGY_MIN_SAMPLES = float(os.getenv('STRATEGY_MIN_SAMPLES', 5))  # 이만큼 (감쇠 후) 기록이 쌓인 단계만 조정
+STRATEGY_SKIP_RATE = float(os.getenv('STRATEGY_SKIP_RATE', 0.05))  # 성공률이 이보다 낮은 단계는 생략
+STRATEGY_EXPLORE_RATE = float(os.getenv('STRATEGY_EXPLORE_RATE', 0.1))  # 생략 대상 단계도 이 확률로 시도 (회복 감지)
+STRATEGY_TIMEOUT_MIN = int(os.getenv('STRATEGY_TIMEOUT_MIN', 10))  # 관측 기반 추출 타임아웃 범위 (초)
+STRATEGY_TIMEOUT_MAX = int(os.getenv('STRATEGY_TIMEOUT_MAX', 120))
+
+# 서버 파일 전송 오프로드 (/serve-file, /download 서버 파일 fallback)
+# none: Flask send_file / x-accel: nginx X-Accel-Redirect / x-sendfile: Apache·lighttpd X-Sendfile
+# sendfile: 앱에서 Range를 직접 처리하고 wsgi.file_wrapper로 넘겨 gunicorn이 os.sendfile로 전송
+FILE_OFFLOAD_MODE = os.getenv('FILE_OFFLOAD_MODE', 'none').lower()
+FILE_OFFLOAD_ACCEL_PREFIX = '/' + os.getenv('FILE_OFFLOAD_ACCEL_PREFIX', '/_downloads/').strip('/') + '/'  # nginx internal location
+
 # Redis 설정
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# 상태/메타데이터 값 인코딩 — json(평문) | zlib(압축 JSON) | msgpack(msgpack + 압축, 미설치 시 zlib)
+REDIS_CODEC = os.getenv('REDIS_CODEC', 'msgpack').lower()
+REDIS_CODEC_COMPRESS_MIN = int(os.getenv('REDIS_CODEC_COMPRESS_MIN', 256))  # 이 크기(바이트) 미만은 압축 생략
 
 # 스트리밍 모드 설정 - IP 숨김 기능
 IP_HIDE_MODE = os.getenv('IP_HIDE_MODE', 'true').lower() in ('true', '1', 'yes', 'on')
 
+# 메타데이터 캐시 — 프로세스 내 L1 용량, TTL은 포맷 URL 만료 시각(expire= 등) - 여유 시간
+METADATA_L1_MAX_BYTES = int(os.getenv('METADATA_L1_MAX_MB', 32)) * 1024 * 1024
+METADATA_TTL_MARGIN = int(os.getenv('METADATA_TTL_MARGIN', 300))  # 만료 전 여유 (초)
+METADATA_TTL_MIN = int(os.getenv('METADATA_TTL_MIN', 60))  # 남은 시간이 이보다 짧으면 캐시하지 않음
+METADATA_TTL_MAX = int(os.getenv('METADATA_TTL_MAX', 21600))
+
+# 스트리밍 URL 백그라운드 갱신 — 최근 접근한 결과의 서명 URL을 만료 LEAD초 전에 재추출
+STREAM_REFRESH_ENABLED = os.getenv('STREAM_REFRESH_ENABLED', 'true').lower() in ('true', '1', 'yes', 'on')
+STREAM_REFRESH_LEAD = int(os.getenv('STREAM_REFRESH_LEAD', 600))  # 만료 몇 초 전에 갱신할지
+STREAM_REFRESH_INTERVAL = int(os.getenv('STREAM_REFRESH_INTERVAL', 30))  # 갱신 대상 확인 주기 (초)
+STREAM_REFRESH_ACTIVE_WINDOW = int(os.getenv('STREAM_REFRESH_ACTIVE_WINDOW', 1800))  # 이 시간 안에 접근한 결과만 갱신
+STREAM_REFRESH_BATCH = int(os.getenv('STREAM_REFRESH_BATCH', 10))  # 주기당 최대 재추출 수
+
+# gunicorn preload 모드 (gunicorn.conf.py가 설정) — app import 시 워커 자원 초기화를 post_fork의 init_worker로 미룸
+APP_PRELOAD = os.getenv('APP_PRELOAD', 'false').lower() in ('true', '1', 'yes', 'on')
+
+# 업스트림 HTTP 연결 풀 (프록시/링크 검증/HTML 조회 공용)
+HTTP_POOL_MAX_HOSTS = int(os.getenv('HTTP_POOL_MAX_HOSTS', 32))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 16))  # 호스트당 유지 연결 수
+HTTP_POOL_IDLE_TIMEOUT = int(os.getenv('HTTP_POOL_IDLE_TIMEOUT', 90))  # 초
+
+# asyncio 엣지 서버 - 프록시 스트리밍 등 장시간 연결을 gthread 대신 이벤트 루프에서 처리
+EDGE_ENABLED = os.getenv('EDGE_ENABLED', 'false').lower() in ('true', '1', 'yes', 'on')
+EDGE_BASE_URL = os.getenv('EDGE_BASE_URL', '').rstrip('/')  # 비우면 같은 호스트의 /edge/ 경로
+EDGE_HOST = os.getenv('EDGE_HOST', '0.0.0.0')
+EDGE_PORT = int(os.getenv('EDGE_PORT', 5001))
+EDGE_TOKEN_TTL = int(os.getenv('EDGE_TOKEN_TTL', 21600))  # 6시간 (스트리밍 URL 유효기간)
+# EDGE_BASE_URL이 다른 오리진일 때 상태 SSE를 허용할 앱 오리진 (쉼표 구분, 예: https://example.com) — 비우면 같은 오리진만
+EDGE_ALLOWED_ORIGINS = [o.strip().rstrip('/') for o in os.getenv('EDGE_ALLOWED_ORIGINS', '').split(',') if o.strip()]
+
 # 영상 해상도 설정
 MAX_VIDEO_HEIGHT = int(os.getenv('MAX_VIDEO_HEIGHT', '1080'))
 
@@ -51,5 +147,8 @@ CACHE_CONFIG = {
 if not os.path.exists(DOWNLOAD_FOLDER):
     os.makedirs(DOWNLOAD_FOLDER)
 
+if ARTIFACT_DISK_BUDGET > 0 and not os.path.exists(ARTIFACT_FOLDER):
+    os.makedirs(ARTIFACT_FOLDER)
+
 if not os.path.exists('logs'):
     os.makedirs('logs')
@@ -0,0 +1,24 @@
+"""
+gunicorn 설정 — preload 모드 (Dockerfile: gunicorn --config gunicorn.conf.py ... app:app)
+
+GUNICORN_PRELOAD=true(기본)이면 마스터가 app을 한 번 import하고(yt-dlp 추출기 목록 포함) 워커는 fork로 공유한다.
+워커 부팅/재시작(max-requests)은 import 없이 fork만 하므로 빠르고, yt-dlp 메모리는 워커 수만큼 늘지 않는다.
+fork 이후에 만들어야 하는 자원(스케줄러 스레드, Redis/HTTP 연결 풀, 정리/갱신 스레드)은 post_fork에서 생성한다.
+"""
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('true', '1', 'yes', 'on')
+if preload_app:
+    os.environ['APP_PRELOAD'] = 'true'  # app import 시 워커 자원 초기화를 미룸 (config.APP_PRELOAD)
+
+
+def when_ready(server):
+    if preload_app:
+        import app
+        app.warm_preload()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import app
+        app.init_worker()
@@ -0,0 +1,98 @@
+"""
+Redis 값 직렬화 — 첫 바이트로 포맷을 구분해 기존 평문 JSON 키도 그대로 읽음
+
+  '{' / '['  평문 JSON (기존 키, REDIS_CODEC=json)
+  0x01       zlib(JSON)
+  0x02       msgpack
+  0x03       zlib(msgpack)
+
+REDIS_CODEC=msgpack은 msgpack 미설치 시 zlib(JSON)으로 대체한다.
+REDIS_CODEC_COMPRESS_MIN 바이트 미만 값은 압축하지 않는다 (작은 진행률 상태 등).
+"""
+import json
+import logging
+import threading
+import zlib
+
+from config import REDIS_CODEC, REDIS_CODEC_COMPRESS_MIN
+
+try:
+    import msgpack
+except ImportError:  # 선택 의존성
+    msgpack = None
+
+_ZLIB_JSON = 0x01
+_MSGPACK = 0x02
+_ZLIB_MSGPACK = 0x03
+_ZLIB_LEVEL = 1  # 속도 우선 — 서명 URL 반복 패턴은 레벨 1에서도 대부분 압축됨
+
+if REDIS_CODEC == 'msgpack' and msgpack is None:
+    logging.warning("msgpack 미설치 — REDIS_CODEC=zlib로 대체")
+    CODEC = 'zlib'
+elif REDIS_CODEC in ('json', 'zlib', 'msgpack'):
+    CODEC = REDIS_CODEC
+else:
+    logging.warning(f"알 수 없는 REDIS_CODEC={REDIS_CODEC} — json 사용")
+    CODEC = 'json'
+
+# 종류별 계측: kind → [저장 횟수, 압축 전 바이트 합, 저장 바이트 합]
+_stats_lock = threading.Lock()
+_stats: dict[str, list[int]] = {}
+
+
+def encode(obj, kind: str | None = None, codec: str | None = None) -> bytes:
+    """obj → Redis 저장용 bytes (kind 지정 시 크기 계측)"""
+    codec = codec or CODEC
+    if codec == 'msgpack':
+        body = msgpack.packb(obj, use_bin_type=True)
+        if len(body) >= REDIS_CODEC_COMPRESS_MIN:
+            raw = bytes([_ZLIB_MSGPACK]) + zlib.compress(body, _ZLIB_LEVEL)
+        else:
+            raw = bytes([_MSGPACK]) + body
+    else:
+        body = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode()
+        if codec == 'zlib' and len(body) >= REDIS_CODEC_COMPRESS_MIN:
+            raw = bytes([_ZLIB_JSON]) + zlib.compress(body, _ZLIB_LEVEL)
+        else:
+            raw = body  # 평문 JSON — 작은 값은 zlib 헤더 오버헤드가 더 큼
+
+    if kind:
+        with _stats_lock:
+            entry = _stats.setdefault(kind, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += len(body)
+            entry[2] += len(raw)
+    return raw
+
+
+def decode(raw):
+    """Redis 값 → 객체 (포맷 자동 판별), 비어 있으면 None"""
+    if not raw:
+        return None
+    if isinstance(raw, str):
+        return json.loads(raw)
+
+    header = raw[0]
+    if header == _ZLIB_JSON:
+        return json.loads(zlib.decompress(raw[1:]))
+    if header in (_MSGPACK, _ZLIB_MSGPACK):
+        if msgpack is None:
+            raise ValueError("msgpack 인코딩 값이지만 msgpack 미설치")
+        body = zlib.decompress(raw[1:]) if header == _ZLIB_MSGPACK else raw[1:]
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(raw)
+
+
+def stats() -> dict:
+    """종류별 키당 평균 저장 바이트 (압축 전 대비)"""
+    with _stats_lock:
+        snapshot = {k: list(v) for k, v in _stats.items()}
+    result = {'codec': CODEC}
+    for kind, (writes, body_bytes, stored_bytes) in snapshot.items():
+        result[kind] = {
+            'writes': writes,
+            'avg_uncompressed_bytes': body_bytes // writes,
+            'avg_bytes': stored_bytes // writes,
+            'ratio': round(stored_bytes / body_bytes, 3) if body_bytes else None,
+        }
+    return result
@@ -0,0 +1,112 @@
+"""
+업스트림 HTTP 연결 풀 — 호스트별 keep-alive 세션, 호스트 수/연결 수 제한, 유휴 제거, 재사용 통계
+
+프록시 탐색(Range)·직접 링크 검증·HTML 조회마다 새 TCP+TLS 핸드셰이크를 하지 않도록
+같은 호스트 요청은 하나의 requests.Session(urllib3 연결 풀)을 공유한다.
+"""
+import http.cookiejar
+import logging
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP_POOL_MAX_HOSTS, HTTP_POOL_MAXSIZE, HTTP_POOL_IDLE_TIMEOUT
+
+_lock = threading.Lock()
+_sessions: "OrderedDict[str, list]" = OrderedDict()  # origin → [session, last_used]
+_closed_stats = {"hits": 0, "misses": 0}  # 제거된 세션의 누적 통계
+
+
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    # 여러 사용자 요청이 세션을 공유하므로 업스트림 Set-Cookie를 저장하지 않음 (요청별 cookies= 인자는 그대로 전송)
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    # 리다이렉트로 다른 호스트에 연결될 수 있으므로 풀 몇 개는 여유로 둠
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _session_stats(session: requests.Session) -> tuple[int, int]:
+    """세션의 (재사용 요청 수, 새 연결 수) — urllib3 풀 카운터 기반"""
+    hits = misses = 0
+    for adapter in set(session.adapters.values()):
+        pools = getattr(adapter.poolmanager, "pools", None)
+        if pools is None:
+            continue
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            misses += pool.num_connections
+            hits += max(0, pool.num_requests - pool.num_connections)
+    return hits, misses
+
+
+def _close(session: requests.Session):
+    hits, misses = _session_stats(session)
+    _closed_stats["hits"] += hits
+    _closed_stats["misses"] += misses
+    try:
+        session.close()
+    except Exception:
+        pass
+
+
+def _evict_locked(now: float):
+    """유휴 세션 및 호스트 수 초과분(LRU) 제거 — _lock 보유 상태에서 호출"""
+    for origin in [o for o, (_, used) in _sessions.items() if now - used > HTTP_POOL_IDLE_TIMEOUT]:
+        _close(_sessions.pop(origin)[0])
+    while len(_sessions) > HTTP_POOL_MAX_HOSTS:
+        _, (session, _) = _sessions.popitem(last=False)
+        _close(session)
+
+
+def get_session(url: str) -> requests.Session:
+    """URL 호스트 전용 keep-alive 세션 반환"""
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}".lower()
+    now = time.monotonic()
+
+    with _lock:
+        entry = _sessions.get(origin)
+        if entry is None:
+            entry = [_new_session(), now]
+            _sessions[origin] = entry
+        else:
+            entry[1] = now
+        _sessions.move_to_end(origin)
+        _evict_locked(now)
+        return entry[0]
+
+
+def stats() -> dict:
+    """풀 통계 — hosts: 현재 세션 수, hits: 연결 재사용 요청 수, misses: 새 연결 수"""
+    with _lock:
+        hits, misses = _closed_stats["hits"], _closed_stats["misses"]
+        for session, _ in _sessions.values():
+            h, m = _session_stats(session)
+            hits += h
+            misses += m
+        return {"hosts": len(_sessions), "hits": hits, "misses": misses}
+
+
+def reset_after_fork():
+    """fork된 자식 프로세스에서 호출 — 부모와 공유하는 소켓은 닫지 않고 세션 목록만 비움"""
+    global _lock
+    _lock = threading.Lock()
+    _sessions.clear()
+
+
+def close_all():
+    """모든 세션 종료 (종료 시 정리용)"""
+    with _lock:
+        while _sessions:
+            _, (session, _) = _sessions.popitem()
+            _close(session)
+    logging.info("업스트림 HTTP 연결 풀 정리 완료")
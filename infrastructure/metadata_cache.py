@@ -1,17 +1,31 @@
 """
-yt-dlp 메타데이터 캐싱 모듈 — Redis 기반, 장애 시 캐시 없이 동작
+yt-dlp 메타데이터 캐싱 모듈 — 프로세스 내 L1(LRU, 바이트 상한) + Redis L2, Redis 장애 시 L1만 사용
+
+TTL은 포맷 URL의 만료 파라미터(expire= 등)에서 계산한다 — URL이 실제로 유효한 동안만 캐시.
+Redis 값은 infrastructure.codec으로 인코딩 (기존 평문 JSON 키도 읽음).
 """
 import hashlib
 import json
 import logging
+import threading
+import time
+from collections import OrderedDict
 
-from infrastructure import redis_client
+from config import METADATA_L1_MAX_BYTES, METADATA_TTL_MARGIN, METADATA_TTL_MIN, METADATA_TTL_MAX
+from infrastructure import redis_client, codec
+from utils.general import url_expiry
 
 _KEY_PREFIX = "dl:meta:"
-_DEFAULT_TTL = 1800  # 30분 (스트리밍 URL 유효기간 6시간 대비 안전 마진)
+_DEFAULT_TTL = 1800  # 30분 — URL에 만료 정보가 없을 때
+
+# L1: key → (만료 monotonic 시각, 크기, data)
+_l1_lock = threading.Lock()
+_l1: "OrderedDict[str, tuple[float, int, dict]]" = OrderedDict()
+_l1_bytes = 0
 
 # formats에서 캐싱할 필드만 선별 (전체 저장 시 수 MB)
-_FORMAT_FIELDS = ("url", "ext", "height", "vcodec", "acodec", "protocol", "format_id", "filesize")
+_FORMAT_FIELDS = ("url", "ext", "height", "vcodec", "acodec", "protocol", "format_id", "filesize",
+                  "filesize_approx", "tbr")
 
 
 def _make_key(url: str) -> str:
@@ -54,35 +68,114 @@ def _extract_cacheable(info: dict) -> dict:
     return result
 
 
+def _iter_urls(data: dict):
+    if data.get("url"):
+        yield data["url"]
+    for fmt in data.get("formats") or ():
+        if fmt.get("url"):
+            yield fmt["url"]
+    for entry in data.get("entries") or ():
+        yield from _iter_urls(entry)
+
+
+def _ttl_for(data: dict) -> int:
+    """포맷 URL 중 가장 먼저 만료되는 시각 - 여유 시간 기준 TTL (초), 캐시하면 안 되면 0"""
+    expiries = [e for e in (url_expiry(u) for u in _iter_urls(data)) if e]
+    if not expiries:
+        return _DEFAULT_TTL
+
+    remaining = int(min(expiries) - time.time()) - METADATA_TTL_MARGIN
+    if remaining < METADATA_TTL_MIN:
+        return 0
+    return min(remaining, METADATA_TTL_MAX)
+
+
+def _l1_size(data: dict) -> int:
+    """L1 용량 계산용 크기 — Redis 값은 압축돼 있으므로 평문 JSON 길이로 근사"""
+    return len(json.dumps(data, ensure_ascii=False))
+
+
+def _l1_get(key: str) -> dict | None:
+    global _l1_bytes
+    with _l1_lock:
+        entry = _l1.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del _l1[key]
+            _l1_bytes -= entry[1]
+            return None
+        _l1.move_to_end(key)
+        # 최상위 dict만 복사 — 호출자가 키를 바꿔도 캐시 원본은 유지 (formats 등 하위 값은 읽기 전용)
+        return dict(entry[2])
+
+
+def _l1_put(key: str, data: dict, size: int, ttl: int):
+    global _l1_bytes
+    if ttl <= 0 or size > METADATA_L1_MAX_BYTES:
+        return
+    with _l1_lock:
+        old = _l1.pop(key, None)
+        if old is not None:
+            _l1_bytes -= old[1]
+        _l1[key] = (time.monotonic() + ttl, size, data)
+        _l1_bytes += size
+        # 바이트 상한 초과분은 오래 사용하지 않은 항목부터 제거
+        while _l1_bytes > METADATA_L1_MAX_BYTES and _l1:
+            _, (_, evicted_size, _) = _l1.popitem(last=False)
+            _l1_bytes -= evicted_size
+
+
+def l1_stats() -> dict:
+    """L1 항목 수 / 사용 바이트"""
+    with _l1_lock:
+        return {"entries": len(_l1), "bytes": _l1_bytes}
+
+
 def get_cached_info(url: str) -> dict | None:
-    """Redis에서 캐시 조회, 없거나 Redis 불가 시 None"""
+    """L1 → Redis 순으로 캐시 조회, 없으면 None"""
+    key = _make_key(url)
+    data = _l1_get(key)
+    if data is not None:
+        logging.info(f"메타데이터 L1 캐시 히트: {url[:60]}")
+        return data
+
     if not redis_client.is_available():
         return None
 
     try:
-        r = redis_client.get_redis()
-        raw = r.get(_make_key(url))
+        raw = redis_client.get_redis_binary().get(key)
         if raw:
             logging.info(f"메타데이터 캐시 히트: {url[:60]}")
-            return json.loads(raw)
+            data = codec.decode(raw)
+            _l1_put(key, data, _l1_size(data), _ttl_for(data))
+            return dict(data)
     except Exception as e:
         logging.warning(f"메타데이터 캐시 조회 실패: {e}")
         redis_client.mark_unavailable()
     return None
 
 
-def set_cached_info(url: str, info: dict, ttl: int = _DEFAULT_TTL):
-    """캐싱 가능한 필드만 선별하여 Redis에 저장"""
+def set_cached_info(url: str, info: dict, ttl: int | None = None):
+    """캐싱 가능한 필드만 선별하여 L1 + Redis에 저장 — ttl 미지정 시 URL 만료 시각 기준"""
+    data = _extract_cacheable(info)
+    if not data:
+        return
+    if ttl is None:
+        ttl = _ttl_for(data)
+    if ttl <= 0:
+        logging.info(f"스트리밍 URL 만료 임박, 메타데이터 캐시 생략: {url[:60]}")
+        return
+
+    key = _make_key(url)
+    _l1_put(key, data, _l1_size(data), ttl)
+
     if not redis_client.is_available():
         return
 
     try:
-        data = _extract_cacheable(info)
-        if not data:
-            return
-        r = redis_client.get_redis()
-        r.setex(_make_key(url), ttl, json.dumps(data, ensure_ascii=False))
-        logging.info(f"메타데이터 캐시 저장: {url[:60]}")
+        redis_client.get_redis_binary().setex(key, ttl, codec.encode(data, 'metadata'))
+        logging.info(f"메타데이터 캐시 저장 (TTL {ttl}초): {url[:60]}")
     except Exception as e:
         logging.warning(f"메타데이터 캐시 저장 실패: {e}")
         redis_client.mark_unavailable()
@@ -10,6 +10,8 @@ from config import REDIS_URL
 
 _pool = None
 _redis = None
+_binary_pool = None
+_redis_binary = None
 _lock = threading.Lock()
 _available = True
 
@@ -37,6 +39,30 @@ def get_redis() -> redis.Redis:
     return _redis
 
 
+def get_redis_binary() -> redis.Redis:
+    """bytes 값용 Redis 인스턴스 (decode_responses=False) — codec 인코딩 값 읽기/쓰기"""
+    global _binary_pool, _redis_binary
+    with _lock:
+        if _redis_binary is None:
+            _binary_pool = redis.ConnectionPool.from_url(
+                REDIS_URL,
+                decode_responses=False,
+                max_connections=10,
+                socket_timeout=1,
+                socket_connect_timeout=1,
+                retry_on_timeout=False,
+            )
+            _redis_binary = redis.Redis(connection_pool=_binary_pool)
+    return _redis_binary
+
+
+def reset_after_fork():
+    """fork된 자식 프로세스(gunicorn preload 워커)에서 호출 — 부모의 연결 풀을 버리고 다음 사용 시 새로 생성"""
+    global _pool, _redis, _binary_pool, _redis_binary, _lock
+    _pool = _redis = _binary_pool = _redis_binary = None
+    _lock = threading.Lock()
+
+
 def is_available() -> bool:
     return _available
 
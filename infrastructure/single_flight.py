@@ -0,0 +1,109 @@
+"""
+동일 URL 추출 single-flight 모듈 — Redis 락 + 락 해제 폴링, 장애 시 그냥 실행
+
+같은 URL에 대한 추출이 여러 워커/스레드에서 동시에 요청되면 한 곳(리더)만 yt-dlp를 실행하고,
+나머지(대기자)는 리더의 락이 풀릴 때까지 기다린 뒤 공유 결과(메타데이터 캐시)를 읽어 간다.
+리더가 실패해 결과가 없으면 대기자들이 다시 락을 경쟁해 한 곳만 새 리더로 추출한다.
+대기자는 공용 연결 풀에서 짧은 EXISTS만 보내므로 대기자 수만큼 연결을 붙잡지 않는다.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+
+from infrastructure import redis_client
+from infrastructure.metadata_cache import _make_key
+
+_LOCK_PREFIX = "dl:sf:lock:"
+_LOCK_TTL = 180  # 스텔스 모드 socket_timeout(120초) + 여유
+_WAIT_TIMEOUT = _LOCK_TTL + 10  # 리더가 죽어도 락이 TTL로 사라지는 것을 볼 수 있도록 락 TTL보다 길게
+_MAX_ROUNDS = 3  # 리더 실패 후 락 재경쟁 횟수 — 넘으면 직접 추출
+_POLL_MIN = 0.05  # 락 해제 확인 간격 (초, 대기할수록 _POLL_MAX까지 늘림)
+_POLL_MAX = 1.0
+
+# 락 소유자일 때만 해제 (TTL 만료 후 다른 리더의 락을 지우지 않도록)
+_LUA_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+return 0
+"""
+
+
+def _suffix(url: str) -> str:
+    """metadata_cache 키와 동일한 해시 사용 — dl:meta:<h> → <h>"""
+    return _make_key(url).rsplit(":", 1)[-1]
+
+
+def _release(r, lock_key: str, token: str):
+    try:
+        r.eval(_LUA_RELEASE, 1, lock_key, token)
+    except Exception as e:
+        logging.warning(f"single-flight 락 해제 실패: {e}")
+
+
+def _wait_for_leader(r, lock_key: str, timeout: float) -> bool:
+    """리더 락이 풀릴 때까지 폴링 — 해제(완료 또는 TTL 만료) 시 True, 타임아웃 시 False"""
+    deadline = time.monotonic() + timeout
+    interval = _POLL_MIN
+    while r.exists(lock_key):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, _POLL_MAX)
+    return True
+
+
+def run(url: str, compute, load, *, lock_ttl: int = _LOCK_TTL, wait_timeout: float = _WAIT_TIMEOUT):
+    """URL 단위 single-flight 실행
+
+    Args:
+        url: 추출 대상 URL (metadata_cache 키와 동일하게 해시)
+        compute: 실제 추출 함수 — 결과를 공유 저장소(캐시)에 기록해야 함
+        load: 공유 저장소에서 결과를 읽는 함수 — 없으면 None
+
+    리더는 compute() 결과를 그대로 반환하고, 대기자는 load() 결과를 반환한다.
+    리더가 실패해서 공유 결과가 없으면 대기자들이 락을 다시 경쟁하고, 이긴 한 곳만 compute()를 실행한다.
+    """
+    if not redis_client.is_available():
+        return compute()
+
+    lock_key = f"{_LOCK_PREFIX}{_suffix(url)}"
+    token = f"{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex[:8]}"
+
+    for _ in range(_MAX_ROUNDS):
+        try:
+            r = redis_client.get_redis()
+            acquired = r.set(lock_key, token, nx=True, ex=lock_ttl)
+        except Exception as e:
+            logging.warning(f"single-flight 락 획득 실패, 직접 추출: {e}")
+            redis_client.mark_unavailable()
+            return compute()
+
+        if acquired:
+            try:
+                return compute()
+            finally:
+                _release(r, lock_key, token)
+
+        logging.info(f"동일 URL 추출 진행 중, 결과 대기: {url[:60]}")
+        try:
+            finished = _wait_for_leader(r, lock_key, wait_timeout)
+        except Exception as e:
+            logging.warning(f"single-flight 대기 실패, 직접 추출: {e}")
+            return compute()
+        if not finished:
+            logging.warning(f"single-flight 대기 타임아웃, 직접 추출: {url[:60]}")
+            return compute()
+
+        shared = load()
+        if shared is not None:
+            logging.info(f"single-flight 결과 공유: {url[:60]}")
+            return shared
+        logging.info(f"리더 추출 결과 없음, 락 재경쟁: {url[:60]}")
+
+    logging.warning(f"single-flight 리더가 {_MAX_ROUNDS}회 연속 실패, 직접 추출: {url[:60]}")
+    return compute()
@@ -0,0 +1,111 @@
+"""
+서버 다운로드 결과 공유 저장소 — URL/포맷/해상도 단위 콘텐츠 주소, 디스크 예산 LRU 제거
+
+같은 영상을 여러 사용자가 서버 다운로드로 요청해도 원본에서는 한 번만 받는다.
+저장소 파일은 file_id 폴더에 하드링크(불가 시 복사)로 연결되므로 file_id 폴더가 정리돼도 유지된다.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from config import ARTIFACT_FOLDER, ARTIFACT_DISK_BUDGET, MAX_VIDEO_HEIGHT, build_format_string
+from utils.general import safe_path_join, evict_lru_entries
+
+_VIDEO_EXTS = ('.mp4', '.webm', '.mkv', '.avi', '.mov')
+
+
+def _enabled() -> bool:
+    return ARTIFACT_DISK_BUDGET > 0
+
+
+def _artifact_key(url: str, max_height: int) -> str:
+    raw = f"{url}|{build_format_string(max_height)}|{max_height}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+def _find_video_file(directory: str) -> str | None:
+    try:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(_VIDEO_EXTS) and os.path.isfile(os.path.join(directory, name)):
+                return name
+    except OSError:
+        pass
+    return None
+
+
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def restore(url: str, max_height: int | None, download_path: str) -> bool:
+    """저장소에 같은 결과가 있으면 download_path로 연결 — 성공 시 True"""
+    if not _enabled():
+        return False
+    if max_height is None:
+        max_height = MAX_VIDEO_HEIGHT
+
+    entry = safe_path_join(ARTIFACT_FOLDER, _artifact_key(url, max_height))
+    file_name = _find_video_file(entry) if os.path.isdir(entry) else None
+    if not file_name:
+        return False
+
+    try:
+        os.makedirs(download_path, exist_ok=True)
+        _link_or_copy(safe_path_join(entry, file_name), safe_path_join(download_path, file_name))
+        # 최근 접근 시각 갱신 (LRU 기준)
+        now = time.time()
+        os.utime(entry, (now, now))
+        logging.info(f"공유 저장소 히트, 서버 다운로드 생략: {file_name}")
+        return True
+    except Exception as e:
+        logging.warning(f"공유 저장소 연결 실패: {e}")
+        return False
+
+
+def save(url: str, max_height: int | None, download_path: str):
+    """서버 다운로드 완료 파일을 저장소에 등록 후 예산 초과분 제거"""
+    if not _enabled():
+        return
+    if max_height is None:
+        max_height = MAX_VIDEO_HEIGHT
+
+    file_name = _find_video_file(download_path)
+    if not file_name:
+        return
+
+    key = _artifact_key(url, max_height)
+    entry = safe_path_join(ARTIFACT_FOLDER, key)
+    if os.path.isdir(entry):
+        return
+
+    # 임시 디렉토리에 만든 뒤 rename — 다른 워커와 동시 저장해도 원자적
+    tmp = safe_path_join(ARTIFACT_FOLDER, f".{key}.{uuid.uuid4().hex[:8]}")
+    try:
+        os.makedirs(tmp)
+        _link_or_copy(safe_path_join(download_path, file_name), safe_path_join(tmp, file_name))
+        os.rename(tmp, entry)
+        logging.info(f"공유 저장소 등록: {file_name}")
+    except OSError as e:
+        logging.info(f"공유 저장소 등록 건너뜀: {e}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    evict()
+
+
+def evict():
+    """디스크 예산을 넘는 저장소 항목을 오래 접근하지 않은 순으로 제거"""
+    if not _enabled():
+        return
+    try:
+        removed = evict_lru_entries(ARTIFACT_FOLDER, ARTIFACT_DISK_BUDGET)
+        if removed:
+            logging.info(f"공유 저장소 LRU 정리: {removed}개 항목 삭제")
+    except Exception as e:
+        logging.error(f"공유 저장소 정리 중 오류: {e}")
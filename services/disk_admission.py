@@ -0,0 +1,252 @@
+"""
+디스크 공간 입장 제어 — 서버 다운로드 시작 전에 예상 크기만큼 DOWNLOAD_FOLDER 공간 예약
+
+예상 크기는 추출한 포맷의 filesize / filesize_approx / tbr×duration으로 계산한다.
+예약은 Redis(워커/프로세스 공용)에 기록하고, 예약 합계 + 새 작업이 예약 가능 공간을 넘으면 DiskSpaceWait를 낸다.
+호출자는 작업을 대기열로 되돌려 나중에 다시 시도하고(워커를 붙잡고 대기하지 않음),
+첫 거절부터 DISK_ADMISSION_WAIT초가 지나도 안 되면 DiskSpaceError를 낸다.
+
+  dl:disk:reserved  HASH file_id → 예약 바이트
+  dl:disk:leases    ZSET file_id → 예약 만료 시각 (워커가 죽어 해제 못 한 예약 회수)
+  dl:disk:waiting:<file_id>  첫 거절 시각 (대기 시간 한도 계산, DISK_ADMISSION_WAIT×2 뒤 만료)
+
+예약 가능 공간 = 여유 공간 - DISK_MIN_FREE + 예약 중인 작업이 이미 쓴 바이트(다운로드 폴더 크기, 예약량 한도).
+여유 공간에서는 진행 중인 다운로드가 쓴 만큼 이미 빠져 있으므로 다시 더해 이중 계산을 막는다.
+"""
+import contextlib
+import logging
+import os
+import shutil
+import threading
+import time
+
+import redis
+
+from config import DOWNLOAD_FOLDER, MAX_VIDEO_HEIGHT, DISK_MIN_FREE, DISK_ADMISSION_WAIT, DISK_RESERVATION_TTL, \
+    DISK_DEFAULT_ESTIMATE, DISK_ESTIMATE_MARGIN
+from infrastructure import redis_client
+from utils.general import safe_path_join
+
+_RESERVED_KEY = "dl:disk:reserved"
+_LEASES_KEY = "dl:disk:leases"
+_WAITING_PREFIX = "dl:disk:waiting:"
+RETRY_DELAY = 10  # 공간 부족 시 작업을 대기열로 되돌려 다시 시도할 간격 (초)
+
+# ── Redis Lua Script (만료 예약 회수 + 합계 확인 + 예약) ───────────
+_LUA_RESERVE = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[4])
+for _, id in ipairs(expired) do
+  redis.call('HDEL', KEYS[1], id)
+  redis.call('ZREM', KEYS[2], id)
+end
+local total = 0
+for _, v in ipairs(redis.call('HVALS', KEYS[1])) do total = total + tonumber(v) end
+total = total - tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0')
+if total + tonumber(ARGV[2]) > tonumber(ARGV[3]) then return -1 end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[5], ARGV[1])
+return total + tonumber(ARGV[2])
+"""
+_reserve_sha = None
+
+# ── Fallback (in-memory, 프로세스 내) ──────────────────────────────
+_fallback_lock = threading.Lock()
+_fallback_reserved: dict[str, tuple[int, float]] = {}  # file_id → (바이트, 만료 시각)
+_fallback_waiting: dict[str, float] = {}  # file_id → 첫 거절 시각
+
+
+class DiskSpaceError(Exception):
+    """디스크 공간 부족으로 서버 다운로드를 받을 수 없음"""
+
+    def __init__(self, message: str, status_code: int = 507):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DiskSpaceWait(Exception):
+    """지금은 공간이 없음 — retry_after초 뒤 다시 시도 (대기 한도 안)"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_size(info: dict | None, max_height: int | None = None) -> int:
+    """예상 파일 크기 (바이트) — max_height 이하 최고 화질 영상 + 영상/음성 분리 시 최고 음성"""
+    if info and info.get('entries'):
+        info = info['entries'][0]
+    if not info:
+        return DISK_DEFAULT_ESTIMATE
+    if max_height is None:
+        max_height = MAX_VIDEO_HEIGHT
+    duration = info.get('duration') or 0
+
+    def size_of(fmt: dict) -> float:
+        size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if not size and fmt.get('tbr') and duration:
+            size = fmt['tbr'] * 1000 / 8 * duration  # tbr: kbit/s
+        return size or 0
+
+    formats = info.get('formats') or [info]
+    videos = [f for f in formats if f.get('vcodec') != 'none' and (f.get('height') or 0) <= max_height]
+    audios = [f for f in formats if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')]
+
+    best = max(videos, key=lambda f: (f.get('height') or 0, size_of(f)), default=None)
+    size = size_of(best) if best else 0
+    if best and best.get('acodec') == 'none' and audios:
+        size += max(size_of(a) for a in audios)
+    if not size:
+        return DISK_DEFAULT_ESTIMATE
+    return int(size * DISK_ESTIMATE_MARGIN)
+
+
+def _disk_usage():
+    os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+    return shutil.disk_usage(DOWNLOAD_FOLDER)
+
+
+def _folder_bytes(file_id: str) -> int:
+    """작업 다운로드 폴더에 이미 쓴 바이트 (.part/조각 파일 포함)"""
+    total = 0
+    try:
+        stack = [safe_path_join(DOWNLOAD_FOLDER, file_id)]
+    except ValueError:
+        return 0
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+    return total
+
+
+def _capacity(reserved: dict[str, int], file_id: str) -> int:
+    """예약 가능한 바이트 — 여유 공간 - 최소 유지 공간 + 다른 예약 작업이 이미 쓴 바이트(예약량 한도)"""
+    written = sum(min(_folder_bytes(other), size) for other, size in reserved.items() if other != file_id)
+    return _disk_usage().free - DISK_MIN_FREE + written
+
+
+def _eval_reserve(r, file_id: str, size: int, capacity: int) -> int:
+    global _reserve_sha
+    now = time.time()
+    args = (file_id, size, capacity, now, now + DISK_RESERVATION_TTL)
+    if _reserve_sha is None:
+        _reserve_sha = r.script_load(_LUA_RESERVE)
+    try:
+        return r.evalsha(_reserve_sha, 2, _RESERVED_KEY, _LEASES_KEY, *args)
+    except redis.exceptions.NoScriptError:
+        _reserve_sha = r.script_load(_LUA_RESERVE)
+        return r.evalsha(_reserve_sha, 2, _RESERVED_KEY, _LEASES_KEY, *args)
+
+
+def _try_reserve(file_id: str, size: int) -> bool:
+    if redis_client.is_available():
+        try:
+            r = redis_client.get_redis()
+            reserved = {k: int(float(v)) for k, v in r.hgetall(_RESERVED_KEY).items()}
+            return _eval_reserve(r, file_id, size, _capacity(reserved, file_id)) >= 0
+        except Exception as e:
+            logging.warning(f"디스크 예약 실패, fallback 전환: {e}")
+            redis_client.mark_unavailable()
+
+    now = time.time()
+    with _fallback_lock:
+        for expired in [k for k, (_, until) in _fallback_reserved.items() if until <= now]:
+            del _fallback_reserved[expired]
+        reserved = {k: b for k, (b, _) in _fallback_reserved.items()}
+    capacity = _capacity(reserved, file_id)  # 폴더 크기 계산은 잠금 밖에서
+    with _fallback_lock:
+        total = sum(b for k, (b, _) in _fallback_reserved.items() if k != file_id)
+        if total + size > capacity:
+            return False
+        _fallback_reserved[file_id] = (size, now + DISK_RESERVATION_TTL)
+        return True
+
+
+def _waiting_since(file_id: str, now: float) -> float:
+    """첫 거절 시각 (없으면 now로 기록) — 작업이 대기열을 돌아 다른 워커/프로세스에서 재시도해도 유지"""
+    if redis_client.is_available():
+        try:
+            r = redis_client.get_redis()
+            key = f"{_WAITING_PREFIX}{file_id}"
+            r.set(key, now, nx=True, ex=DISK_ADMISSION_WAIT * 2)
+            return float(r.get(key) or now)
+        except Exception as e:
+            logging.warning(f"디스크 대기 시각 기록 실패: {e}")
+    with _fallback_lock:
+        return _fallback_waiting.setdefault(file_id, now)
+
+
+def _clear_waiting(file_id: str):
+    if redis_client.is_available():
+        try:
+            redis_client.get_redis().delete(f"{_WAITING_PREFIX}{file_id}")
+        except Exception as e:
+            logging.warning(f"디스크 대기 시각 삭제 실패: {e}")
+    with _fallback_lock:
+        _fallback_waiting.pop(file_id, None)
+
+
+def reserve(file_id: str, size: int):
+    """size 바이트 예약 — 공간이 없으면 DiskSpaceWait (첫 거절 후 DISK_ADMISSION_WAIT초가 지나면 DiskSpaceError)"""
+    if size > _disk_usage().total - DISK_MIN_FREE:
+        raise DiskSpaceError("Video is too large for server download")
+
+    if not _try_reserve(file_id, size):
+        now = time.time()
+        if now - _waiting_since(file_id, now) < DISK_ADMISSION_WAIT:
+            raise DiskSpaceWait(f"디스크 공간 대기: {file_id} ({size // 1048576}MB)", RETRY_DELAY)
+        _clear_waiting(file_id)
+        logging.warning(f"디스크 공간 부족으로 서버 다운로드 거절: {file_id} ({size // 1048576}MB)")
+        raise DiskSpaceError("Not enough disk space for server download. Please try again later.")
+    _clear_waiting(file_id)
+    logging.info(f"디스크 공간 예약: {file_id} ({size // 1048576}MB)")
+
+
+def release(file_id: str):
+    """예약 해제 — 다운로드 완료/실패 시"""
+    if redis_client.is_available():
+        try:
+            pipe = redis_client.get_redis().pipeline(transaction=True)
+            pipe.hdel(_RESERVED_KEY, file_id)
+            pipe.zrem(_LEASES_KEY, file_id)
+            pipe.execute()
+        except Exception as e:
+            logging.warning(f"디스크 예약 해제 실패 (만료 시 회수): {file_id} - {e}")
+    with _fallback_lock:
+        _fallback_reserved.pop(file_id, None)
+
+
+@contextlib.contextmanager
+def admitted(file_id: str, size: int):
+    """예약 후 블록 실행, 종료 시(성공/실패 무관) 해제 — 공간이 없으면 블록 실행 없이 DiskSpaceWait/DiskSpaceError"""
+    reserve(file_id, size)
+    try:
+        yield
+    finally:
+        release(file_id)
+
+
+def stats() -> dict:
+    """예약 현황 (/health 용)"""
+    reserved = 0
+    count = 0
+    if redis_client.is_available():
+        try:
+            values = redis_client.get_redis().hvals(_RESERVED_KEY)
+            reserved, count = sum(int(v) for v in values), len(values)
+        except Exception:
+            pass
+    with _fallback_lock:
+        reserved += sum(b for b, _ in _fallback_reserved.values())
+        count += len(_fallback_reserved)
+    try:
+        free = _disk_usage().free
+    except OSError:
+        free = None
+    return {"reservations": count, "reserved_bytes": reserved, "free_bytes": free}
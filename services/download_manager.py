@@ -4,15 +4,19 @@
 import gc
 import logging
 import os
+import random
 import shutil
+import time
 from datetime import datetime
 
 import yt_dlp
 
-from config import MAX_VIDEO_HEIGHT, build_format_string
-from infrastructure import metadata_cache
+from config import MAX_VIDEO_HEIGHT, STRATEGY_MIN_SAMPLES, STRATEGY_SKIP_RATE, STRATEGY_EXPLORE_RATE, \
+    STRATEGY_TIMEOUT_MIN, STRATEGY_TIMEOUT_MAX, build_format_string
 from services.download_utils import try_download_enhanced, get_video_info, extract_direct_download_link, \
-    validate_direct_download_link
+    validate_direct_download_link, ExtractionContext
+from services import artifact_store, disk_admission, progress, strategy_stats, stream_refresher
+from services.scheduler import QueueFullError, RetryLater
 from services.stats import update_download_stats
 from utils.general import safely_access_files, generate_error_id, safe_path_join, readable_size
 
@@ -136,8 +140,13 @@ def _filter_playable_formats(formats: list, max_height: int) -> list:
     return []
 
 
-def extract_streaming_urls(video_url, max_height=None):
-    """스트리밍 URL을 추출하는 함수 - 브라우저 직접 재생 우선, 강화된 우회 기능 추가"""
+def extract_streaming_urls(video_url, max_height=None, ctx: ExtractionContext | None = None,
+                           timeout: int | None = None):
+    """스트리밍 URL을 추출하는 함수 - 브라우저 직접 재생 우선, 강화된 우회 기능 추가
+
+    ctx: 작업 추출 컨텍스트 — 추출 결과를 이후 단계(직접 링크/메타데이터/다운로드)와 공유
+    timeout: 관측 소요 시간 기반 socket_timeout (plan_strategy) — 없으면 사이트 종류별 고정값
+    """
     from services.download_utils import get_random_user_agent, PROXY_LIST
     import random
     import time
@@ -162,10 +171,14 @@ def extract_streaming_urls(video_url, max_height=None):
                 'priority': 1
             }],
             'best_url': video_url,
+            'best_format_id': 'direct',
             'best_quality': 720,
             'best_ext': video_url.split('.')[-1].split('?')[0]
         }
 
+    if ctx is None:
+        ctx = ExtractionContext(video_url)
+
     # 2. 전략에 따른 yt-dlp 옵션 설정
     timeout_map = {
         'short': 15,
@@ -195,7 +208,7 @@ def extract_streaming_urls(video_url, max_height=None):
         'writethumbnail': False,
         'ignoreerrors': True,
         'no_check_certificate': True,
-        'socket_timeout': timeout_map[strategy['timeout_settings']],
+        'socket_timeout': timeout or timeout_map[strategy['timeout_settings']],
         'retries': 1,
         'fragment_retries': 1,
         'extractor_retries': 1,
@@ -218,7 +231,7 @@ def extract_streaming_urls(video_url, max_height=None):
     # 성인 사이트를 위한 특별한 우회 전략 - 쿠키 완전 제거
     if strategy.get('needs_stealth'):
         ydl_opts.update({
-            'socket_timeout': 120,  # 매우 긴 타임아웃
+            'socket_timeout': timeout or 120,  # 매우 긴 타임아웃
             'geo_bypass': True,
             'sleep_interval': 3,
             'max_sleep_interval': 8,
@@ -274,16 +287,8 @@ def extract_streaming_urls(video_url, max_height=None):
 
             logging.info(f"🎬 스마트 전략으로 비디오 정보 추출 시도 {attempt+1}/{max_attempts}: {video_url}")
 
-            # 캐시 확인 (첫 시도에서만)
-            info = None
-            if attempt == 0:
-                info = metadata_cache.get_cached_info(video_url)
-
-            if info is None:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(video_url, download=False)
-                if info:
-                    metadata_cache.set_cached_info(video_url, info)
+            # 첫 시도: 컨텍스트 보관본/캐시 확인 + 동시 요청 single-flight, 재시도: 바뀐 옵션으로 재추출
+            info = ctx.extract(ydl_opts, retry=attempt > 0)
 
             if not info:
                 logging.warning(f"❌ 비디오 정보 추출 실패: {video_url}")
@@ -320,6 +325,7 @@ def extract_streaming_urls(video_url, max_height=None):
                 'upload_date': info.get('upload_date'),
                 'streaming_urls': direct_playable_urls,
                 'best_url': best_format['url'],
+                'best_format_id': best_format['format_id'],
                 'best_quality': best_format['quality'],
                 'best_ext': best_format['ext']
             }
@@ -358,7 +364,43 @@ def extract_streaming_urls(video_url, max_height=None):
     return None
 
 
-def update_status_completed(file_id, update_status_callback, video_url, title, is_direct_link=False, direct_url=None, streaming_info=None, **extra_info):
+def plan_strategy(video_url) -> list[tuple[str, int | None]]:
+    """도메인별 단계 통계로 실행할 단계 순서와 스트리밍 추출 타임아웃 결정 — [(단계, socket_timeout), ...]
+
+    - 기록이 STRATEGY_MIN_SAMPLES 이상인 단계 중 성공률이 STRATEGY_SKIP_RATE 미만이면 생략
+      (STRATEGY_EXPLORE_RATE 확률로는 시도해 회복 감지)
+    - 모든 단계 기록이 충분하면 성공 1회당 평균 소요 시간(실패한 시도 포함)이 짧은 순, 아니면 기본 순서
+      (스트리밍 → 직접 링크 → 서버)
+    - 스트리밍 추출 타임아웃은 실제 추출한 성공 소요 시간 p95의 1.5배 (STRATEGY_TIMEOUT_MIN~MAX), 기록이 없으면 None (사이트 종류별 고정값)
+    """
+    domain = strategy_stats.domain_of(video_url)
+    try:
+        summary = strategy_stats.summary(domain)
+    except Exception as e:
+        logging.warning(f"전략 통계 조회 실패, 기본 순서 사용: {e}")
+        summary = {}
+
+    planned, reorder = [], True
+    for order, stage in enumerate(strategy_stats.STAGES):
+        stats = summary.get(stage)
+        if stats is None or stats['samples'] < STRATEGY_MIN_SAMPLES:
+            planned.append((0.0, order, stage, None))
+            reorder = False  # 기록이 부족한 단계가 있으면 순서는 기본값 유지
+            continue
+        if stats['success_rate'] < STRATEGY_SKIP_RATE and random.random() >= STRATEGY_EXPLORE_RATE:
+            logging.info(f"⏭️ {domain} {stage} 단계 생략 (성공률 {stats['success_rate']:.0%}, 기록 {stats['samples']:.0f}회)")
+            continue
+        timeout = None
+        if stage == 'streaming' and stats['p95'] is not None:  # socket_timeout을 쓰는 추출 단계만
+            timeout = int(min(max(stats['p95'] * 1.5, STRATEGY_TIMEOUT_MIN), STRATEGY_TIMEOUT_MAX))
+        planned.append((stats['seconds_per_success'], order, stage, timeout))
+
+    if reorder:
+        planned.sort()
+    return [(stage, timeout) for _, _, stage, timeout in planned]
+
+
+def update_status_completed(file_id, update_status_callback, video_url, title, is_direct_link=False, direct_url=None, streaming_info=None, max_height=None, **extra_info):
     """완료 상태 업데이트 로직 통합 - 스트리밍 정보 추가"""
     status_data = {
         'status': 'completed',
@@ -366,6 +408,7 @@ def update_status_completed(file_id, update_status_callback, video_url, title, i
         'title': title,
         'url': video_url,
         'is_direct_link': is_direct_link,
+        'max_height': max_height or MAX_VIDEO_HEIGHT,
         'timestamp': datetime.now().timestamp()
     }
 
@@ -385,6 +428,10 @@ def update_status_completed(file_id, update_status_callback, video_url, title, i
     update_status_callback(file_id, status_data)
     update_download_stats('completed')
 
+    # 서명 URL 만료 전 백그라운드 갱신 예약
+    if streaming_info:
+        stream_refresher.track(file_id, streaming_info)
+
 
 def handle_download_error(file_id, update_status_callback, video_url, download_path, error):
     """에러 처리 로직 통합 - 사용자에게는 친화적인 메시지만 표시"""
@@ -412,16 +459,39 @@ def handle_download_error(file_id, update_status_callback, video_url, download_p
         pass
 
 
-def download_video(video_url, file_id, download_path, update_status_callback, max_height=None):
-    """메인 다운로드 함수 - 스트리밍 우선, 서버 다운로드 fallback"""
-    server_download_success = False  # 서버 다운로드 성공 여부 추적
+def download_video(video_url, file_id, download_path, update_status_callback, max_height=None,
+                   plan=None, start=0, server_handoff=None):
+    """메인 다운로드 함수 - 스트리밍 우선, 서버 다운로드 fallback
 
-    try:
-        update_status_callback(file_id, {'status': 'processing', 'progress': 10})
-
-        # 1. 스트리밍 URL 추출 시도 (주요 방식)
+    단계 순서/생략과 스트리밍 추출 타임아웃은 도메인별 결과 통계로 정한다 (plan_strategy).
+    server_handoff(plan, index)가 있으면 서버 다운로드 단계부터는 그 함수로 server 레인에 넘기고 종료한다
+    (추출 레인 워커가 긴 다운로드/디스크 공간 대기를 붙잡지 않도록). 넘겨받은 작업은
+    download_video(..., plan=plan, start=index)로 남은 단계를 이어서 실행한다.
+    """
+    server_download_success = False  # 서버 다운로드 성공 여부 추적
+    handed_off = False  # 서버 다운로드 단계를 server 레인으로 넘겼는지
+    ctx = ExtractionContext(video_url)  # 모든 단계가 같은 추출 결과 공유
+    domain = strategy_stats.domain_of(video_url)
+    if plan is None:
+        plan = plan_strategy(video_url)
+    meta = {}
+
+    def load_meta():
+        """메타데이터 한 번만 조회 (서버DL 성공/실패 양쪽에서 재사용) — 추출 단계를 모두 생략했으면 조회하지 않음"""
+        if 'video_meta' not in meta:
+            meta['video_meta'] = None
+            if ctx.info is not None or any(stage in ('streaming', 'direct') for stage, _ in plan):
+                try:
+                    meta['video_meta'] = get_video_info(video_url, ctx=ctx)
+                except Exception as e:
+                    logging.warning(f"메타데이터 추출 실패: {e}")
+        video_meta = meta['video_meta'] or {}
+        return video_meta.get('title') or "Video", video_meta
+
+    def streaming_stage(timeout):
+        # 스트리밍 URL 추출 시도 (주요 방식)
         logging.info(f"🎬 스트리밍 URL 추출 시도: {video_url}")
-        streaming_info = extract_streaming_urls(video_url, max_height=max_height)
+        streaming_info = extract_streaming_urls(video_url, max_height=max_height, ctx=ctx, timeout=timeout)
 
         if streaming_info and streaming_info.get('best_url'):
             logging.info(f"✅ 스트리밍 URL 추출 성공, 서버 다운로드 없이 완료")
@@ -434,16 +504,19 @@ def download_video(video_url, file_id, download_path, update_status_callback, ma
                 streaming_info['title'],
                 is_direct_link=False,
                 streaming_info=streaming_info,
+                max_height=max_height,
                 thumbnail=streaming_info.get('thumbnail'),
                 duration=streaming_info.get('duration'),
                 uploader=streaming_info.get('uploader')
             )
-            return
+            return True
+        return False
 
-        # 2. 직접 다운로드 링크 시도 (백업 방식)
-        logging.info(f"🔗 스트리밍 실패, 직접 링크 시도: {video_url}")
+    def direct_stage(timeout):
+        # 직접 다운로드 링크 시도 (백업 방식)
+        logging.info(f"🔗 직접 링크 시도: {video_url}")
         try:
-            direct_link_info = extract_direct_download_link(video_url)
+            direct_link_info = extract_direct_download_link(video_url, ctx=ctx)
 
             if direct_link_info:
                 direct_url = direct_link_info['url']
@@ -459,32 +532,40 @@ def download_video(video_url, file_id, download_path, update_status_callback, ma
                         direct_link_info.get('title', 'Direct Link Video'),
                         is_direct_link=True,
                         direct_url=direct_url,
+                        max_height=max_height,
                         thumbnail=direct_link_info.get('thumbnail'),
                         duration=direct_link_info.get('duration'),
                         uploader=direct_link_info.get('uploader')
                     )
-                    return
+                    return True
         except Exception as e:
             logging.warning(f"직접 링크 추출 실패: {e}")
+        return False
 
-        # 메타데이터 한 번만 조회 (서버DL 성공/실패 양쪽에서 재사용)
-        video_meta = None
-        try:
-            video_meta = get_video_info(video_url)
-        except Exception as e:
-            logging.warning(f"메타데이터 추출 실패: {e}")
-
-        meta_title = (video_meta.get('title') if video_meta else None) or "Video"
-        meta_thumbnail = video_meta.get('thumbnail') if video_meta else None
-        meta_duration = video_meta.get('duration') if video_meta else None
-        meta_uploader = video_meta.get('uploader') if video_meta else None
+    def server_stage(timeout):
+        nonlocal server_download_success
+        meta_title, video_meta = load_meta()
 
-        # 3. 서버 다운로드 시도 (fallback 방식)
-        logging.info(f"⚠️ 스트리밍/직접링크 실패, 서버 다운로드 시도: {video_url}")
+        # 서버 다운로드 시도 (fallback 방식)
+        logging.info(f"⚠️ 서버 다운로드 시도: {video_url}")
         update_status_callback(file_id, {'status': 'downloading', 'progress': 30})
 
         try:
-            download_success = try_download_enhanced(video_url, download_path, use_cookies=True, max_height=max_height)
+            download_success = artifact_store.restore(video_url, max_height, download_path)
+            if not download_success:
+                # 예상 크기만큼 디스크 공간 예약 — 부족하면 작업을 대기열로 되돌려 재시도,
+                # 대기 한도를 넘으면 DiskSpaceError (원본 URL 제공으로 진행)
+                estimate = disk_admission.estimate_size(ctx.info, max_height)
+                with disk_admission.admitted(file_id, estimate):
+                    update_status_callback(file_id, {'status': 'downloading', 'message': 'Downloading on server...'})
+                    try:
+                        download_success = try_download_enhanced(
+                            video_url, download_path, use_cookies=True, max_height=max_height, ctx=ctx,
+                            progress_hook=progress.make_hook(file_id, start=30, end=95))
+                    finally:
+                        progress.finish(file_id)  # 완료 상태 이후 진행률이 덮어쓰지 않도록
+                if download_success:
+                    artifact_store.save(video_url, max_height, download_path)
 
             if download_success:
                 logging.info(f"✅ 서버 다운로드 성공: {video_url}")
@@ -503,19 +584,62 @@ def download_video(video_url, file_id, download_path, update_status_callback, ma
                             video_url,
                             meta_title,
                             is_direct_link=False,
+                            max_height=max_height,
                             file_name=file_name,
                             file_size=file_size,
-                            thumbnail=meta_thumbnail,
-                            duration=meta_duration,
-                            uploader=meta_uploader
+                            thumbnail=video_meta.get('thumbnail'),
+                            duration=video_meta.get('duration'),
+                            uploader=video_meta.get('uploader')
                         )
-                        return
+                        return True
 
+        except disk_admission.DiskSpaceWait as e:
+            # 재시도마다 진행 중 상태로 기록 — 대기열에서 기다리는 동안 상태 TTL 유지
+            update_status_callback(file_id, {'status': 'downloading', 'message': 'Waiting for disk space...'})
+            raise RetryLater(str(e), e.retry_after)
         except Exception as e:
             logging.warning(f"서버 다운로드도 실패: {e}")
+        return False
+
+    stages = {'streaming': streaming_stage, 'direct': direct_stage, 'server': server_stage}
 
-        # 4. 모든 방법 실패 — 원본 URL만으로 완료 처리
+    try:
+        if start == 0:
+            update_status_callback(file_id, {'status': 'processing', 'progress': 10})
+            logging.info(f"📐 {domain} 단계 계획: {', '.join(f'{stage}({timeout}s)' if timeout else stage for stage, timeout in plan)}")
+
+        for index in range(start, len(plan)):
+            stage, timeout = plan[index]
+            if stage == 'server' and server_handoff is not None:
+                update_status_callback(file_id, {'message': 'Waiting for a server download slot...'})
+                try:
+                    server_handoff(plan, index)
+                except QueueFullError as e:
+                    logging.warning(f"서버 다운로드 대기열 가득 참, 단계 생략: {file_id} - {e}")
+                    continue
+                handed_off = True
+                logging.info(f"📦 서버 다운로드 단계 server 레인으로 이관: {file_id}")
+                return
+
+            started, completed = time.monotonic(), False
+            extractions = ctx.extractions
+            try:
+                completed = stages[stage](timeout)
+            except RetryLater:
+                handed_off = True  # 같은 작업이 나중에 이 단계부터 다시 실행 — 폴더 보존, 결과 기록 안 함
+                raise
+            except Exception:
+                strategy_stats.record(domain, stage, False, time.monotonic() - started)
+                raise
+            # 이번 단계에서 원본 추출이 있었을 때만 소요 시간 분포에 반영 (캐시 적중·single-flight 대기 제외)
+            strategy_stats.record(domain, stage, completed, time.monotonic() - started,
+                                  extracted=ctx.extractions > extractions)
+            if completed:
+                return
+
+        # 모든 방법 실패 — 원본 URL만으로 완료 처리
         logging.warning(f"⚠️ 모든 다운로드 방법 실패, 원본 URL만 제공: {video_url}")
+        meta_title, video_meta = load_meta()
 
         update_status_completed(
             file_id,
@@ -523,25 +647,96 @@ def download_video(video_url, file_id, download_path, update_status_callback, ma
             video_url,
             meta_title,
             is_direct_link=False,
-            thumbnail=meta_thumbnail,
+            thumbnail=video_meta.get('thumbnail'),
             original_url=video_url
         )
 
+    except RetryLater:
+        raise
     except Exception as e:
         # 최상위 예외 처리
         handle_download_error(file_id, update_status_callback, video_url, download_path, e)
 
     finally:
-        # 서버 다운로드가 성공한 경우에는 파일을 보존
-        if not server_download_success:
+        # 서버 다운로드가 성공했거나 server 레인으로 넘긴 경우에는 파일을 보존
+        if not server_download_success and not handed_off:
             try:
                 if os.path.exists(download_path):
                     shutil.rmtree(download_path, ignore_errors=True)
                     logging.info(f"다운로드 폴더 정리 완료: {download_path}")
             except Exception:
                 pass
-        else:
+        elif server_download_success:
             logging.info(f"서버 다운로드 성공으로 파일 보존: {download_path}")
 
+        logging.info(f"원본 추출 {ctx.extractions}회: {video_url[:60]}")
+
         # 메모리 정리
         gc.collect()
+
+
+def do_server_download(file_id, video_url, download_path, update_status_callback, quality='best', direct_url=None):
+    """서버 다운로드 실행 (백그라운드 태스크)
+
+    direct_url: 직접 링크 결과의 검증된 파일 URL — 있으면 여러 연결로 분할 다운로드
+    """
+    try:
+        # 다운로드 시작 상태 업데이트
+        update_status_callback(file_id, {'server_download_status': 'downloading', 'server_download_progress': 0})
+
+        logging.info(f"서버 다운로드 시작: {file_id}, URL: {video_url[:50]}...")
+
+        # 공유 저장소 확인 후 없으면 실제 다운로드 실행
+        success = artifact_store.restore(video_url, None, download_path)
+        if not success:
+            # 크기 추정용 추출 (대부분 메타데이터 캐시 히트) — 같은 컨텍스트로 다운로드까지 재사용
+            ctx = ExtractionContext(video_url)
+            try:
+                info = get_video_info(video_url, ctx=ctx)
+            except Exception as e:
+                logging.warning(f"크기 추정용 추출 실패: {e}")
+                info = None
+
+            try:
+                with disk_admission.admitted(file_id, disk_admission.estimate_size(info)):
+                    update_status_callback(file_id, {'server_download_status': 'downloading'})
+                    try:
+                        success = try_download_enhanced(
+                            video_url, download_path, use_cookies=True, ctx=ctx, direct_url=direct_url,
+                            progress_hook=progress.make_hook(file_id, prefix='server_download_', start=0, end=95))
+                    finally:
+                        progress.finish(file_id)
+            except disk_admission.DiskSpaceWait as e:
+                # 공간이 날 때까지 워커를 붙잡지 않고 대기열로 되돌림
+                update_status_callback(file_id, {'server_download_status': 'queued'})
+                raise RetryLater(str(e), e.retry_after)
+            if success:
+                artifact_store.save(video_url, None, download_path)
+
+        if success:
+            # 다운로드된 파일 확인
+            files = safely_access_files(download_path)
+            if files:
+                file_name = files[0]
+                file_path = safe_path_join(download_path, file_name)
+                if os.path.isfile(file_path):
+                    file_size = os.path.getsize(file_path)
+                    logging.info(f"서버 다운로드 성공: {file_name} ({readable_size(file_size)})")
+
+                    update_status_callback(file_id, {
+                        'server_download_status': 'completed',
+                        'server_download_progress': 100,
+                        'server_file_name': file_name,
+                        'server_file_size': readable_size(file_size)
+                    })
+                    return
+
+        # 다운로드 실패
+        logging.error(f"서버 다운로드 실패: {file_id}")
+        update_status_callback(file_id, {'server_download_status': 'failed', 'server_download_error': 'Download failed'})
+
+    except RetryLater:
+        raise
+    except Exception as e:
+        logging.error(f"서버 다운로드 오류: {file_id} - {str(e)}", exc_info=True)
+        update_status_callback(file_id, {'server_download_status': 'failed', 'server_download_error': str(e)})
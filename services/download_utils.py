@@ -2,19 +2,21 @@
 다운로드 관련 유틸리티 함수들 - 향상된 버전
 """
 import base64
+import concurrent.futures
+import copy
 import html
 import logging
 import os
 import random
 import re
+import time
 from urllib.parse import urlsplit, urljoin, unquote
 
-import requests
-import yt_dlp
 from yt_dlp import YoutubeDL, DownloadError
 
-from config import MAX_FILE_SIZE, MAX_VIDEO_HEIGHT, build_format_string
-from infrastructure import metadata_cache
+from config import MAX_FILE_SIZE, MAX_VIDEO_HEIGHT, M3U8_PROBE_TIMEOUT, M3U8_PROBE_CANDIDATES, build_format_string
+from infrastructure import metadata_cache, single_flight, http_pool
+from services import hls_concurrency, segmented_download, ydl_pool
 
 # 프록시 설정 - 필요시 여기에 실제 프록시 서버 추가
 PROXY_LIST = [
@@ -71,7 +73,7 @@ def base_ydl_opts(detail_url: str, download_dir="/app/downloads", use_cookies=Fa
 
 def fetch_text(url: str, headers=None, timeout=10) -> str:
     """HTML 텍스트 가져오기 - 헤더 지원"""
-    r = requests.get(url, headers=headers or {"Accept":"text/html,*/*;q=0.1"}, timeout=timeout)
+    r = http_pool.get_session(url).get(url, headers=headers or {"Accept":"text/html,*/*;q=0.1"}, timeout=timeout)
     r.raise_for_status()
     return r.text
 
@@ -137,26 +139,168 @@ def find_m3u8_candidates(detail_url: str, text: str) -> list[str]:
         if u in seen:
             continue
         seen.add(u)
-        h = urlsplit(u).netloc.lower()
-        score = 0
-        score += 10 if h != host else 0
-        score += 6 if ("vod." in h or "cdn" in h) else 0
-        score += 3 if ("/vod-" in u or "/vod_" in u or "/kor_mov/" in u) else 0
-        scored.append((score, u))
+        scored.append((_score_m3u8_host(u, host), u))
     scored.sort(reverse=True)
     return [u for _, u in scored]
 
 
-def try_download_enhanced(detail_url: str, download_dir: str, *, ua: str | None = None, use_cookies=False, max_height: int | None = None) -> bool:
+def _score_m3u8_host(url: str, page_host: str) -> int:
+    """m3u8 후보 URL 점수 — 페이지 호스트가 아닌 CDN(vod.*, cdn) / VOD 경로 우선"""
+    h = urlsplit(url).netloc.lower()
+    score = 0
+    score += 10 if h != page_host else 0
+    score += 6 if ("vod." in h or "cdn" in h) else 0
+    score += 3 if ("/vod-" in url or "/vod_" in url or "/kor_mov/" in url) else 0
+    return score
+
+
+_LATENCY_PENALTY = 10  # 첫 세그먼트 지연 1초당 감점 (다른 호스트 가점과 같은 크기)
+
+
+def _playlist_lines(session, url: str, headers: dict) -> list[str]:
+    response = session.get(url, headers=headers, timeout=M3U8_PROBE_TIMEOUT)
+    response.raise_for_status()
+    lines = [line.strip() for line in response.text.lstrip('\ufeff').splitlines() if line.strip()]
+    if not lines or lines[0] != '#EXTM3U':
+        raise ValueError("m3u8 재생목록이 아님")
+    return lines
+
+
+def probe_m3u8(url: str, headers: dict | None = None) -> dict:
+    """m3u8 후보 확인 — 재생목록(마스터면 첫 변형) 조회부터 첫 세그먼트 응답까지 시간 측정, 실패 시 예외"""
+    headers = headers or {}
+    started = time.monotonic()
+    session = http_pool.get_session(url)
+    lines = _playlist_lines(session, url, headers)
+    variants = [urljoin(url, line) for prev, line in zip(lines, lines[1:]) if prev.startswith('#EXT-X-STREAM-INF')]
+    media_url = url
+    if variants:
+        media_url = variants[0]
+        lines = _playlist_lines(session, media_url, headers)
+    segments = [line for line in lines if not line.startswith('#')]
+    if not segments:
+        raise ValueError("세그먼트 없는 재생목록")
+
+    response = session.get(urljoin(media_url, segments[0]), headers={**headers, 'Range': 'bytes=0-0'},
+                           stream=True, timeout=M3U8_PROBE_TIMEOUT)
+    try:
+        response.raise_for_status()
+    finally:
+        response.close()
+    return {'variants': len(variants), 'segments': len(segments), 'latency': time.monotonic() - started}
+
+
+def rank_m3u8_candidates(candidates: list[str], detail_url: str, headers: dict | None = None) -> list[str]:
+    """m3u8 후보를 동시에 확인해 응답한 후보만 (호스트 점수 - 첫 세그먼트 지연 감점) 순으로 반환
+
+    확인은 최대 M3U8_PROBE_TIMEOUT초 — 후보를 하나씩 다운로드 시도하며 타임아웃을 기다리지 않는다.
+    아직 응답 없는 후보의 지연은 경과 시간 이상이므로, 응답한 후보가 그 점수 상한보다 높아지면 더 기다리지 않는다.
+    모두 응답하지 않으면 (확인 요청만 막는 원본일 수 있으므로) 호스트 점수 1순위 하나만 반환.
+    """
+    candidates = candidates[:M3U8_PROBE_CANDIDATES]
+    if not candidates:
+        return []
+    page_host = urlsplit(detail_url).netloc
+
+    started = time.monotonic()
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix='m3u8-probe')
+    futures = {pool.submit(probe_m3u8, url, headers): url for url in candidates}
+    pending, ranked = set(futures), []
+    while pending:
+        until = started + M3U8_PROBE_TIMEOUT
+        if ranked:
+            # 남은 후보의 점수 상한(호스트 점수 - 경과 시간 감점)이 현재 1위보다 낮아지는 시점까지만 대기
+            best = max(r[0] for r in ranked)
+            top = max(_score_m3u8_host(futures[f], page_host) for f in pending)
+            until = min(until, started + (top - best) / _LATENCY_PENALTY)
+        if time.monotonic() >= until:
+            break
+        done, pending = concurrent.futures.wait(pending, timeout=until - time.monotonic(),
+                                                return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            url = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.info(f"m3u8 후보 제외: {url[:100]} - {e}")
+                continue
+            score = _score_m3u8_host(url, page_host) - result['latency'] * _LATENCY_PENALTY
+            logging.info(f"m3u8 후보 확인: {url[:100]} (변형 {result['variants']}개, "
+                         f"첫 세그먼트 {result['latency'] * 1000:.0f}ms, 점수 {score:.1f})")
+            ranked.append((score, result['variants'], url))
+    pool.shutdown(wait=False, cancel_futures=True)
+    for future in pending:
+        logging.info(f"m3u8 후보 응답 대기 중단: {futures[future][:100]}")
+
+    if not ranked:
+        logging.warning("응답한 m3u8 후보 없음, 호스트 점수 1순위만 시도")
+        return candidates[:1]
+    ranked.sort(key=lambda r: (r[0], r[1]), reverse=True)
+    return [url for _, _, url in ranked]
+
+
+_PROGRESSIVE_EXTS = ('mp4', 'webm', 'mkv', 'mov', 'm4v')
+
+
+def _select_format(ydl: YoutubeDL, info: dict) -> dict | None:
+    """yt-dlp가 다운로드할 포맷 선택 결과 (다운로드 없이) — 단일 영상이 아니면 None"""
+    if info.get('_type', 'video') != 'video':
+        return None
+    return ydl.process_ie_result(copy.deepcopy(info), download=False)
+
+
+def _progressive_target(selected: dict | None) -> dict | None:
+    """선택된 포맷이 병합 없는 단일 HTTP 파일이면 그 포맷 (분할 다운로드 대상), 아니면 None"""
+    if not selected or selected.get('requested_formats'):
+        return None
+    if selected.get('protocol') not in ('http', 'https') or selected.get('ext') not in _PROGRESSIVE_EXTS:
+        return None
+    return selected if selected.get('url') else None
+
+
+def _fragment_host(selected: dict | None) -> str | None:
+    """선택된 포맷 중 조각(HLS/DASH) 다운로드의 호스트"""
+    for fmt in (selected or {}).get('requested_formats') or [selected or {}]:
+        protocol = fmt.get('protocol') or ''
+        if 'm3u8' in protocol or 'dash' in protocol:
+            return hls_concurrency.host_of(fmt.get('url'))
+    return None
+
+
+def _try_segmented(url: str, path: str, headers: dict | None, progress_hook) -> bool:
+    """분할 다운로드 시도 — 대상이 아니거나 실패하면 False (yt-dlp 단일 연결로 진행)"""
+    try:
+        return segmented_download.download(url, path, headers=headers, progress_hook=progress_hook)
+    except Exception as e:
+        logging.warning(f"분할 다운로드 실패, yt-dlp로 진행: {e}")
+        return False
+
+
+def try_download_enhanced(detail_url: str, download_dir: str, *, ua: str | None = None, use_cookies=False,
+                          max_height: int | None = None, ctx: "ExtractionContext | None" = None,
+                          progress_hook=None, direct_url: str | None = None) -> bool:
     """
     효율적인 다운로드 함수 - Docker 환경 대응 및 m3u8 실제 변환
     직접 링크 추출 시도 -> 실패 시 영상 다운로드로 fallback
+    ctx: 같은 작업의 추출 컨텍스트 — 전체 info가 있으면 재추출 없이 다운로드
+    progress_hook: yt-dlp progress_hooks 함수 (services.progress.make_hook)
+    direct_url: 검증된 직접 파일 URL — 있으면 분할 다운로드부터 시도
     """
     from urllib.parse import urlparse
 
     if max_height is None:
         max_height = MAX_VIDEO_HEIGHT
 
+    # 검증된 직접 파일 URL은 추출 없이 여러 연결로 분할 다운로드
+    if direct_url:
+        name = re.sub(r'[^\w.\-]', '_', unquote(os.path.basename(urlsplit(direct_url).path)))[:150] or 'video.mp4'
+        if not name.lower().endswith(tuple(f'.{ext}' for ext in _PROGRESSIVE_EXTS)):
+            name += '.mp4'
+        os.makedirs(download_dir, exist_ok=True)
+        if _try_segmented(direct_url, os.path.join(download_dir, name), {'User-Agent': ua or default_user_agent()},
+                          progress_hook):
+            return True
+
     # URL 분석으로 기본 정보 추출
     parsed = urlparse(detail_url)
     domain = parsed.netloc.lower()
@@ -178,6 +322,13 @@ def try_download_enhanced(detail_url: str, download_dir: str, *, ua: str | None
         # 스트리밍 프로토콜 처리 개선
         'http_chunk_size': 10485760,  # 10MB chunks
     })
+    # HLS 조각 동시 수는 호스트별 기록으로 정하고, 진행 훅/로거로 이번 작업 결과를 측정해 반영
+    # (매니페스트 호스트를 미리 알 수 없는 재추출 다운로드는 상세 페이지 호스트 기준)
+    page_host = hls_concurrency.host_of(detail_url)
+    monitor = hls_concurrency.FragmentMonitor(page_host, hls_concurrency.choose(page_host))
+    base['progress_hooks'] = [hook for hook in (progress_hook, monitor.hook) if hook is not None]
+    base['logger'] = monitor.logger
+    base['concurrent_fragment_downloads'] = monitor.concurrency
 
     # 도메인별 최적화된 설정
     if any(x in domain for x in ['youtube.com', 'youtu.be']):
@@ -237,39 +388,62 @@ def try_download_enhanced(detail_url: str, download_dir: str, *, ua: str | None
             'force_generic_extractor': True,
         })
 
-    # 1차: 최적화된 설정으로 한 번만 시도
-    try:
-        logging.info(f"스마트 다운로드 시도: {detail_url}")
-        with YoutubeDL(base) as ydl:
-            ydl.download([detail_url])
-
-        # 다운로드된 파일이 m3u8인지 확인하고 실제 비디오 파일인지 검증
-        downloaded_files = [f for f in os.listdir(download_dir) if os.path.isfile(os.path.join(download_dir, f))]
-        if downloaded_files:
-            for file in downloaded_files:
-                if file.endswith('.m3u8'):
-                    # m3u8 파일이 다운로드된 경우 삭제하고 실패로 처리
-                    os.remove(os.path.join(download_dir, file))
-                    logging.warning(f"⚠️ m3u8 파일이 다운로드됨, 삭제 후 폴백 시도")
-                    raise DownloadError("Downloaded m3u8 file instead of video")
-                elif any(file.endswith(ext) for ext in ['.mp4', '.webm', '.mkv', '.avi', '.mov']):
-                    logging.info(f"✅ 실제 비디오 파일 다운로드 성공: {file}")
-                    return True
-
-        logging.info(f"✅ 스마트 다운로드 성공")
-        return True
-    except DownloadError as e:
-        error_msg = str(e).lower()
-        logging.warning(f"⚠️ 기본 다운로드 실패: {str(e)}")
-
-        # 404나 접근 불가 오류는 바로 포기
-        if any(x in error_msg for x in ['404', 'not found', 'unavailable', 'private', 'removed']):
-            logging.warning(f"비디오 접근 불가, m3u8 폴백 건너뛰기")
-            raise e
-    except (ConnectionResetError, ConnectionAbortedError, OSError) as e:
-        logging.warning(f"⚠️ 네트워크 연결 오류: {str(e)}")
-    except Exception as e:
-        logging.warning(f"⚠️ 일반 오류: {str(e)}")
+    # 1차: 최적화된 설정으로 한 번만 시도 (같은 작업에서 추출이 이미 실패했으면 m3u8 폴백으로)
+    if ctx is not None and ctx.failed:
+        logging.info(f"이전 추출 실패, yt-dlp 다운로드 생략: {detail_url}")
+    else:
+        try:
+            logging.info(f"스마트 다운로드 시도: {detail_url}")
+            with ydl_pool.borrow(base) as ydl:
+                if ctx is not None and ctx.full:
+                    # 선택된 포맷이 단일 HTTP 파일이면 분할 다운로드, 아니면(병합/HLS 등) yt-dlp가 처리
+                    selected = _select_format(ydl, ctx.info)
+                    target = _progressive_target(selected)
+                    if target is not None and _try_segmented(target['url'], ydl.prepare_filename(target),
+                                                             target.get('http_headers'), progress_hook):
+                        return True
+                    host = _fragment_host(selected)
+                    if host:
+                        monitor.host, monitor.concurrency = host, hls_concurrency.choose(host)
+                        ydl.params['concurrent_fragment_downloads'] = monitor.concurrency
+                    # 이미 추출한 info 재사용 — 원본 재조회 없이 포맷 선택/다운로드만 수행
+                    try:
+                        ydl.process_ie_result(ctx.info, download=True)
+                    finally:
+                        monitor.finish()
+                else:
+                    try:
+                        ydl.download([detail_url])
+                    finally:
+                        monitor.finish()
+
+            # 다운로드된 파일이 m3u8인지 확인하고 실제 비디오 파일인지 검증
+            downloaded_files = [f for f in os.listdir(download_dir) if os.path.isfile(os.path.join(download_dir, f))]
+            if downloaded_files:
+                for file in downloaded_files:
+                    if file.endswith('.m3u8'):
+                        # m3u8 파일이 다운로드된 경우 삭제하고 실패로 처리
+                        os.remove(os.path.join(download_dir, file))
+                        logging.warning(f"⚠️ m3u8 파일이 다운로드됨, 삭제 후 폴백 시도")
+                        raise DownloadError("Downloaded m3u8 file instead of video")
+                    elif any(file.endswith(ext) for ext in ['.mp4', '.webm', '.mkv', '.avi', '.mov']):
+                        logging.info(f"✅ 실제 비디오 파일 다운로드 성공: {file}")
+                        return True
+
+            logging.info(f"✅ 스마트 다운로드 성공")
+            return True
+        except DownloadError as e:
+            error_msg = str(e).lower()
+            logging.warning(f"⚠️ 기본 다운로드 실패: {str(e)}")
+
+            # 404나 접근 불가 오류는 바로 포기
+            if any(x in error_msg for x in ['404', 'not found', 'unavailable', 'private', 'removed']):
+                logging.warning(f"비디오 접근 불가, m3u8 폴백 건너뛰기")
+                raise e
+        except (ConnectionResetError, ConnectionAbortedError, OSError) as e:
+            logging.warning(f"⚠️ 네트워크 연결 오류: {str(e)}")
+        except Exception as e:
+            logging.warning(f"⚠️ 일반 오류: {str(e)}")
 
     # 2차: 향상된 m3u8 폴백 - 실제 비디오 파일로 변환 (Docker 환경 대응)
     logging.info("기본 다운로드 실패, 향상된 m3u8 폴백 시도 (Docker 환경)")
@@ -281,10 +455,14 @@ def try_download_enhanced(detail_url: str, download_dir: str, *, ua: str | None
             logging.warning("m3u8 후보를 찾을 수 없음")
             raise DownloadError("No m3u8 candidates found")
 
-        # 가장 유력한 후보들을 시도
+        # 후보를 동시에 확인해 응답한 후보만 빠른 순으로 시도
+        root = f"{urlsplit(detail_url).scheme}://{urlsplit(detail_url).netloc}/"
+        m3u8s = rank_m3u8_candidates(m3u8s, detail_url, {'User-Agent': ua or default_user_agent(), 'Referer': root})
         for i, m3u8_url in enumerate(m3u8s[:3]):  # 최대 3개까지만 시도
             logging.info(f"m3u8 후보 {i+1} 시도: {m3u8_url[:100]}...")
 
+            m3u8_host = hls_concurrency.host_of(m3u8_url)
+            m3u8_monitor = hls_concurrency.FragmentMonitor(m3u8_host, hls_concurrency.choose(m3u8_host))
             enhanced_base = {
                 **base,
                 "socket_timeout": 90,
@@ -294,8 +472,10 @@ def try_download_enhanced(detail_url: str, download_dir: str, *, ua: str | None
                 'hls_use_mpegts': False,
                 'format': f'best[height<={max_height}][ext=mp4]/best[height<={max_height}]',
                 'merge_output_format': 'mp4',
-                # 세그먼트를 하나의 파일로 병합
-                'concurrent_fragment_downloads': 4,
+                # 세그먼트 동시 수는 호스트별 기록으로 결정
+                'concurrent_fragment_downloads': m3u8_monitor.concurrency,
+                'progress_hooks': [hook for hook in (progress_hook, m3u8_monitor.hook) if hook is not None],
+                'logger': m3u8_monitor.logger,
                 'fragment_retries': 3,
                 # Docker 환경에서 쿠키 관련 오류 무시
                 'no_check_certificate': True,
@@ -304,8 +484,11 @@ def try_download_enhanced(detail_url: str, download_dir: str, *, ua: str | None
             enhanced_base.pop('cookiesfrombrowser', None)  # Docker에서 쿠키 제거
 
             try:
-                with YoutubeDL(enhanced_base) as ydl:
-                    ydl.download([m3u8_url])
+                try:
+                    with ydl_pool.borrow(enhanced_base) as ydl:
+                        ydl.download([m3u8_url])
+                finally:
+                    m3u8_monitor.finish()
 
                 # 다운로드된 파일 검증
                 downloaded_files = [f for f in os.listdir(download_dir) if os.path.isfile(os.path.join(download_dir, f))]
@@ -337,20 +520,70 @@ def try_download_enhanced(detail_url: str, download_dir: str, *, ua: str | None
         raise DownloadError("Both direct and m3u8 fallback failed")
 
 
-def get_video_info(url):
-    """비디오 정보 가져오기 (캐시 우선)"""
-    cached = metadata_cache.get_cached_info(url)
-    if cached:
-        return cached
+class ExtractionContext:
+    """작업 1건의 yt-dlp 추출 결과 공유 — 스트리밍/직접 링크/메타데이터/다운로드 단계가 같은 info 사용
+
+    한 번 추출한 전체 info dict를 보관하고, 추출이 실패했으면 이후 단계에서 원본을 다시 조회하지 않는다.
+    """
+
+    def __init__(self, url: str, use_cache=True):
+        self.url = url
+        self.use_cache = use_cache  # False면 메타데이터 캐시를 읽지 않음 (만료 전 갱신용)
+        self.info = None      # 전체 info 또는 메타데이터 캐시 축약본
+        self.full = False     # yt-dlp 전체 결과 여부 — 다운로드 단계에서 process_ie_result로 재사용 가능
+        self.failed = False   # 추출 실패 여부 — 이후 단계 재추출 생략
+        self.extractions = 0  # 원본 추출 횟수
+
+    def _extract(self, ydl_opts: dict):
+        self.extractions += 1
+        with ydl_pool.borrow(ydl_opts) as ydl:
+            info = ydl.extract_info(self.url, download=False)
+        if info:
+            metadata_cache.set_cached_info(self.url, info)
+            self.full = True
+        return info
+
+    def extract(self, ydl_opts: dict, *, retry=False):
+        """info 반환 — 보관본 → 메타데이터 캐시 → yt-dlp(동일 URL 동시 추출은 single-flight) 순
+
+        retry=True면 보관본/캐시/실패 기록을 무시하고 주어진 옵션으로 다시 추출한다.
+        """
+        if not retry:
+            if self.info is not None:
+                return self.info
+            if self.failed:
+                logging.info(f"이전 추출 실패, 재추출 생략: {self.url[:60]}")
+                return None
+            cached = metadata_cache.get_cached_info(self.url) if self.use_cache else None
+            if cached:
+                self.info = cached
+                return cached
+
+        try:
+            if retry or not self.use_cache:
+                info = self._extract(ydl_opts)
+            else:
+                info = single_flight.run(self.url, lambda: self._extract(ydl_opts),
+                                         lambda: metadata_cache.get_cached_info(self.url))
+        except Exception:
+            self.failed = True
+            raise
+
+        if info:
+            self.info = info
+            self.failed = False
+        else:
+            self.failed = True
+        return info
+
 
-    with yt_dlp.YoutubeDL({'quiet': False, 'simulate': True}) as ydl:
-        info = ydl.extract_info(url, download=False)
-    if info:
-        metadata_cache.set_cached_info(url, info)
-    return info
+def get_video_info(url, ctx: ExtractionContext | None = None):
+    """비디오 정보 가져오기 (추출 컨텍스트 → 캐시 우선)"""
+    ctx = ctx or ExtractionContext(url)
+    return ctx.extract({'quiet': False, 'simulate': True})
 
 
-def extract_direct_download_link(url):
+def extract_direct_download_link(url, ctx: ExtractionContext | None = None):
     """
     스마트한 직접 다운로드 링크 추출 - 재시도 없이 효율적으로
     """
@@ -398,13 +631,8 @@ def extract_direct_download_link(url):
         ydl_opts['socket_timeout'] = 45
 
     try:
-        # 캐시 확인
-        info = metadata_cache.get_cached_info(url)
-        if info is None:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-            if info:
-                metadata_cache.set_cached_info(url, info)
+        # 작업 컨텍스트 보관본/캐시 확인 후 없을 때만 추출
+        info = (ctx or ExtractionContext(url)).extract(ydl_opts)
 
         if not info:
             return None
@@ -449,12 +677,14 @@ def validate_direct_download_link(url):
             'Range': 'bytes=0-0'  # 첫 바이트만 요청하여 빠른 검증
         }
 
-        # HEAD 요청으로 파일 정보 확인
-        response = requests.head(url, headers=headers, timeout=10, allow_redirects=True)
+        # HEAD 요청으로 파일 정보 확인 (HEAD/GET이 같은 keep-alive 연결 재사용)
+        session = http_pool.get_session(url)
+        response = session.head(url, headers=headers, timeout=10, allow_redirects=True)
 
         # 성공적인 응답이 아니면 GET으로 재시도
         if response.status_code != 200:
-            response = requests.get(url, headers=headers, timeout=10, stream=True, allow_redirects=True)
+            response = session.get(url, headers=headers, timeout=10, stream=True, allow_redirects=True)
+            response.close()  # 헤더만 사용 — 본문은 읽지 않음
             if response.status_code != 200 and response.status_code != 206:
                 return {'valid': False, 'reason': f'상태 코드 오류: {response.status_code}'}
 
@@ -0,0 +1,214 @@
+"""
+asyncio 엣지 서버 — 장시간 연결(프록시 스트리밍, 상태 SSE) 전용 이벤트 루프 프로세스
+
+gunicorn gthread 워커는 프록시 시청자 1명당 HTTP 스레드 1개를 영상 길이만큼 점유한다.
+엣지 서버는 Flask가 발급한 토큰(/edge/proxy/<token>)을 받아 하나의 이벤트 루프에서
+다수의 Range 스트림을 중계하고, 상태 변경을 SSE(/edge/events/<file_id>)로 푸시한다.
+앞단(cloudflared 등)에서 /edge/ 경로를 이 프로세스로 라우팅한다.
+
+실행: python -m services.edge_server
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+
+import aiohttp
+import redis.asyncio as aioredis
+from aiohttp import web
+
+from config import EDGE_HOST, EDGE_PORT, EDGE_ALLOWED_ORIGINS, REDIS_URL
+from services.edge_tokens import TOKEN_PREFIX
+from services.status_manager import get_status, EVENTS_CHANNEL_PREFIX
+from utils.general import attachment_disposition
+
+_CHUNK_SIZE = 1048576  # 1MB — 동기 프록시와 동일
+_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# SSE로 내보내는 상태 필드 (streaming_info 등 대용량/내부 필드 제외)
+_EVENT_FIELDS = (
+    'status', 'progress', 'message', 'error', 'queue_position', 'speed', 'eta',
+    'server_download_status', 'server_download_progress', 'server_download_error',
+    'server_download_queue_position', 'server_download_speed', 'server_download_eta',
+    'server_file_name', 'server_file_size',
+)
+_EVENT_KEEPALIVE = 15  # 초 — 중간 프록시 유휴 연결 끊김 방지
+_EVENT_MAX_SECONDS = 600  # 연결 최대 유지 시간 (이후 EventSource가 자동 재연결)
+_FILE_ID_RE = re.compile(r'^[0-9a-f\-]+$')
+
+REDIS_KEY = web.AppKey("redis", aioredis.Redis)
+RESOLVER_KEY = web.AppKey("resolve_token", object)
+SESSION_KEY = web.AppKey("upstream_session", aiohttp.ClientSession)
+ACTIVE_KEY = web.AppKey("active_streams", dict)
+
+
+def _redis_resolver(client: aioredis.Redis):
+    """Redis에서 토큰 payload 조회하는 resolver 생성"""
+    async def resolve(token: str) -> dict | None:
+        try:
+            raw = await client.get(f"{TOKEN_PREFIX}{token}")
+        except Exception as e:
+            logging.warning(f"엣지 토큰 조회 실패: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    return resolve
+
+
+async def _upstream_session_ctx(app: web.Application):
+    """원본 서버 keep-alive 세션 — 프로세스 전체에서 공유"""
+    app[SESSION_KEY] = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=0, ttl_dns_cache=300),
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30),
+        auto_decompress=False,
+        cookie_jar=aiohttp.DummyCookieJar(),  # 모든 사용자 요청이 세션을 공유 — 업스트림 쿠키를 저장하지 않음
+    )
+    yield
+    await app[SESSION_KEY].close()
+    await app[REDIS_KEY].aclose()
+
+
+async def proxy_handler(request: web.Request) -> web.StreamResponse:
+    """토큰의 원본 URL을 Range 그대로 중계 (Content-Range/Accept-Ranges/Content-Disposition 유지)"""
+    payload = await request.app[RESOLVER_KEY](request.match_info['token'])
+    if not payload or not payload.get('url'):
+        return web.Response(status=404, text="Stream link expired. Please reload the page.")
+
+    url = payload['url']
+    headers = {'User-Agent': _USER_AGENT}
+    if 'Range' in request.headers:
+        headers['Range'] = request.headers['Range']
+
+    try:
+        upstream = await request.app[SESSION_KEY].get(url, headers=headers)
+    except asyncio.TimeoutError:
+        logging.error(f"엣지 프록시 타임아웃: {url[:100]}...")
+        return web.Response(status=504, text="Connection timed out. Please try again.")
+    except aiohttp.ClientError as e:
+        logging.error(f"엣지 프록시 네트워크 오류: {str(e)}")
+        return web.Response(status=502, text="A network error occurred during streaming.")
+
+    async with upstream:
+        if upstream.status >= 400:
+            logging.error(f"프록시 대상 URL에서 에러 응답: {upstream.status}, URL: {url[:100]}...")
+            return web.Response(status=502, text=f"Video source returned error ({upstream.status}). Please try again.")
+
+        response = web.StreamResponse(status=upstream.status)
+        response.content_type = 'video/mp4'
+        if 'Content-Length' in upstream.headers:
+            response.content_length = int(upstream.headers['Content-Length'])
+        if 'Content-Range' in upstream.headers:
+            response.headers['Content-Range'] = upstream.headers['Content-Range']
+        response.headers['Accept-Ranges'] = upstream.headers.get('Accept-Ranges', 'bytes')
+        if payload.get('force_download'):
+            response.headers['Content-Disposition'] = attachment_disposition(payload.get('filename') or 'video.mp4')
+
+        active = request.app[ACTIVE_KEY]
+        active['count'] += 1
+        try:
+            await response.prepare(request)
+            async for chunk in upstream.content.iter_chunked(_CHUNK_SIZE):
+                await response.write(chunk)
+            await response.write_eof()
+        except ConnectionResetError:
+            logging.info(f"클라이언트 연결 종료 (탐색/이탈): {url[:60]}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"스트리밍 중 청크 읽기 오류: {str(e)}")
+        finally:
+            active['count'] -= 1
+        return response
+
+
+def _event_view(status: dict) -> dict:
+    return {k: status[k] for k in _EVENT_FIELDS if k in status}
+
+
+async def _send_event(response: web.StreamResponse, data: dict):
+    await response.write(f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode())
+
+
+def _cors_headers(request: web.Request) -> dict[str, str]:
+    """EDGE_BASE_URL이 앱과 다른 오리진일 때 EventSource 허용 — EDGE_ALLOWED_ORIGINS에 있는 Origin만"""
+    origin = request.headers.get('Origin')
+    if origin and (origin in EDGE_ALLOWED_ORIGINS or '*' in EDGE_ALLOWED_ORIGINS):
+        return {'Access-Control-Allow-Origin': origin, 'Vary': 'Origin'}
+    return {}
+
+
+async def events_handler(request: web.Request) -> web.StreamResponse:
+    """상태 변경 SSE — 현재 상태 1회 전송 후 update_status 변경분을 병합하여 푸시"""
+    file_id = request.match_info['file_id']
+    if not _FILE_ID_RE.match(file_id):
+        return web.Response(status=400, text="Invalid file ID")
+
+    pubsub = request.app[REDIS_KEY].pubsub(ignore_subscribe_messages=True)
+    try:
+        # 구독 후 스냅샷 조회 — 그 사이 변경분을 놓치지 않도록 순서 유지
+        await pubsub.subscribe(f"{EVENTS_CHANNEL_PREFIX}{file_id}")
+        status = await asyncio.get_running_loop().run_in_executor(None, get_status, file_id, _EVENT_FIELDS)
+    except Exception as e:
+        logging.warning(f"SSE 구독 실패: {e}")
+        await pubsub.aclose()
+        return web.Response(status=503, text="Status events unavailable")
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        **_cors_headers(request),
+    })
+    view = _event_view(status)
+    try:
+        await response.prepare(request)
+        await response.write(b"retry: 3000\n\n")
+        await _send_event(response, view)
+
+        deadline = time.monotonic() + _EVENT_MAX_SECONDS
+        while time.monotonic() < deadline:
+            message = await pubsub.get_message(timeout=_EVENT_KEEPALIVE)
+            if not message:
+                await response.write(b": keepalive\n\n")
+                continue
+            updates = json.loads(message['data'])
+            changed = {k: v for k, v in updates.items() if k in _EVENT_FIELDS}
+            if changed:
+                view.update(changed)
+                await _send_event(response, view)
+    except ConnectionResetError:
+        pass
+    except Exception as e:
+        logging.warning(f"SSE 전송 중 오류: {e}")
+    finally:
+        await pubsub.aclose()
+    return response
+
+
+async def health_handler(request: web.Request) -> web.Response:
+    return web.json_response({'status': 'healthy', 'active_streams': request.app[ACTIVE_KEY]['count']})
+
+
+def create_app(resolve_token=None) -> web.Application:
+    """엣지 앱 생성 — resolve_token 미지정 시 Redis resolver 사용 (벤치마크는 dict resolver 주입)"""
+    app = web.Application()
+    app[REDIS_KEY] = aioredis.from_url(REDIS_URL, decode_responses=True, socket_connect_timeout=1)
+    app[RESOLVER_KEY] = resolve_token or _redis_resolver(app[REDIS_KEY])
+    app[ACTIVE_KEY] = {'count': 0}
+    app.cleanup_ctx.append(_upstream_session_ctx)
+    app.router.add_get('/edge/proxy/{token}', proxy_handler)
+    app.router.add_get('/edge/events/{file_id}', events_handler)
+    app.router.add_get('/edge/health', health_handler)
+    return app
+
+
+def main():
+    logging.basicConfig(
+        filename='logs/edge.log',
+        level=logging.ERROR,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    web.run_app(create_app(), host=EDGE_HOST, port=EDGE_PORT, access_log=None, print=None)
+
+
+if __name__ == '__main__':
+    main()
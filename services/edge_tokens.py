@@ -0,0 +1,41 @@
+"""
+엣지 서버 URL 발급 — 프록시 토큰(원본 URL을 노출하지 않는 불투명 토큰) 및 상태 이벤트(SSE) URL
+"""
+import hashlib
+import json
+import logging
+
+from config import EDGE_ENABLED, EDGE_BASE_URL, EDGE_TOKEN_TTL
+from infrastructure import redis_client
+
+TOKEN_PREFIX = "dl:edge:tok:"
+
+
+def _make_token(url: str, force_download: bool, filename: str | None) -> str:
+    # 같은 URL/옵션이면 같은 토큰 — 탐색(Range) 요청마다 새 키가 생기지 않도록
+    raw = f"{url}|{int(force_download)}|{filename or ''}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def issue_proxy_url(url: str, force_download=False, filename=None) -> str | None:
+    """엣지 프록시 URL 발급 — 엣지 비활성화/Redis 불가 시 None (기존 동기 프록시 사용)"""
+    if not EDGE_ENABLED or not redis_client.is_available():
+        return None
+
+    token = _make_token(url, force_download, filename)
+    payload = {'url': url, 'force_download': force_download, 'filename': filename}
+    try:
+        r = redis_client.get_redis()
+        r.setex(f"{TOKEN_PREFIX}{token}", EDGE_TOKEN_TTL, json.dumps(payload, ensure_ascii=False))
+    except Exception as e:
+        logging.warning(f"엣지 프록시 토큰 발급 실패, 동기 프록시 사용: {e}")
+        redis_client.mark_unavailable()
+        return None
+    return f"{EDGE_BASE_URL}/edge/proxy/{token}"
+
+
+def events_url(file_id: str) -> str | None:
+    """상태 SSE URL — 엣지 비활성화 시 None (페이지는 기존 폴링 사용)"""
+    if not EDGE_ENABLED:
+        return None
+    return f"{EDGE_BASE_URL}/edge/events/{file_id}"
@@ -0,0 +1,164 @@
+"""
+HLS 조각 동시 다운로드 수 조정 — 호스트(CDN)별로 작업마다 결과를 보고 다음 작업의 concurrent_fragment_downloads 결정
+
+yt-dlp는 다운로드 중에 조각 동시 수를 바꿀 수 없으므로 작업 단위로 언덕 오르기를 한다.
+작업은 보통 현재 최적값으로 실행하고, HLS_EXPLORE_RATE 확률로만 한 칸(step) 옮긴 값을 시도해
+progress_hooks로 잰 처리량이 더 좋으면 채택, 아니면 방향을 바꾼다. 조각 재시도 비율이 HLS_ERROR_RATE_MAX를 넘으면(속도 제한/차단) 한 칸 줄인다.
+
+  dl:hls:<host>  HASH  best(최적 동시 수) / best_rate(그때 처리량 bytes/s) / step(+1|-1)
+
+같은 호스트 작업이 동시에 끝나면 마지막 기록이 남는다 (추정치이므로 원자성 불필요).
+이전 최적 처리량은 기록마다 감쇠시켜 원본 상태가 바뀌면 다시 탐색한다.
+"""
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from config import HLS_CONCURRENCY_MIN, HLS_CONCURRENCY_MAX, HLS_CONCURRENCY_START, HLS_ERROR_RATE_MAX, \
+    HLS_EXPLORE_RATE, HLS_HOST_TTL
+from infrastructure import redis_client
+
+_KEY_PREFIX = "dl:hls:"
+_DECAY = 0.9  # 기록마다 이전 최적 처리량 감쇠
+_MIN_GAIN = 1.05  # 이 배수 이상 빨라야 새 값 채택
+
+# ── Fallback (in-memory) ─────────────────────────────────────────
+_fallback_lock = threading.Lock()
+_fallback_state: dict[str, dict] = {}
+
+
+def host_of(url: str | None) -> str | None:
+    if not url:
+        return None
+    return (urlsplit(url).hostname or '').lower() or None
+
+
+def _clamp(n: int) -> int:
+    return max(HLS_CONCURRENCY_MIN, min(HLS_CONCURRENCY_MAX, n))
+
+
+def _load(host: str) -> dict | None:
+    if redis_client.is_available():
+        try:
+            raw = redis_client.get_redis().hgetall(f"{_KEY_PREFIX}{host}")
+            if not raw:
+                return None
+            return {'best': int(raw['best']), 'best_rate': float(raw['best_rate']), 'step': int(raw['step'])}
+        except (KeyError, ValueError):
+            return None
+        except Exception as e:
+            logging.warning(f"HLS 동시 수 조회 실패, fallback 전환: {e}")
+            redis_client.mark_unavailable()
+    with _fallback_lock:
+        state = _fallback_state.get(host)
+        return dict(state) if state else None
+
+
+def _save(host: str, state: dict):
+    if redis_client.is_available():
+        try:
+            pipe = redis_client.get_redis().pipeline(transaction=True)
+            pipe.hset(f"{_KEY_PREFIX}{host}", mapping=state)
+            pipe.expire(f"{_KEY_PREFIX}{host}", HLS_HOST_TTL)
+            pipe.execute()
+            return
+        except Exception as e:
+            logging.warning(f"HLS 동시 수 기록 실패, fallback 전환: {e}")
+            redis_client.mark_unavailable()
+    with _fallback_lock:
+        _fallback_state[host] = state
+
+
+def choose(host: str | None) -> int:
+    """다음 작업의 조각 동시 수 — 기록된 최적값, HLS_EXPLORE_RATE 확률로 한 칸 옆 값 (기록 없으면 HLS_CONCURRENCY_START)"""
+    state = _load(host) if host else None
+    if state is None:
+        return _clamp(HLS_CONCURRENCY_START)
+    if random.random() >= HLS_EXPLORE_RATE:
+        return _clamp(state['best'])
+    candidate = _clamp(state['best'] + state['step'])
+    if candidate == state['best']:  # 경계에 닿으면 반대 방향 탐색
+        candidate = _clamp(state['best'] - state['step'])
+    return candidate
+
+
+def record(host: str, concurrency: int, rate: float, error_rate: float):
+    """작업 결과 반영 — 처리량(bytes/s)과 조각 재시도 비율로 최적값/탐색 방향 갱신"""
+    state = _load(host) or {'best': _clamp(HLS_CONCURRENCY_START), 'best_rate': 0.0, 'step': 1}
+    previous_rate = state['best_rate'] * _DECAY
+
+    if error_rate > HLS_ERROR_RATE_MAX:
+        state.update(best=_clamp(min(state['best'], concurrency) - 1), best_rate=previous_rate, step=-1)
+        logging.info(f"HLS 조각 재시도 {error_rate:.0%} — {host} 동시 수 {state['best']}로 축소")
+    elif rate > previous_rate * _MIN_GAIN:
+        if concurrency != state['best']:
+            state['step'] = 1 if concurrency > state['best'] else -1
+        state.update(best=concurrency, best_rate=rate)
+    elif concurrency == state['best']:
+        state['best_rate'] = max(previous_rate, rate)  # 최적값 실행 — 탐색 방향 유지
+    else:
+        state.update(best_rate=previous_rate, step=-state['step'])
+    _save(host, state)
+
+
+class _Logger:
+    """yt-dlp logger — 출력은 logging으로 넘기고 조각 재시도/건너뜀 경고 수 집계"""
+
+    def __init__(self, monitor: "FragmentMonitor"):
+        self._monitor = monitor
+
+    def debug(self, msg):
+        logging.debug(msg)
+
+    def info(self, msg):
+        logging.info(msg)
+
+    def warning(self, msg):
+        if 'Retrying fragment' in msg or ('fragment' in msg and 'skipping' in msg):
+            self._monitor.errors += 1
+        logging.warning(msg)
+
+    def error(self, msg):
+        logging.error(msg)
+
+
+class FragmentMonitor:
+    """작업 1건의 조각 다운로드 측정 — progress_hooks / logger로 처리량과 재시도 비율 수집"""
+
+    def __init__(self, host: str | None, concurrency: int):
+        self.host = host
+        self.concurrency = concurrency
+        self.errors = 0
+        self.logger = _Logger(self)
+        self._files: dict[str, tuple[int, int]] = {}  # 파일명 → (받은 바이트, 받은 조각 수)
+        self._started = None
+        self._last = None
+
+    def hook(self, d: dict):
+        if d.get('status') != 'downloading' or not d.get('fragment_count'):
+            return  # 조각 다운로드(HLS/DASH)만 측정
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+            if self.host is None:  # 시작 전에 몰랐으면 실제 매니페스트 호스트로 기록
+                self.host = host_of((d.get('info_dict') or {}).get('url'))
+        self._last = now
+        self._files[d.get('filename') or d.get('tmpfilename') or ''] = (
+            d.get('downloaded_bytes') or 0, d.get('fragment_index') or 0)
+
+    def finish(self):
+        """측정값 기록 — 조각 다운로드가 없었으면 무시"""
+        if not self.host or self._started is None or not self._files:
+            return
+        elapsed = max(self._last - self._started, 1e-3)
+        downloaded = sum(b for b, _ in self._files.values())
+        fragments = sum(n for _, n in self._files.values())
+        rate = downloaded / elapsed
+        error_rate = self.errors / max(fragments, 1)
+        logging.info(f"HLS {self.host}: 동시 {self.concurrency}, {rate / 1048576:.1f}MB/s, 재시도 {self.errors}/{fragments}")
+        try:
+            record(self.host, self.concurrency, rate, error_rate)
+        except Exception as e:
+            logging.warning(f"HLS 동시 수 기록 실패: {e}")
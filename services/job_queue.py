@@ -0,0 +1,293 @@
+"""
+전역 작업 대기열 — Redis 리스트 기반, 웹 프로세스는 등록만 하고 별도 워커 프로세스(worker.py)가 실행
+
+gunicorn 워커마다 스케줄러를 따로 두면 다운로드 용량이 워커 수로 정적으로 나뉘어
+한 워커에 몰린 요청은 다른 워커가 놀고 있어도 대기한다.
+JOB_QUEUE_MODE=redis면 모든 작업을 하나의 대기열에 넣고, 워커 프로세스를 호스트/코어 단위로 늘려 처리한다.
+레인/클라이언트 라운드로빈/대기열 상한/대기 순번 의미는 로컬 스케줄러(services.scheduler)와 동일하며,
+Redis 불가 시 로컬 스케줄러로 실행한다.
+
+키 구조 (<lane> = extract | server):
+  dl:jobs:<lane>:q:<client>  클라이언트별 작업 리스트 (JSON)
+  dl:jobs:<lane>:ring        대기 작업이 있는 클라이언트 라운드로빈 순서
+  dl:jobs:<lane>:size        레인 전체 대기 작업 수
+  dl:jobs:<lane>:ready       작업 1개당 토큰 1개 — 워커가 BLPOP으로 대기
+  dl:jobs:<lane>:delayed     RetryLater로 미룬 작업 ZSET (JSON → 재등록 시각), 워커가 시각이 되면 대기열로 되돌림
+  dl:jobs:<lane>:processing  실행 중 작업 ZSET (JSON → 리스 만료 시각) — 꺼낼 때 원자적으로 등록,
+                             실행 중에는 워커가 주기적으로 연장, 워커가 죽어 만료되면 대기열로 되돌림
+  dl:jobs:<lane>:positions   마지막으로 기록한 대기 순번 HASH (file_id → 순번) — 바뀐 작업만 상태 기록
+"""
+import json
+import logging
+import threading
+import time
+
+import redis
+
+from config import JOB_QUEUE_MODE, JOB_QUEUE_LIMIT, JOB_QUEUE_PER_CLIENT, REDIS_URL
+from infrastructure import redis_client
+from services import scheduler
+from services.download_manager import download_video, do_server_download
+from services.scheduler import QueueFullError, RetryLater, _fair_order, _position_update, _publish_positions, \
+    _run_job
+from services.status_manager import update_status
+
+_PREFIX = "dl:jobs:"
+_POLL_TIMEOUT = 5  # 초 — 워커 BLPOP 대기 (종료 신호 확인 주기)
+_LEASE_SECONDS = 60  # 실행 중 작업 리스 — _LEASE_SECONDS/3마다 연장, 연장이 끊기면 다른 워커가 다시 실행
+
+# 상한 초과 시 음수 반환: -1 클라이언트별 상한, -2 레인 전체 상한
+_LUA_ENQUEUE = """
+local queue = ARGV[1] .. ARGV[2]
+if redis.call('LLEN', queue) >= tonumber(ARGV[5]) then return -1 end
+if tonumber(redis.call('GET', KEYS[2]) or '0') >= tonumber(ARGV[4]) then return -2 end
+redis.call('RPUSH', queue, ARGV[3])
+if redis.call('LLEN', queue) == 1 then redis.call('RPUSH', KEYS[1], ARGV[2]) end
+redis.call('INCR', KEYS[2])
+redis.call('RPUSH', KEYS[3], '1')
+return 1
+"""
+
+# 차례인 클라이언트의 작업 1개를 꺼내 실행 중 목록(리스)에 넣고, 남은 작업이 있으면 차례를 맨 뒤로
+_LUA_DEQUEUE = """
+local client = redis.call('LPOP', KEYS[1])
+if not client then return false end
+local queue = ARGV[1] .. client
+local job = redis.call('LPOP', queue)
+if redis.call('LLEN', queue) > 0 then redis.call('RPUSH', KEYS[1], client) end
+if job then
+  redis.call('ZADD', KEYS[3], ARGV[2], job)
+  if tonumber(redis.call('GET', KEYS[2]) or '0') > 0 then redis.call('DECR', KEYS[2]) end
+end
+return job
+"""
+
+# 시각이 된 ZSET 항목(작업 JSON)을 각 클라이언트 대기열 끝으로 되돌림 — 이미 받은 작업이라 상한 미적용
+_LUA_REQUEUE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[2], 'LIMIT', 0, 100)
+for _, job in ipairs(due) do
+  redis.call('ZREM', KEYS[1], job)
+  local client = cjson.decode(job)['client'] or ''
+  local queue = ARGV[1] .. client
+  redis.call('RPUSH', queue, job)
+  if redis.call('LLEN', queue) == 1 then redis.call('RPUSH', KEYS[2], client) end
+  redis.call('INCR', KEYS[3])
+  redis.call('RPUSH', KEYS[4], '1')
+end
+return #due
+"""
+
+_blocking = None
+_inflight_lock = threading.Lock()
+_inflight: dict[str, str] = {}  # 이 프로세스에서 실행 중인 작업 JSON → 레인 (리스 연장 대상)
+_heartbeat = None  # BLPOP 전용 클라이언트 (공용 풀의 socket_timeout=1초보다 길게 대기)
+
+
+def _task_download_video(params: dict):
+    def server_handoff(plan, index):
+        # 서버 다운로드 단계는 server 레인 작업으로 — 같은 클라이언트 차례로 대기
+        submit('server', params.get('client', ''), params['file_id'], 'resume_download',
+               url=params['url'], download_path=params['download_path'], plan=plan, start=index)
+
+    download_video(params['url'], params['file_id'], params['download_path'], update_status,
+                   server_handoff=server_handoff)
+
+
+def _task_resume_download(params: dict):
+    download_video(params['url'], params['file_id'], params['download_path'], update_status,
+                   plan=params['plan'], start=params['start'])
+
+
+def _task_server_download(params: dict):
+    do_server_download(params['file_id'], params['url'], params['download_path'], update_status,
+                       params.get('quality', 'best'), direct_url=params.get('direct_url'))
+
+
+_TASKS = {
+    'download_video': _task_download_video,
+    'resume_download': _task_resume_download,
+    'server_download': _task_server_download,
+}
+
+
+def _keys(lane: str) -> tuple[str, str, str, str]:
+    base = f"{_PREFIX}{lane}:"
+    return f"{base}ring", f"{base}size", f"{base}ready", f"{base}q:"
+
+
+def _delayed_key(lane: str) -> str:
+    return f"{_PREFIX}{lane}:delayed"
+
+
+def _processing_key(lane: str) -> str:
+    return f"{_PREFIX}{lane}:processing"
+
+
+def _positions_key(lane: str) -> str:
+    return f"{_PREFIX}{lane}:positions"
+
+
+def submit(lane: str, client: str, file_id: str, task: str, **params):
+    """작업 등록 — redis 모드면 전역 대기열, 아니면(또는 Redis 불가 시) 로컬 스케줄러
+
+    대기열 상한 초과 시 QueueFullError
+    """
+    params['file_id'] = file_id
+    params['client'] = client
+    if JOB_QUEUE_MODE == 'redis' and redis_client.is_available():
+        ring, size, ready, queue_prefix = _keys(lane)
+        job = json.dumps({'task': task, 'file_id': file_id, 'client': client, 'params': params}, ensure_ascii=False)
+        try:
+            r = redis_client.get_redis()
+            result = r.eval(_LUA_ENQUEUE, 3, ring, size, ready,
+                            queue_prefix, client, job, JOB_QUEUE_LIMIT, JOB_QUEUE_PER_CLIENT)
+        except Exception as e:
+            logging.error(f"Redis 작업 등록 실패, 로컬 스케줄러 사용: {e}")
+            redis_client.mark_unavailable()
+        else:
+            if result == -1:
+                raise QueueFullError("Too many queued requests. Please wait for your current downloads to finish.", 429)
+            if result == -2:
+                raise QueueFullError("Server is busy. Please try again in a few minutes.", 503)
+            _publish_queue_positions(r, lane)
+            return
+
+    scheduler.submit(lane, client, file_id, _TASKS[task], params)
+
+
+def _publish_queue_positions(r, lane: str):
+    """전역 대기열의 현재 순번 중 마지막 기록과 달라진 것만 각 작업 상태에 기록"""
+    ring, _, _, queue_prefix = _keys(lane)
+    positions_key = _positions_key(lane)
+    try:
+        clients = r.lrange(ring, 0, -1)
+        pipe = r.pipeline(transaction=False)
+        for client in clients:
+            pipe.lrange(f"{queue_prefix}{client}", 0, -1)
+        pipe.hgetall(positions_key)
+        *queues, published = pipe.execute()
+    except Exception as e:
+        logging.warning(f"대기 순번 조회 실패: {e}")
+        return
+
+    current = {json.loads(raw)['file_id']: position for position, raw in enumerate(_fair_order(queues), start=1)}
+    changed = {file_id: position for file_id, position in current.items() if published.get(file_id) != str(position)}
+    gone = [file_id for file_id in published if file_id not in current]
+    if changed or gone:
+        try:
+            pipe = r.pipeline(transaction=False)
+            if changed:
+                pipe.hset(positions_key, mapping=changed)
+            if gone:
+                pipe.hdel(positions_key, *gone)
+            pipe.execute()
+        except Exception as e:
+            logging.warning(f"대기 순번 기록 실패: {e}")
+    _publish_positions([(file_id, _position_update(lane, position)) for file_id, position in changed.items()])
+
+
+def _get_blocking_client() -> redis.Redis:
+    global _blocking
+    if _blocking is None:
+        _blocking = redis.Redis.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            socket_timeout=_POLL_TIMEOUT + 5,
+            socket_connect_timeout=1,
+        )
+    return _blocking
+
+
+def _heartbeat_loop():
+    """이 프로세스에서 실행 중인 작업의 리스 연장 — 이미 회수된 작업(XX)은 다시 등록하지 않음"""
+    while True:
+        time.sleep(_LEASE_SECONDS / 3)
+        with _inflight_lock:
+            items = list(_inflight.items())
+        if not items:
+            continue
+        try:
+            pipe = redis_client.get_redis().pipeline(transaction=False)
+            deadline = time.time() + _LEASE_SECONDS
+            for raw, lane in items:
+                pipe.zadd(_processing_key(lane), {raw: deadline}, xx=True)
+            pipe.execute()
+        except Exception as e:
+            logging.warning(f"작업 리스 연장 실패: {e}")
+
+
+def _start_heartbeat():
+    global _heartbeat
+    with _inflight_lock:
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_heartbeat_loop, daemon=True, name="job-lease")
+            _heartbeat.start()
+
+
+def _requeue_due(r, lane: str):
+    """재등록 시각이 된 미룬 작업과 리스가 만료된 실행 중 작업(워커 종료)을 대기열로 되돌림"""
+    ring, size, ready, queue_prefix = _keys(lane)
+    now = time.time()
+    moved = r.eval(_LUA_REQUEUE_DUE, 4, _delayed_key(lane), ring, size, ready, queue_prefix, now)
+    expired = r.eval(_LUA_REQUEUE_DUE, 4, _processing_key(lane), ring, size, ready, queue_prefix, now)
+    if expired:
+        logging.warning(f"리스 만료 작업 {expired}개 재등록 ({lane})")
+    if moved or expired:
+        _publish_queue_positions(r, lane)
+
+
+def run_next(lane: str) -> bool:
+    """다음 작업 1개를 대기(최대 _POLL_TIMEOUT초) 후 실행 — 실행했으면 True (워커 프로세스용)"""
+    ring, size, ready, queue_prefix = _keys(lane)
+    r = redis_client.get_redis()
+    _start_heartbeat()
+    _requeue_due(r, lane)
+    if not _get_blocking_client().blpop([ready], timeout=_POLL_TIMEOUT):
+        return False
+
+    processing = _processing_key(lane)
+    raw = r.eval(_LUA_DEQUEUE, 3, ring, size, processing, queue_prefix, time.time() + _LEASE_SECONDS)
+    if not raw:
+        return False
+    _publish_queue_positions(r, lane)
+
+    job = json.loads(raw)
+    task = _TASKS.get(job.get('task'))
+    if task is None:
+        logging.error(f"알 수 없는 작업 유형: {job.get('task')}")
+        r.zrem(processing, raw)
+        return False
+
+    with _inflight_lock:
+        _inflight[raw] = lane
+    try:
+        _run_job(lane, job['file_id'], task, (job['params'],))
+    except RetryLater as e:
+        logging.info(f"작업 재등록 예약 ({lane}, {e.delay}초 후): {job['file_id']} - {e}")
+        job.setdefault('client', job['params'].get('client', ''))
+        pipe = r.pipeline(transaction=True)
+        pipe.zrem(processing, raw)
+        pipe.zadd(_delayed_key(lane), {json.dumps(job, ensure_ascii=False): time.time() + e.delay})
+        pipe.execute()
+        return True
+    finally:
+        with _inflight_lock:
+            _inflight.pop(raw, None)
+    r.zrem(processing, raw)
+    return True
+
+
+def stats() -> dict:
+    """대기열 모드 및 레인별 대기 작업 수 (redis 모드는 전역 값)"""
+    data = {'mode': JOB_QUEUE_MODE, 'local': scheduler.stats()}
+    if JOB_QUEUE_MODE == 'redis' and redis_client.is_available():
+        try:
+            r = redis_client.get_redis()
+            data['global'] = {
+                lane: {'queued': int(r.get(_keys(lane)[1]) or 0), 'delayed': r.zcard(_delayed_key(lane)),
+                       'processing': r.zcard(_processing_key(lane))}
+                for lane in ('extract', 'server')
+            }
+        except Exception as e:
+            logging.warning(f"전역 대기열 통계 조회 실패: {e}")
+    return data
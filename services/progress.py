@@ -0,0 +1,94 @@
+"""
+다운로드 진행률 보고 — yt-dlp progress_hooks → file_id별로 합쳐서 주기적으로 일괄 기록
+
+HLS는 조각마다 훅이 호출되므로 매번 Redis에 쓰지 않고 file_id별 최신 값만 모아 두었다가
+STATUS_PROGRESS_INTERVAL마다 모든 file_id의 변경분을 파이프라인 1회로 기록한다.
+완료/실패 상태를 쓰기 전에 finish()로 대기 중인 진행률을 버려 완료 후 덮어쓰기를 막는다.
+"""
+import logging
+import threading
+import time
+
+from config import STATUS_PROGRESS_INTERVAL
+from services.status_manager import update_statuses
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()  # 기록 중 finish()가 끼어들지 않도록
+_pending: dict[str, dict] = {}
+_started = False
+
+
+def _ensure_thread():
+    global _started
+    if _started:
+        return
+    _started = True
+    threading.Thread(target=_flush_loop, daemon=True, name="progress-writer").start()
+
+
+def report(file_id: str, data: dict):
+    """진행률 필드 갱신 예약 — 같은 주기 안의 값은 마지막 값만 기록"""
+    with _lock:
+        _pending.setdefault(file_id, {}).update(data)
+        _ensure_thread()
+
+
+def flush():
+    """대기 중인 진행률 일괄 기록"""
+    with _flush_lock:
+        with _lock:
+            if not _pending:
+                return
+            batch = dict(_pending)
+            _pending.clear()
+        try:
+            update_statuses(batch)
+        except Exception as e:
+            logging.warning(f"진행률 기록 실패: {e}")
+
+
+def finish(file_id: str):
+    """대기 중인 진행률 폐기 — 완료/실패 상태 기록 직전에 호출"""
+    with _flush_lock:
+        with _lock:
+            _pending.pop(file_id, None)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(STATUS_PROGRESS_INTERVAL)
+        flush()
+
+
+def make_hook(file_id: str, prefix: str = '', start: int = 0, end: int = 95):
+    """yt-dlp progress_hooks용 함수 생성
+
+    진행률은 start~end 구간으로 환산하고 줄어들지 않게 유지한다 (영상/음성 분리 다운로드 시 0%부터 다시 시작).
+    기록 필드: {prefix}progress, {prefix}speed (bytes/s), {prefix}eta (초), {prefix}downloaded_bytes, {prefix}total_bytes
+    """
+    state = {'progress': start}
+
+    def hook(d: dict):
+        if d.get('status') != 'downloading':
+            return
+        downloaded = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        if total:
+            fraction = downloaded / total
+        elif d.get('fragment_count'):
+            fraction = (d.get('fragment_index') or 0) / d['fragment_count']
+        else:
+            fraction = 0
+        progress = start + int((end - start) * min(1.0, fraction))
+        state['progress'] = max(state['progress'], progress)
+
+        update = {f'{prefix}progress': state['progress'], f'{prefix}downloaded_bytes': downloaded}
+        if total:
+            update[f'{prefix}total_bytes'] = int(total)
+        if d.get('speed') is not None:
+            update[f'{prefix}speed'] = int(d['speed'])
+        if d.get('eta') is not None:
+            update[f'{prefix}eta'] = int(d['eta'])
+        report(file_id, update)
+
+    return hook
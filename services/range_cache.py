@@ -0,0 +1,268 @@
+"""
+프록시 스트림 구간 캐시 — 원본에서 중계한 바이트를 블록 단위로 디스크에 저장하고 이후 Range 요청에 재사용
+
+인기 영상을 프록시로 볼 때 시청자/탐색마다 같은 구간을 원본에서 다시 받지 않도록
+영상(정규화 URL) + format_id 단위로 고정 크기(RANGE_CACHE_BLOCK) 블록을 저장한다.
+Range 요청은 있는 블록은 디스크에서 읽고, 빈 구간만 원본에 Range 요청해 중계하면서 함께 저장한다.
+
+  <RANGE_CACHE_FOLDER>/<key>/meta.json  {"size": 전체 바이트}
+  <RANGE_CACHE_FOLDER>/<key>/data       원본과 같은 오프셋에 기록하는 sparse 파일
+  <RANGE_CACHE_FOLDER>/<key>/blocks     블록 존재 표시 (블록당 1바이트 — 워커 간 동시 기록에도 읽고-고쳐-쓰기 없음)
+
+블록은 끝까지 기록된 뒤에만 존재 표시하므로 중간에 끊긴 블록은 다음 요청에서 다시 받는다.
+항목 크기는 실제 할당 크기로 계산해 RANGE_CACHE_BUDGET 초과 시 오래 접근하지 않은 항목부터 제거한다.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+from config import RANGE_CACHE_FOLDER, RANGE_CACHE_BUDGET, RANGE_CACHE_BLOCK
+from infrastructure import http_pool
+from utils.general import safe_path_join, evict_lru_entries, canonical_url
+
+_CHUNK = 1024 * 1024
+_EVICT_INTERVAL = 30  # 중계 중 LRU 정리 최소 간격 (초)
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+_stats_lock = threading.Lock()
+_stats = {'cache_bytes': 0, 'origin_bytes': 0}
+_last_evict = 0.0
+
+
+def enabled() -> bool:
+    return RANGE_CACHE_BUDGET > 0
+
+
+def cache_key(video_url: str | None, format_id: str | None) -> str | None:
+    """영상 URL + format_id → 캐시 키 (하나라도 없으면 None — 캐시하지 않음)"""
+    if not enabled() or not video_url or not format_id:
+        return None
+    raw = f"{canonical_url(video_url)}|{format_id}|{RANGE_CACHE_BLOCK}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+def _count(name: str, n: int):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def _fetch(url: str, headers: dict, start: int, end: int):
+    """원본에서 [start, end) 구간 수신"""
+    response = http_pool.get_session(url).get(url, headers={**headers, 'Range': f"bytes={start}-{end - 1}"},
+                                              stream=True, timeout=30)
+    try:
+        m = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+        if response.status_code != 206 or not m or int(m.group(1)) != start:
+            raise IOError(f"원본이 구간 요청에 응답하지 않음: {response.status_code}")
+        yield from response.iter_content(chunk_size=_CHUNK)
+    finally:
+        response.close()
+
+
+class CacheEntry:
+    """캐시 항목 (영상 + 포맷 1개)"""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self.blocks = -(-size // RANGE_CACHE_BLOCK)
+        self._data = os.path.join(path, 'data')
+        self._map = os.path.join(path, 'blocks')
+
+    def missing(self, start: int, end: int) -> list[tuple[int, int]]:
+        """[start, end) 중 없는 구간 — 블록 경계로 맞춘 (시작, 끝) 목록"""
+        with open(self._map, 'rb') as f:
+            present = f.read()
+        gaps = []
+        for block in range(start // RANGE_CACHE_BLOCK, (end - 1) // RANGE_CACHE_BLOCK + 1):
+            if block < len(present) and present[block]:
+                continue
+            gap_start = block * RANGE_CACHE_BLOCK
+            gap_end = min(gap_start + RANGE_CACHE_BLOCK, self.size)
+            if gaps and gaps[-1][1] == gap_start:
+                gaps[-1] = (gaps[-1][0], gap_end)
+            else:
+                gaps.append((gap_start, gap_end))
+        return gaps
+
+    def touch(self):
+        """최근 접근 시각 갱신 (LRU 기준)"""
+        now = time.time()
+        try:
+            os.utime(self.path, (now, now))
+        except OSError:
+            pass
+
+    def read(self, start: int, end: int):
+        """저장된 [start, end) 읽기"""
+        with open(self._data, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(_CHUNK, remaining))
+                if not chunk:
+                    raise IOError("구간 캐시 데이터가 잘림")
+                remaining -= len(chunk)
+                _count('cache_bytes', len(chunk))
+                yield chunk
+
+    def tee(self, chunks, offset: int):
+        """offset부터 오는 원본 바이트를 그대로 중계하면서 같은 오프셋에 기록 — 끝까지 받은 블록만 존재 표시"""
+        pos = offset
+        marked = -(-offset // RANGE_CACHE_BLOCK)  # offset이 블록 중간이면 다음 블록부터 완전한 블록
+        data_fd = map_fd = None
+        try:
+            data_fd = os.open(self._data, os.O_WRONLY)
+            map_fd = os.open(self._map, os.O_WRONLY)
+        except OSError as e:
+            logging.warning(f"구간 캐시 기록 불가: {e}")
+
+        try:
+            for chunk in chunks:
+                if map_fd is not None and pos < self.size:
+                    try:
+                        os.pwrite(data_fd, chunk[:self.size - pos], pos)
+                        written = min(pos + len(chunk), self.size)
+                        done = self.blocks if written >= self.size else written // RANGE_CACHE_BLOCK
+                        if done > marked:
+                            os.pwrite(map_fd, b'\x01' * (done - marked), marked)
+                            marked = done
+                    except OSError as e:
+                        logging.warning(f"구간 캐시 기록 중단: {e}")
+                        os.close(map_fd)
+                        map_fd = None
+                pos += len(chunk)
+                yield chunk
+        finally:
+            for fd in (data_fd, map_fd):
+                if fd is not None:
+                    os.close(fd)
+            _count('origin_bytes', pos - offset)
+            _maybe_evict()
+
+    def stream(self, start: int, end: int, url: str, headers: dict):
+        """[start, end) 중계 — 있는 블록은 디스크에서, 빈 구간만 원본에서 받아 저장하며 전달"""
+        self.touch()
+        pos = start
+        for gap_start, gap_end in self.missing(start, end):
+            if pos < gap_start:
+                yield from self.read(pos, gap_start)
+                pos = gap_start
+
+            # 빈 구간은 블록 경계까지 받아 저장하고 요청 범위만 전달
+            fetched = gap_start
+            for chunk in self.tee(_fetch(url, headers, gap_start, gap_end), gap_start):
+                lo, hi = max(fetched, pos), min(fetched + len(chunk), end)
+                if hi > lo:
+                    yield chunk[lo - fetched:hi - fetched]
+                fetched += len(chunk)
+            if fetched < gap_end:
+                raise IOError(f"원본 응답이 구간 끝 전에 종료: {fetched}/{gap_end}")
+            pos = min(gap_end, end)
+
+        if pos < end:
+            yield from self.read(pos, end)
+
+
+def open_entry(key: str | None) -> CacheEntry | None:
+    """기존 항목 열기 — 없으면 None"""
+    if not key:
+        return None
+    path = safe_path_join(RANGE_CACHE_FOLDER, key)
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            size = int(json.load(f)['size'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return CacheEntry(path, size)
+
+
+def create_entry(key: str | None, size: int) -> CacheEntry | None:
+    """항목 준비 — 이미 있으면 그대로, 크기가 다르면(원본 변경) 새로 만듦"""
+    if not key or size <= 0 or size > RANGE_CACHE_BUDGET:
+        return None
+
+    entry = open_entry(key)
+    if entry is not None:
+        if entry.size == size:
+            return entry
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+    # 임시 디렉토리에 만든 뒤 rename — 다른 워커와 동시 생성해도 원자적
+    path = safe_path_join(RANGE_CACHE_FOLDER, key)
+    tmp = safe_path_join(RANGE_CACHE_FOLDER, f".{key}.{uuid.uuid4().hex[:8]}")
+    try:
+        os.makedirs(tmp)
+        open(os.path.join(tmp, 'data'), 'wb').close()
+        with open(os.path.join(tmp, 'blocks'), 'wb') as f:
+            f.write(bytes(-(-size // RANGE_CACHE_BLOCK)))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'size': size}, f)
+        os.rename(tmp, path)
+    except OSError as e:
+        logging.debug(f"구간 캐시 항목 생성 건너뜀: {e}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    _maybe_evict()
+    entry = open_entry(key)
+    return entry if entry is not None and entry.size == size else None
+
+
+def entry_for_response(key: str | None, response) -> tuple[CacheEntry | None, int]:
+    """원본 응답 헤더로 전체 크기/시작 오프셋을 파악해 항목 준비 — 압축/크기 불명 응답은 (None, 0)"""
+    if not key or response.headers.get('Content-Encoding'):
+        return None, 0
+    if response.status_code == 206:
+        m = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+        if not m:
+            return None, 0
+        offset, size = int(m.group(1)), int(m.group(3))
+    elif response.status_code == 200 and response.headers.get('Content-Length', '').isdigit():
+        offset, size = 0, int(response.headers['Content-Length'])
+    else:
+        return None, 0
+    entry = create_entry(key, size)
+    if entry is not None:
+        entry.touch()
+    return entry, offset
+
+
+def evict():
+    """디스크 예산을 넘는 항목을 오래 접근하지 않은 순으로 제거"""
+    if not enabled():
+        return
+    try:
+        removed = evict_lru_entries(RANGE_CACHE_FOLDER, RANGE_CACHE_BUDGET, allocated=True)
+        if removed:
+            logging.info(f"구간 캐시 LRU 정리: {removed}개 항목 삭제")
+    except Exception as e:
+        logging.error(f"구간 캐시 정리 중 오류: {e}")
+
+
+def _maybe_evict():
+    global _last_evict
+    now = time.monotonic()
+    if now - _last_evict < _EVICT_INTERVAL:
+        return
+    _last_evict = now
+    evict()
+
+
+def stats() -> dict:
+    """프로세스별 캐시/원본 전송 바이트 (/health 용)"""
+    with _stats_lock:
+        cache_bytes, origin_bytes = _stats['cache_bytes'], _stats['origin_bytes']
+    total = cache_bytes + origin_bytes
+    return {
+        'enabled': enabled(),
+        'cache_bytes': cache_bytes,
+        'origin_bytes': origin_bytes,
+        'hit_ratio': round(cache_bytes / total, 3) if total else None,
+    }
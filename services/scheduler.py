@@ -0,0 +1,224 @@
+"""
+작업 스케줄러 — 레인별 워커(추출/서버 다운로드), 클라이언트 IP 단위 라운드로빈, 대기열 상한
+
+단일 ThreadPoolExecutor(FIFO, 무제한 대기열)에서는 한 사용자가 몇 분짜리 서버 다운로드를
+여러 개 넣으면 다른 사용자의 수 초짜리 스트리밍 URL 추출이 그 뒤에서 기다려야 했다.
+레인을 나누고, 레인 안에서는 클라이언트별 대기열을 번갈아 꺼내며, 대기 순번을 상태에 기록한다.
+작업이 RetryLater를 내면 워커를 놓고 delay초 뒤 같은 클라이언트 대기열 끝에 다시 들어간다 (디스크 공간 대기 등).
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+from services.status_manager import update_status
+
+# 레인별 대기 순번 상태 필드
+_POSITION_FIELDS = {
+    'extract': 'queue_position',
+    'server': 'server_download_queue_position',
+}
+
+
+class QueueFullError(Exception):
+    """대기열 상한 초과 — status_code: 클라이언트별 상한 429, 레인 전체 상한 503"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RetryLater(Exception):
+    """지금은 실행할 수 없는 작업 — delay초 뒤 같은 레인/클라이언트로 다시 등록"""
+
+    def __init__(self, message: str, delay: float):
+        super().__init__(message)
+        self.delay = delay
+
+
+_cond = threading.Condition()
+_lanes: dict[str, dict] = {}
+_shutdown = False
+
+
+def start(lane_workers: dict[str, int], queue_limit: int, per_client_limit: int):
+    """레인별 워커 스레드 시작 — 예: {'extract': 3, 'server': 1}"""
+    global _shutdown
+    with _cond:
+        _shutdown = False
+        for name, workers in lane_workers.items():
+            lane = {
+                'clients': OrderedDict(),  # client → deque[job], 순서 = 라운드로빈 차례
+                'delayed': [],  # (재등록 시각, client, job) — RetryLater로 미룬 작업
+                'size': 0,
+                'running': 0,
+                'queue_limit': queue_limit,
+                'per_client_limit': per_client_limit,
+                'threads': [],
+            }
+            _lanes[name] = lane
+            for i in range(max(1, workers)):
+                t = threading.Thread(target=_worker_loop, args=(name,), daemon=True, name=f"sched-{name}-{i}")
+                lane['threads'].append(t)
+                t.start()
+
+
+def submit(lane_name: str, client: str, file_id: str, fn, *args):
+    """작업 등록 — 대기열 상한 초과 시 QueueFullError"""
+    job = {'file_id': file_id, 'client': client, 'fn': fn, 'args': args, 'position': None}
+    with _cond:
+        if _shutdown:
+            raise QueueFullError("Server is shutting down. Please try again later.", 503)
+        lane = _lanes[lane_name]
+        queue = lane['clients'].get(client)
+        if queue is not None and len(queue) >= lane['per_client_limit']:
+            raise QueueFullError("Too many queued requests. Please wait for your current downloads to finish.", 429)
+        if lane['size'] >= lane['queue_limit']:
+            raise QueueFullError("Server is busy. Please try again in a few minutes.", 503)
+
+        if queue is None:
+            queue = lane['clients'][client] = deque()
+        queue.append(job)
+        lane['size'] += 1
+        changes = _reposition(lane_name, lane)
+        _cond.notify_all()
+    _publish_positions(changes)
+
+
+def _enqueue_delayed(lane: dict, now: float) -> bool:
+    """재등록 시각이 된 작업을 클라이언트 대기열로 — _cond 보유 상태에서 호출 (이미 받은 작업이라 상한 미적용)"""
+    due = [item for item in lane['delayed'] if item[0] <= now]
+    if not due:
+        return False
+    lane['delayed'] = [item for item in lane['delayed'] if item[0] > now]
+    for _, client, job in due:
+        job['position'] = None
+        lane['clients'].setdefault(client, deque()).append(job)
+        lane['size'] += 1
+    return True
+
+
+def _fair_order(queues: list) -> list:
+    """꺼내질 순서대로 대기 작업 나열 — 클라이언트 차례(queues 순서)대로 1개씩 번갈아"""
+    order = []
+    queues = [list(q) for q in queues]
+    depth = 0
+    while True:
+        row = [q[depth] for q in queues if depth < len(q)]
+        if not row:
+            return order
+        order.extend(row)
+        depth += 1
+
+
+def _position_update(lane_name: str, position: int) -> dict | None:
+    """대기 순번 상태 변경분 (0 = 실행 시작)"""
+    field = _POSITION_FIELDS.get(lane_name)
+    if not field:
+        return None
+    data = {field: position}
+    if lane_name == 'extract':
+        data['message'] = f'Waiting in queue (position {position})...' if position else 'Processing...'
+    return data
+
+
+def _reposition(lane_name: str, lane: dict) -> list[tuple[str, dict]]:
+    """순번이 바뀐 작업의 상태 변경분 계산 — _cond 보유 상태에서 호출"""
+    if lane_name not in _POSITION_FIELDS:
+        return []
+    changes = []
+    for position, job in enumerate(_fair_order(lane['clients'].values()), start=1):
+        if job['position'] == position:
+            continue
+        job['position'] = position
+        changes.append((job['file_id'], _position_update(lane_name, position)))
+    return changes
+
+
+def _publish_positions(changes: list[tuple[str, dict]]):
+    # 상태 저장(Redis)은 락 밖에서 수행
+    for file_id, data in changes:
+        try:
+            update_status(file_id, data)
+        except Exception as e:
+            logging.warning(f"대기 순번 기록 실패: {file_id} - {e}")
+
+
+def _next_job(lane_name: str, lane: dict):
+    """다음 차례 클라이언트의 작업 꺼내기 — _cond 보유 상태에서 호출"""
+    client, queue = next(iter(lane['clients'].items()))
+    job = queue.popleft()
+    if queue:
+        lane['clients'].move_to_end(client)
+    else:
+        del lane['clients'][client]
+    lane['size'] -= 1
+    return job, _reposition(lane_name, lane)
+
+
+def _worker_loop(lane_name: str):
+    lane = _lanes[lane_name]
+    while True:
+        with _cond:
+            while True:
+                _enqueue_delayed(lane, time.monotonic())
+                if lane['clients'] or _shutdown:
+                    break
+                # 미룬 작업이 있으면 가장 이른 재등록 시각까지만 대기
+                timeout = min(at for at, _, _ in lane['delayed']) - time.monotonic() if lane['delayed'] else None
+                _cond.wait(timeout)
+            if not lane['clients']:
+                return
+            job, changes = _next_job(lane_name, lane)
+            lane['running'] += 1
+
+        _publish_positions(changes)
+        try:
+            _run_job(lane_name, job['file_id'], job['fn'], job['args'])
+        except RetryLater as e:
+            logging.info(f"작업 재등록 예약 ({lane_name}, {e.delay}초 후): {job['file_id']} - {e}")
+            with _cond:
+                lane['delayed'].append((time.monotonic() + e.delay, job['client'], job))
+        finally:
+            with _cond:
+                lane['running'] -= 1
+
+
+def _run_job(lane_name: str, file_id: str, fn, args):
+    """작업 실행 — 실행 시작 순번(0) 기록, RetryLater는 호출자에게 전달, 그 외 예외는 로깅만"""
+    started = _position_update(lane_name, 0)
+    if started:
+        _publish_positions([(file_id, started)])
+    try:
+        fn(*args)
+    except RetryLater:
+        raise
+    except Exception as e:
+        logging.error(f"스케줄러 작업 실패 ({lane_name}): {file_id} - {e}", exc_info=True)
+
+
+def stats() -> dict:
+    """레인별 대기/실행 작업 수"""
+    with _cond:
+        return {
+            name: {'queued': lane['size'], 'running': lane['running'], 'delayed': len(lane['delayed']),
+                   'clients': len(lane['clients'])}
+            for name, lane in _lanes.items()
+        }
+
+
+def shutdown(wait=True, cancel_futures=False):
+    """스케줄러 종료 — cancel_futures면 대기 작업 폐기, wait면 실행 중 작업 완료까지 대기"""
+    global _shutdown
+    with _cond:
+        _shutdown = True
+        if cancel_futures:
+            for lane in _lanes.values():
+                lane['clients'].clear()
+                lane['delayed'].clear()
+                lane['size'] = 0
+        _cond.notify_all()
+        threads = [t for lane in _lanes.values() for t in lane['threads']]
+    if wait:
+        for t in threads:
+            t.join()
@@ -0,0 +1,213 @@
+"""
+직접 HTTP 파일 분할 다운로드 — SEGMENT_SIZE 구간을 여러 연결로 동시에 받아 미리 할당한 파일에 위치 지정 기록(pwrite)
+
+원본 CDN은 연결당 속도를 제한하는 경우가 많아 yt-dlp의 단일 연결(10MB http_chunk_size 순차 요청)로는
+회선 대역폭 일부만 쓴다. 연결 수는 SEGMENT_CONNECTIONS_MIN에서 시작해 두 배씩, 늘릴 때마다 전체 처리량이
+_GROWTH_GAIN배 이상 늘어나는 동안만 SEGMENT_CONNECTIONS_MAX까지 늘린다 (연결당 제한이 없는 원본에서는 곧 멈춤).
+구간은 최대 연결 수의 4배 이상으로 나눠(최대 SEGMENT_SIZE) 연결이 늘어도 나눠 받을 구간이 남게 한다.
+실패한 구간은 받은 지점부터 그 구간만 SEGMENT_RETRIES회까지 다시 받는다.
+
+Range 미지원 / 크기 불명 / SEGMENT_MIN_SIZE 미만 / MAX_FILE_SIZE 초과면 False를 반환하고 호출 측(yt-dlp)이 처리한다.
+"""
+import collections
+import logging
+import os
+import re
+import threading
+import time
+
+from config import MAX_FILE_SIZE, SEGMENT_DOWNLOAD_ENABLED, SEGMENT_MIN_SIZE, SEGMENT_SIZE, SEGMENT_CONNECTIONS_MIN, \
+    SEGMENT_CONNECTIONS_MAX, SEGMENT_RETRIES
+from infrastructure import http_pool
+
+_CHUNK = 256 * 1024
+_TIMEOUT = 30
+_PROBE_INTERVAL = 0.5  # 처리량 측정/진행률 보고 주기 (초)
+_GROWTH_GAIN = 1.1  # 연결을 늘린 뒤 처리량이 이 배수 이상이어야 계속 늘림
+_MIN_SEGMENT = 1024 * 1024
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+def probe(url: str, headers: dict | None = None) -> int | None:
+    """Range 지원 여부와 전체 크기 확인 — 지원하면 크기(바이트), 아니면 None"""
+    response = http_pool.get_session(url).get(url, headers={**(headers or {}), 'Range': 'bytes=0-0'},
+                                              stream=True, timeout=_TIMEOUT, allow_redirects=True)
+    try:
+        m = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+        if response.status_code != 206 or not m or response.headers.get('Content-Encoding'):
+            return None
+        return int(m.group(3))
+    finally:
+        response.close()
+
+
+class _SegmentedJob:
+    """분할 다운로드 1건의 공유 상태 — 남은 구간 큐, 받은 바이트, 오류"""
+
+    def __init__(self, url: str, headers: dict, fd: int, size: int):
+        self.url = url
+        self.headers = headers
+        self.fd = fd
+        self.size = size
+        self.downloaded = 0
+        self.error = None
+        self.retries = 0
+        self._lock = threading.Lock()
+        step = max(_MIN_SEGMENT, min(SEGMENT_SIZE, size // (SEGMENT_CONNECTIONS_MAX * 4)))
+        self._segments = collections.deque((start, min(start + step, size), 0) for start in range(0, size, step))
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._segments)
+
+    def take(self):
+        with self._lock:
+            if self.error is not None or not self._segments:
+                return None
+            return self._segments.popleft()
+
+    def retry(self, start: int, end: int, attempts: int, error: Exception):
+        """받은 지점 이후만 다시 큐 앞에 — 재시도 초과 시 전체 실패"""
+        with self._lock:
+            if attempts > SEGMENT_RETRIES:
+                self.error = error
+                return
+            self.retries += 1
+            self._segments.appendleft((start, end, attempts))
+
+    def add(self, n: int):
+        with self._lock:
+            self.downloaded += n
+
+    def fetch(self, start: int, end: int) -> int:
+        """[start, end) 수신 후 같은 오프셋에 기록 — 받은 끝 위치 반환 (중간에 끊기면 end보다 작음)"""
+        pos = start
+        response = http_pool.get_session(self.url).get(
+            self.url, headers={**self.headers, 'Range': f"bytes={start}-{end - 1}"}, stream=True, timeout=_TIMEOUT)
+        try:
+            m = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+            if response.status_code != 206 or not m or int(m.group(1)) != start:
+                raise IOError(f"구간 요청 실패: HTTP {response.status_code}")
+            for chunk in response.iter_content(chunk_size=_CHUNK):
+                if self.error is not None:
+                    break
+                chunk = chunk[:end - pos]
+                os.pwrite(self.fd, chunk, pos)
+                pos += len(chunk)
+                self.add(len(chunk))
+                if pos >= end:
+                    break
+        finally:
+            response.close()
+        return pos
+
+
+def _worker(job: _SegmentedJob):
+    while True:
+        segment = job.take()
+        if segment is None:
+            return
+        start, end, attempts = segment
+        pos = start
+        try:
+            pos = job.fetch(start, end)
+            if pos < end and job.error is None:
+                raise IOError(f"구간 수신 중단: {pos - start}/{end - start} 바이트")
+        except Exception as e:
+            logging.warning(f"구간 {start}-{end} 실패 ({attempts + 1}/{SEGMENT_RETRIES}회): {e}")
+            job.retry(pos, end, attempts + 1, e)
+            time.sleep(min(attempts + 1, 5))
+
+
+def download(url: str, dest_path: str, *, headers: dict | None = None, progress_hook=None) -> bool:
+    """url을 분할 다운로드해 dest_path에 저장 — 분할 대상이 아니면 False, 실패 시 IOError
+
+    progress_hook: yt-dlp progress_hooks 형식 dict를 받는 함수 (services.progress.make_hook)
+    """
+    if not SEGMENT_DOWNLOAD_ENABLED:
+        return False
+    headers = dict(headers or {})
+    size = probe(url, headers)
+    if size is None or size < SEGMENT_MIN_SIZE or size > MAX_FILE_SIZE:
+        return False
+
+    part_path = dest_path + '.part'
+    fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # 미리 할당 — 구간을 순서 없이 기록해도 파일 조각화/공간 부족을 시작 전에 드러냄
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):  # 미지원 플랫폼/파일시스템은 크기만 지정
+            os.ftruncate(fd, size)
+
+        job = _SegmentedJob(url, headers, fd, size)
+        connections = _run(job, progress_hook)
+    except BaseException:
+        os.close(fd)
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+    os.close(fd)
+
+    os.rename(part_path, dest_path)
+    logging.info(f"분할 다운로드 완료: {size // 1048576}MB, 연결 {connections}개, 구간 재시도 {job.retries}회")
+    if progress_hook is not None:
+        progress_hook({'status': 'finished', 'downloaded_bytes': size, 'total_bytes': size, 'filename': dest_path})
+    return True
+
+
+def _run(job: _SegmentedJob, progress_hook) -> int:
+    """작업 스레드 실행 + 처리량 기반 연결 수 조정 — 최종 연결 수 반환"""
+    threads = []
+
+    def add_worker():
+        t = threading.Thread(target=_worker, args=(job,), daemon=True, name=f"segment-{len(threads)}")
+        t.start()
+        threads.append(t)
+
+    for _ in range(min(SEGMENT_CONNECTIONS_MIN, job.pending())):
+        add_worker()
+
+    last_time, last_bytes = time.monotonic(), 0
+    # 연결 수를 바꾼 뒤 1주기는 연결 수립 구간이라 건너뛰고 다음 주기부터 처리량 측정
+    window_start, window_bytes, best_rate, growing = None, 0, 0.0, True
+    while any(t.is_alive() for t in threads):
+        deadline = time.monotonic() + _PROBE_INTERVAL
+        for t in threads:
+            t.join(max(0.0, deadline - time.monotonic()))
+        now, downloaded = time.monotonic(), job.downloaded
+
+        if progress_hook is not None and job.error is None:
+            speed = (downloaded - last_bytes) / max(now - last_time, 1e-6)
+            progress_hook({
+                'status': 'downloading', 'downloaded_bytes': downloaded, 'total_bytes': job.size,
+                'speed': speed, 'eta': (job.size - downloaded) / speed if speed else None,
+            })
+        last_time, last_bytes = now, downloaded
+
+        if not growing or job.error is not None:
+            continue
+        if window_start is None:
+            window_start, window_bytes = now, downloaded
+            continue
+        if now - window_start < _PROBE_INTERVAL:
+            continue
+        rate = (downloaded - window_bytes) / (now - window_start)
+        if rate >= best_rate * _GROWTH_GAIN and len(threads) < SEGMENT_CONNECTIONS_MAX and job.pending():
+            best_rate = rate
+            for _ in range(min(len(threads), SEGMENT_CONNECTIONS_MAX - len(threads), job.pending())):
+                add_worker()
+            window_start = None
+        else:
+            growing = False
+            logging.debug(f"분할 다운로드 연결 수 고정: {len(threads)}개 ({rate / 1048576:.1f}MB/s)")
+
+    for t in threads:
+        t.join()
+    if job.error is not None:
+        raise IOError(f"분할 다운로드 실패: {job.error}")
+    if job.downloaded < job.size:
+        raise IOError(f"분할 다운로드 미완료: {job.downloaded}/{job.size} 바이트")
+    return len(threads)
@@ -1,6 +1,11 @@
 """
-상태 관리 모듈 — Redis JSON + Lua atomic merge, in-memory fallback
+상태 관리 모듈 — Redis HASH(필드별 값) + MULTI 부분 갱신, in-memory fallback
+
+상태 필드마다 HASH 필드 하나에 infrastructure.codec으로 인코딩해 저장한다.
+진행률 갱신은 바뀐 필드만 HSET하고, 폴링은 필요한 필드만 HMGET한다 (streaming_info를 매번 읽지 않음).
+기존 문자열(JSON) 상태 키는 처음 접근할 때 HASH로 변환한다.
 """
+import hashlib
 import json
 import logging
 import os
@@ -11,59 +16,120 @@ from datetime import datetime
 
 import redis
 
-from config import STATUS_MAX_AGE, STATUS_CLEANUP_INTERVAL, DOWNLOAD_FOLDER
-from infrastructure import redis_client
+from config import STATUS_MAX_AGE, STATUS_CLEANUP_INTERVAL, STATUS_FULL_SCAN_INTERVAL, DOWNLOAD_FOLDER, MAX_VIDEO_HEIGHT, \
+    ARTIFACT_FOLDER, RANGE_CACHE_FOLDER
+from infrastructure import redis_client, codec
+from services import artifact_store, range_cache
 from utils.general import safe_path_join
 
-# ── Redis Lua Script (atomic merge + SETEX) ──────────────────────
-_LUA_MERGE = """
-local current = redis.call('GET', KEYS[1])
-local data = current and cjson.decode(current) or {}
-local updates = cjson.decode(ARGV[1])
-for k, v in pairs(updates) do data[k] = v end
-redis.call('SETEX', KEYS[1], tonumber(ARGV[2]), cjson.encode(data))
-return 'OK'
-"""
-
 _KEY_PREFIX = "dl:status:"
-_merge_sha = None  # EVALSHA 용 캐시
+EVENTS_CHANNEL_PREFIX = "dl:events:"  # 상태 변경분 pub/sub 채널 (SSE 푸시용)
+_URL_INDEX_PREFIX = "dl:urlidx:"
+
+# 폴링용 필드 묶음 — get_status(file_id, fields=...)
+PROGRESS_FIELDS = ('status', 'progress', 'message', 'error', 'queue_position', 'speed', 'eta')
+SERVER_DOWNLOAD_FIELDS = (
+    'status', 'server_download_status', 'server_download_progress', 'server_download_error',
+    'server_download_queue_position', 'server_file_name', 'server_file_size',
+    'server_download_speed', 'server_download_eta',
+)
+
+# 스케줄러/전역 대기열이 기록하는 대기 순번 필드 (0 = 실행 시작)
+QUEUE_POSITION_FIELDS = ('queue_position', 'server_download_queue_position')
+# 진행 중에만 기록되는 필드 — 대기 순번 + progress.make_hook 기록 필드 (접두사 없음 / server_download_)
+ACTIVE_FIELDS = QUEUE_POSITION_FIELDS + tuple(
+    f'{prefix}{name}' for prefix in ('', 'server_download_')
+    for name in ('progress', 'speed', 'eta', 'downloaded_bytes', 'total_bytes')
+)
+ACTIVE_TTL = 1800  # 30분 — 대용량 파일/대기열 대기 대응
 
 # ── Fallback (in-memory) ─────────────────────────────────────────
 _fallback_lock = threading.Lock()
 _fallback_store: dict[str, dict] = {}
+_fallback_keep: dict[str, float] = {}  # file_id → 이 시각까지 정리하지 않음 (keep_alive)
 
 
-def _ttl_for(status_data: dict) -> int:
-    """상태에 따라 TTL 결정"""
+def _ttl_for(status_data: dict) -> int | None:
+    """기록 내용에 따라 TTL 결정 — None이면 기존 TTL 유지
+
+    진행 중 상태/서버 다운로드와 진행률·대기 순번 기록(status 필드 없음)은 ACTIVE_TTL,
+    그 외 status 기록(completed/error)은 STATUS_MAX_AGE, 메시지 등 나머지 부분 기록은 TTL을 건드리지 않음.
+    """
     s = status_data.get("status", "")
-    if s in ("processing", "downloading"):
-        return 1800  # 30분 — 대용량 파일 대응
-    return STATUS_MAX_AGE  # completed/error → 환경변수 (기본 1800초)
+    if (s in ("processing", "downloading")
+            or status_data.get("server_download_status") in ("queued", "downloading")
+            or any(f in status_data for f in ACTIVE_FIELDS)):
+        return ACTIVE_TTL
+    if s:
+        return STATUS_MAX_AGE  # completed/error → 환경변수
+    return None
 
 
-def _eval_merge(r, key: str, payload: str, ttl: str):
-    """Lua Script 실행 — NOSCRIPT 시 자동 재로드"""
-    global _merge_sha
-    if _merge_sha is None:
-        _merge_sha = r.script_load(_LUA_MERGE)
-    try:
-        return r.evalsha(_merge_sha, 1, key, payload, ttl)
-    except redis.exceptions.NoScriptError:
-        _merge_sha = r.script_load(_LUA_MERGE)
-        return r.evalsha(_merge_sha, 1, key, payload, ttl)
+def _encode_fields(status_data: dict) -> dict:
+    return {k: codec.encode(v, 'streaming_info' if k == 'streaming_info' else None) for k, v in status_data.items()}
+
+
+def _is_wrongtype(e: Exception) -> bool:
+    return isinstance(e, redis.exceptions.ResponseError) and 'WRONGTYPE' in str(e)
+
+
+def _migrate_legacy(r, key: str):
+    """기존 문자열 상태 키(JSON/codec 값)를 HASH로 변환 — 남은 TTL 유지"""
+    with r.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            if pipe.type(key) != b'string':
+                return
+            data = codec.decode(pipe.get(key)) or {}
+            ttl = pipe.pttl(key)
+            pipe.multi()
+            pipe.delete(key)
+            if data:
+                pipe.hset(key, mapping=_encode_fields(data))
+                if ttl > 0:
+                    pipe.pexpire(key, ttl)
+            pipe.execute()
+            logging.info(f"기존 상태 키 HASH 변환: {key}")
+        except redis.WatchError:
+            pass  # 다른 워커가 먼저 변환
+
+
+def _queue_fields(pipe, file_id: str, status_data: dict):
+    """바뀐 필드만 HSET + EXPIRE + 변경분 PUBLISH (파이프라인에 3개 명령 추가)"""
+    key = f"{_KEY_PREFIX}{file_id}"
+    pipe.hset(key, mapping=_encode_fields(status_data))
+    ttl = _ttl_for(status_data)
+    if ttl is None:
+        pipe.expire(key, STATUS_MAX_AGE, nx=True)  # 기존 TTL 유지 — 새로 생긴 키에만 설정
+    else:
+        pipe.expire(key, ttl)
+    pipe.publish(f"{EVENTS_CHANNEL_PREFIX}{file_id}", json.dumps(status_data, ensure_ascii=False))
+
+
+def _write_fields(r, file_id: str, status_data: dict):
+    """MULTI 1회 왕복으로 필드 갱신"""
+    pipe = r.pipeline()
+    _queue_fields(pipe, file_id, status_data)
+    pipe.execute()
 
 
 # ── Public API (인터페이스 100% 유지) ────────────────────────────
 
 def update_status(file_id: str, status_data: dict):
     """다운로드 상태 업데이트 (기존 상태와 병합)"""
+    if not status_data:
+        return
     if redis_client.is_available():
         try:
-            r = redis_client.get_redis()
-            key = f"{_KEY_PREFIX}{file_id}"
-            ttl = _ttl_for(status_data)
-            payload = json.dumps(status_data, ensure_ascii=False)
-            _eval_merge(r, key, payload, str(ttl))
+            r = redis_client.get_redis_binary()
+            try:
+                _write_fields(r, file_id, status_data)
+            except redis.exceptions.ResponseError as e:
+                if not _is_wrongtype(e):
+                    raise
+                _migrate_legacy(r, f"{_KEY_PREFIX}{file_id}")
+                _write_fields(r, file_id, status_data)
+            _index_completed(redis_client.get_redis(), file_id, status_data)
             return
         except Exception as e:
             logging.error(f"Redis update_status 실패, fallback 전환: {e}")
@@ -73,25 +139,124 @@ def update_status(file_id: str, status_data: dict):
     _fallback_update(file_id, status_data)
 
 
-def get_status(file_id: str) -> dict:
-    """다운로드 상태 조회"""
+def update_statuses(updates: dict[str, dict]):
+    """여러 file_id의 변경분을 파이프라인 1회 왕복으로 기록 (진행률 일괄 기록용)"""
+    updates = {file_id: data for file_id, data in updates.items() if data}
+    if not updates:
+        return
     if redis_client.is_available():
         try:
-            r = redis_client.get_redis()
-            raw = r.get(f"{_KEY_PREFIX}{file_id}")
-            if raw:
-                return json.loads(raw)
+            r = redis_client.get_redis_binary()
+            pipe = r.pipeline(transaction=False)
+            for file_id, data in updates.items():
+                _queue_fields(pipe, file_id, data)
+            results = pipe.execute(raise_on_error=False)
+            for i, (file_id, data) in enumerate(updates.items()):
+                if _is_wrongtype(results[i * 3]):
+                    update_status(file_id, data)  # 기존 문자열 키는 변환 후 개별 기록
+                else:
+                    _index_completed(redis_client.get_redis(), file_id, data)
+            return
+        except Exception as e:
+            logging.error(f"Redis update_statuses 실패, fallback 전환: {e}")
+            redis_client.mark_unavailable()
+
+    for file_id, data in updates.items():
+        _fallback_update(file_id, data)
+
+
+def _url_index_key(url: str, max_height: int) -> str:
+    h = hashlib.sha256(f"{max_height}|{url}".encode()).hexdigest()[:16]
+    return f"{_URL_INDEX_PREFIX}{h}"
+
+
+def _index_completed(r, file_id: str, status_data: dict):
+    """완료 상태면 URL → file_id 인덱스 갱신 (원본 URL만 남은 실패 결과는 제외)"""
+    if status_data.get("status") != "completed" or not status_data.get("url"):
+        return
+    if status_data.get("original_url"):
+        return
+    max_height = status_data.get("max_height") or MAX_VIDEO_HEIGHT
+    r.setex(_url_index_key(status_data["url"], max_height), STATUS_MAX_AGE, file_id)
+
+
+def find_completed_result(url: str, max_height: int | None = None) -> str | None:
+    """같은 URL/해상도의 유효한 완료 결과 file_id 조회 — 없거나 만료됐으면 None"""
+    if not redis_client.is_available():
+        return None
+    if max_height is None:
+        max_height = MAX_VIDEO_HEIGHT
+
+    try:
+        r = redis_client.get_redis()
+        key = _url_index_key(url, max_height)
+        file_id = r.get(key)
+        if not file_id:
+            return None
+
+        status = get_status(file_id, fields=("status", "url"))
+        if status.get("status") == "completed" and status.get("url") == url:
+            return file_id
+
+        # 상태가 만료/변경된 인덱스는 제거
+        r.delete(key)
+    except Exception as e:
+        logging.warning(f"URL 인덱스 조회 실패: {e}")
+    return None
+
+
+def _read_fields(r, key: str, fields) -> dict:
+    if fields is None:
+        raw = r.hgetall(key)
+        return {k.decode(): codec.decode(v) for k, v in raw.items()}
+    values = r.hmget(key, fields)
+    return {k: codec.decode(v) for k, v in zip(fields, values) if v is not None}
+
+
+def get_status(file_id: str, fields=None) -> dict:
+    """다운로드 상태 조회 — fields 지정 시 해당 필드만 (없는 필드는 생략)"""
+    if redis_client.is_available():
+        try:
+            r = redis_client.get_redis_binary()
+            key = f"{_KEY_PREFIX}{file_id}"
+            try:
+                status = _read_fields(r, key, fields)
+            except redis.exceptions.ResponseError as e:
+                if not _is_wrongtype(e):
+                    raise
+                _migrate_legacy(r, key)
+                status = _read_fields(r, key, fields)
+            if status:
+                return status
             # Redis에 없으면 fallback store도 확인 (전환 직후)
             with _fallback_lock:
                 if file_id in _fallback_store:
-                    return _fallback_store[file_id].copy()
+                    return _project(_fallback_store[file_id], fields)
             return {"status": "unknown"}
         except Exception as e:
             logging.error(f"Redis get_status 실패, fallback 전환: {e}")
             redis_client.mark_unavailable()
 
     # fallback: in-memory
-    return _fallback_get(file_id)
+    return _fallback_get(file_id, fields)
+
+
+def keep_alive(file_id: str, seconds: int):
+    """상태 만료를 최소 seconds초 뒤로 연장 (이미 더 길면 유지) — 최근 접근한 결과 보존용"""
+    if redis_client.is_available():
+        try:
+            r = redis_client.get_redis()
+            key = f"{_KEY_PREFIX}{file_id}"
+            ttl = r.ttl(key)  # -2: 없음, -1: 만료 없음
+            if 0 <= ttl < seconds:
+                r.expire(key, seconds)
+            return
+        except Exception as e:
+            logging.warning(f"상태 만료 연장 실패: {file_id} - {e}")
+            return
+    with _fallback_lock:
+        if file_id in _fallback_store:
+            _fallback_keep[file_id] = max(_fallback_keep.get(file_id, 0), time.time() + seconds)
 
 
 def start_cleanup_thread():
@@ -111,14 +276,35 @@ def _fallback_update(file_id: str, status_data: dict):
             _fallback_store[file_id] = status_data
 
 
-def _fallback_get(file_id: str) -> dict:
+def _project(status: dict, fields) -> dict:
+    if fields is None:
+        return status.copy()
+    return {k: status[k] for k in fields if k in status}
+
+
+def _fallback_get(file_id: str, fields=None) -> dict:
     with _fallback_lock:
-        return _fallback_store.get(file_id, {"status": "unknown"}).copy()
+        if file_id not in _fallback_store:
+            return {"status": "unknown"}
+        return _project(_fallback_store[file_id], fields)
 
 
 # ── Cleanup loop ─────────────────────────────────────────────────
 
 _CLEANUP_LOCK_KEY = "dl:cleanup_lock"
+_CLEANUP_INDEX_KEY = "dl:cleanup:folders"  # ZSET file_id → 폴더 확인 시각 (만료 예정 시각)
+_FULL_SCAN_KEY = "dl:cleanup:full_scan"  # 전체 스캔 주기 표시 (SET NX EX)
+_SWEEP_BATCH = 200
+
+
+def track_folder(file_id: str):
+    """다운로드 폴더 만료 인덱스 등록/갱신 — 폴더 생성 및 파일 제공 시 호출"""
+    if not redis_client.is_available():
+        return  # fallback 모드는 전체 스캔으로 정리
+    try:
+        redis_client.get_redis().zadd(_CLEANUP_INDEX_KEY, {file_id: time.time() + STATUS_MAX_AGE})
+    except Exception as e:
+        logging.warning(f"정리 인덱스 등록 실패: {file_id} - {e}")
 
 
 def _acquire_cleanup_lock() -> bool:
@@ -135,8 +321,8 @@ def _acquire_cleanup_lock() -> bool:
 
 def _cleanup_loop():
     """백그라운드 정리 스레드
-    - Redis 모드: TTL이 자동 만료 담당 → 파일시스템 고아 폴더 정리만 (리더 워커만)
-    - Fallback 모드: 기존 in-memory 정리 + 파일시스템 정리
+    - Redis 모드: TTL이 자동 만료 담당 → 만료 인덱스(dl:cleanup:folders)의 폴더 정리만 (리더 워커만)
+    - Fallback 모드: 기존 in-memory 정리 + 파일시스템 전체 정리
     """
     while True:
         try:
@@ -144,10 +330,18 @@ def _cleanup_loop():
                 redis_client.check_health()
                 # 멀티워커 환경에서 한 워커만 폴더 정리 수행
                 if _acquire_cleanup_lock():
-                    _cleanup_orphan_folders()
+                    # 전체 스캔은 STATUS_FULL_SCAN_INTERVAL마다 전역 1회, 평소에는 만료된 인덱스 항목만
+                    if _full_scan_due():
+                        _cleanup_orphan_folders()
+                    else:
+                        _sweep_expired_folders()
+                    artifact_store.evict()
+                    range_cache.evict()
             else:
                 _cleanup_fallback_store()
                 _cleanup_orphan_folders()
+                artifact_store.evict()
+                range_cache.evict()
                 redis_client.check_health()
         except Exception as e:
             logging.error(f"상태 정보 정리 중 오류: {e}")
@@ -155,6 +349,71 @@ def _cleanup_loop():
         time.sleep(STATUS_CLEANUP_INTERVAL)
 
 
+def _full_scan_due() -> bool:
+    """전체 스캔 차례인지 — 전역 주기 표시 키가 없을 때만 (워커 재시작과 무관하게 STATUS_FULL_SCAN_INTERVAL당 1회)"""
+    try:
+        return bool(redis_client.get_redis().set(_FULL_SCAN_KEY, os.getpid(), nx=True, ex=STATUS_FULL_SCAN_INTERVAL))
+    except Exception:
+        return False  # Redis 오류 시 인덱스 정리만 — fallback 전환 후에는 전체 스캔으로 정리
+
+
+def _sweep_expired_folders():
+    """만료 시각이 지난 인덱스 항목만 확인 — 상태가 남아 있으면 상태 TTL만큼 미루고, 없으면 폴더 삭제"""
+    r = redis_client.get_redis()
+    while True:
+        now = time.time()
+        due = r.zrangebyscore(_CLEANUP_INDEX_KEY, '-inf', now, start=0, num=_SWEEP_BATCH)
+        if not due:
+            return
+
+        pipe = r.pipeline(transaction=False)
+        for file_id in due:
+            pipe.ttl(f"{_KEY_PREFIX}{file_id}")
+        ttls = pipe.execute()
+
+        reschedule, done = {}, []
+        for file_id, ttl in zip(due, ttls):
+            with _fallback_lock:
+                in_fallback = file_id in _fallback_store
+            if ttl > 0 or in_fallback:
+                reschedule[file_id] = now + max(ttl, STATUS_CLEANUP_INTERVAL)
+                continue
+            if ttl == -1:  # 만료 없는 상태 키 — 다음 확인까지 기본 수명만큼 대기
+                reschedule[file_id] = now + STATUS_MAX_AGE
+                continue
+            retry_at = _remove_folder(file_id, now)
+            if retry_at:
+                reschedule[file_id] = retry_at
+            else:
+                done.append(file_id)
+
+        pipe = r.pipeline(transaction=False)
+        if reschedule:
+            pipe.zadd(_CLEANUP_INDEX_KEY, reschedule)
+        if done:
+            pipe.zrem(_CLEANUP_INDEX_KEY, *done)
+        pipe.execute()
+        if len(due) < _SWEEP_BATCH:
+            return
+
+
+def _remove_folder(file_id: str, now: float) -> float | None:
+    """상태가 없는 폴더 삭제 — 최근 수정된 폴더는 삭제하지 않고 다시 확인할 시각 반환"""
+    try:
+        folder = safe_path_join(DOWNLOAD_FOLDER, file_id)
+        mtime = os.path.getmtime(folder)
+    except (OSError, ValueError):
+        return None  # 이미 없거나 잘못된 항목
+    if now - mtime < STATUS_MAX_AGE:
+        return mtime + STATUS_MAX_AGE
+    try:
+        shutil.rmtree(folder)
+        logging.info(f"만료 폴더 정리됨: {file_id}")
+    except Exception as e:
+        logging.error(f"폴더 삭제 중 오류: {file_id}, {e}")
+    return None
+
+
 def _cleanup_fallback_store():
     """fallback in-memory store에서 만료된 상태 제거"""
     now = datetime.now()
@@ -165,6 +424,8 @@ def _cleanup_fallback_store():
             if not isinstance(status, dict) or "status" not in status:
                 to_delete.append(file_id)
                 continue
+            if _fallback_keep.get(file_id, 0) > now.timestamp():
+                continue
             if status["status"] in ("completed", "error"):
                 ts = status.get("timestamp", 0)
                 if (now - datetime.fromtimestamp(ts)).total_seconds() > STATUS_MAX_AGE:
@@ -172,6 +433,7 @@ def _cleanup_fallback_store():
 
         for file_id in to_delete:
             del _fallback_store[file_id]
+            _fallback_keep.pop(file_id, None)
             logging.info(f"[fallback] 상태 정보 정리됨: {file_id}")
 
 
@@ -199,8 +461,9 @@ def _get_active_file_ids() -> set[str]:
 
 
 def _cleanup_orphan_folders():
-    """downloads/ 디렉토리에서 상태가 없는 고아 폴더 삭제
+    """downloads/ 디렉토리에서 상태가 없는 고아 폴더 삭제 (전체 스캔)
     Redis SCAN 1회로 활성 키를 가져와서 비교 (폴더별 개별 조회 제거)
+    남겨 둔 폴더는 만료 인덱스에 등록 — 이후에는 인덱스 확인만으로 정리
     """
     if not os.path.exists(DOWNLOAD_FOLDER):
         return
@@ -209,22 +472,26 @@ def _cleanup_orphan_folders():
     if active_ids is None:
         return  # Redis 에러 시 안전하게 건너뜀
 
+    kept = []
     try:
         now = time.time()
+        managed_roots = {os.path.abspath(ARTIFACT_FOLDER), os.path.abspath(RANGE_CACHE_FOLDER)}
         for name in os.listdir(DOWNLOAD_FOLDER):
             folder = safe_path_join(DOWNLOAD_FOLDER, name)
-            if not os.path.isdir(folder):
-                continue
+            if not os.path.isdir(folder) or folder in managed_roots:
+                continue  # 공유 저장소/구간 캐시는 LRU 예산으로 별도 관리
 
             # 폴더 수정 시간이 STATUS_MAX_AGE보다 오래된 것만 대상
             try:
                 if now - os.path.getmtime(folder) < STATUS_MAX_AGE:
+                    kept.append(name)
                     continue
             except OSError:
                 continue
 
             # 활성 상태가 있으면 건드리지 않음
             if name in active_ids:
+                kept.append(name)
                 continue
 
             try:
@@ -234,3 +501,18 @@ def _cleanup_orphan_folders():
                 logging.error(f"폴더 삭제 중 오류: {name}, {e}")
     except Exception as e:
         logging.error(f"고아 폴더 정리 중 오류: {e}")
+
+    _index_folders(kept)
+
+
+def _index_folders(names: list[str]):
+    """인덱스에 없는 폴더 등록 (기존 항목의 시각은 유지)"""
+    if not names or not redis_client.is_available():
+        return
+    try:
+        r = redis_client.get_redis()
+        due = time.time() + STATUS_MAX_AGE
+        for i in range(0, len(names), _SWEEP_BATCH):
+            r.zadd(_CLEANUP_INDEX_KEY, {name: due for name in names[i:i + _SWEEP_BATCH]}, nx=True)
+    except Exception as e:
+        logging.warning(f"정리 인덱스 등록 실패: {e}")
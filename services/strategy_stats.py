@@ -0,0 +1,158 @@
+"""
+도메인별 다운로드 단계 결과 통계 — 단계(스트리밍/직접 링크/서버 다운로드)마다 성공률과 소요 시간을 감쇠 누적
+
+download_manager의 전략 계획이 이 통계로 단계 순서/생략과 추출 타임아웃을 정한다.
+
+  dl:strategy:<domain>  HASH
+    ts             마지막 기록 시각
+    <stage>:n      시도 수          <stage>:ok   성공 수
+    <stage>:sec    전체 소요 시간   <stage>:h<i>  성공 소요 시간 히스토그램 (_BUCKETS 구간별 수)
+
+히스토그램에는 원본 추출을 실제로 수행한 성공만 넣는다 — 캐시 적중·single-flight 대기는 추출 타임아웃(p95)을 낮추므로 제외.
+
+값은 기록할 때마다 STRATEGY_HALF_LIFE 반감기로 감쇠시킨 뒤 더하므로 오래된 결과일수록 가중치가 작다
+(사이트가 바뀌면 며칠 안에 새 결과가 우세해짐). 감쇠+누적은 Lua 스크립트 1회로 원자적으로 수행한다.
+"""
+import logging
+import math
+import threading
+import time
+from urllib.parse import urlsplit
+
+import redis
+
+from config import STRATEGY_HALF_LIFE
+from infrastructure import redis_client
+
+STAGES = ('streaming', 'direct', 'server')
+_KEY_PREFIX = "dl:strategy:"
+_TTL = STRATEGY_HALF_LIFE * 8  # 8 반감기 후에는 가중치 1/256 — 키 삭제
+_BUCKETS = (1, 2, 3, 5, 8, 12, 20, 30, 45, 60, 90, 120, 180, 300)  # 성공 소요 시간 구간 상한 (초)
+
+# ── Redis Lua Script (감쇠 후 누적) ─────────────────────────────────
+_LUA_RECORD = """
+local now = tonumber(ARGV[1])
+local ts = tonumber(redis.call('HGET', KEYS[1], 'ts') or ARGV[1])
+if now > ts then
+  local factor = math.pow(0.5, (now - ts) / tonumber(ARGV[2]))
+  local all = redis.call('HGETALL', KEYS[1])
+  for i = 1, #all, 2 do
+    if all[i] ~= 'ts' then
+      redis.call('HSET', KEYS[1], all[i], tostring(tonumber(all[i + 1]) * factor))
+    end
+  end
+end
+redis.call('HSET', KEYS[1], 'ts', ARGV[1])
+for i = 4, #ARGV, 2 do
+  redis.call('HINCRBYFLOAT', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+_record_sha = None
+
+# ── Fallback (in-memory, 프로세스 내) ──────────────────────────────
+_fallback_lock = threading.Lock()
+_fallback_stats: dict[str, dict[str, float]] = {}
+
+
+def domain_of(url: str) -> str:
+    """통계 단위 도메인 — 소문자, www. 제거"""
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def _decay(fields: dict[str, float], now: float) -> dict[str, float]:
+    ts = fields.get('ts', now)
+    factor = 0.5 ** (max(now - ts, 0) / STRATEGY_HALF_LIFE)
+    return {k: (v if k == 'ts' else v * factor) for k, v in fields.items()}
+
+
+def _increments(stage: str, ok: bool, seconds: float, extracted: bool) -> dict[str, float]:
+    inc = {f"{stage}:n": 1, f"{stage}:ok": 1 if ok else 0, f"{stage}:sec": seconds}
+    if ok and extracted:
+        bucket = next((i for i, limit in enumerate(_BUCKETS) if seconds <= limit), len(_BUCKETS) - 1)
+        inc[f"{stage}:h{bucket}"] = 1
+    return inc
+
+
+def _eval_record(r, key: str, now: float, inc: dict[str, float]):
+    global _record_sha
+    args = [now, STRATEGY_HALF_LIFE, _TTL]
+    for field, value in inc.items():
+        args += [field, value]
+    if _record_sha is None:
+        _record_sha = r.script_load(_LUA_RECORD)
+    try:
+        r.evalsha(_record_sha, 1, key, *args)
+    except redis.exceptions.NoScriptError:
+        _record_sha = r.script_load(_LUA_RECORD)
+        r.evalsha(_record_sha, 1, key, *args)
+
+
+def record(domain: str, stage: str, ok: bool, seconds: float, extracted: bool = True):
+    """단계 1회 결과 기록 — extracted=False(추출 없이 캐시/대기 결과 사용)면 소요 시간 히스토그램에서 제외"""
+    if not domain:
+        return
+    now = time.time()
+    inc = _increments(stage, ok, seconds, extracted)
+    if redis_client.is_available():
+        try:
+            _eval_record(redis_client.get_redis(), f"{_KEY_PREFIX}{domain}", now, inc)
+            return
+        except Exception as e:
+            logging.warning(f"전략 통계 기록 실패, fallback 전환: {e}")
+            redis_client.mark_unavailable()
+
+    with _fallback_lock:
+        fields = _decay(_fallback_stats.get(domain, {}), now)
+        for field, value in inc.items():
+            fields[field] = fields.get(field, 0.0) + value
+        fields['ts'] = now
+        _fallback_stats[domain] = fields
+
+
+def _load(domain: str) -> dict[str, float]:
+    if redis_client.is_available():
+        try:
+            raw = redis_client.get_redis().hgetall(f"{_KEY_PREFIX}{domain}")
+            return {k: float(v) for k, v in raw.items()}
+        except Exception as e:
+            logging.warning(f"전략 통계 조회 실패, fallback 전환: {e}")
+            redis_client.mark_unavailable()
+    with _fallback_lock:
+        return dict(_fallback_stats.get(domain, {}))
+
+
+def summary(domain: str) -> dict[str, dict]:
+    """단계별 감쇠 통계 — samples / success_rate / seconds_per_success / p50·p95(성공 소요 시간, 초)"""
+    fields = _decay(_load(domain), time.time()) if domain else {}
+    result = {}
+    for stage in STAGES:
+        n = fields.get(f"{stage}:n", 0.0)
+        if n <= 0:
+            continue
+        ok = fields.get(f"{stage}:ok", 0.0)
+        histogram = [fields.get(f"{stage}:h{i}", 0.0) for i in range(len(_BUCKETS))]
+        result[stage] = {
+            'samples': round(n, 2),
+            'success_rate': round(ok / n, 3),
+            # 성공 1회를 얻는 데 드는 평균 시간 (실패한 시도 시간 포함)
+            'seconds_per_success': fields.get(f"{stage}:sec", 0.0) / ok if ok > 0 else math.inf,
+            'p50': _percentile(histogram, 0.5),
+            'p95': _percentile(histogram, 0.95),
+        }
+    return result
+
+
+def _percentile(histogram: list[float], q: float) -> float | None:
+    """히스토그램 구간 상한 기준 백분위 (성공 기록이 없으면 None)"""
+    total = sum(histogram)
+    if total <= 0:
+        return None
+    cumulative = 0.0
+    for limit, count in zip(_BUCKETS, histogram):
+        cumulative += count
+        if cumulative >= total * q:
+            return limit
+    return _BUCKETS[-1]
@@ -0,0 +1,219 @@
+"""
+스트리밍 URL 만료 전 갱신 — 최근 접근한 결과의 streaming_info를 백그라운드에서 재추출해 교체
+
+서명된 스트리밍 URL(expire= 등)은 몇 시간 뒤 만료된다. 결과 페이지를 본 뒤 다운로드/재생 요청이
+요청 스레드 안에서 재추출(최대 120초)을 기다리지 않도록, 만료 STREAM_REFRESH_LEAD초 전에 미리 갱신한다.
+
+  dl:refresh:due   ZSET file_id → 갱신 예정 시각 (가장 먼저 만료되는 URL 기준)
+  dl:refresh:seen  ZSET file_id → 마지막 접근 시각 (STREAM_REFRESH_ACTIVE_WINDOW 안에 접근한 것만 갱신)
+
+추적 중인 결과에 접근하면 상태 키 만료를 _KEEP_SECONDS 뒤로 연장한다 (완료 상태 TTL은 STATUS_MAX_AGE라
+연장하지 않으면 갱신 시각 전에 사라짐). 갱신 루프는 Redis 리더 한 곳에서만 실행하며 리더 잠금은
+재추출 1건마다 연장한다. Redis 불가 시 프로세스별 in-memory로 동작한다.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+
+from config import STREAM_REFRESH_ENABLED, STREAM_REFRESH_LEAD, STREAM_REFRESH_INTERVAL, \
+    STREAM_REFRESH_ACTIVE_WINDOW, STREAM_REFRESH_BATCH
+from infrastructure import redis_client
+from services.status_manager import get_status, update_status, keep_alive
+from utils.general import url_expiry
+
+_DUE_KEY = "dl:refresh:due"
+_SEEN_KEY = "dl:refresh:seen"
+_LOCK_KEY = "dl:refresh:lock"
+_RETRY_DELAY = 60  # 갱신 실패 시 재시도 간격 (초)
+# 접근 후 상태 보존 시간 — 활성 판정 창이 끝날 때 갱신 시각이 되어도 재추출이 끝날 때까지 상태가 남도록
+_KEEP_SECONDS = STREAM_REFRESH_ACTIVE_WINDOW + STREAM_REFRESH_LEAD
+_ITEM_LOCK_TTL = 360  # 재추출 1건당 리더 잠금 연장 시간 (초, 최대 3회 시도 × 120초)
+
+# 리더 잠금 획득/연장 — 다른 워커가 잡고 있으면 0
+_LUA_HOLD_LOCK = """
+local owner = redis.call('GET', KEYS[1])
+if owner and owner ~= ARGV[1] then return 0 end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+# ── Fallback (in-memory) ─────────────────────────────────────────
+_fallback_lock = threading.Lock()
+_fallback_due: dict[str, float] = {}
+_fallback_seen: dict[str, float] = {}
+
+
+def _earliest_expiry(streaming_info: dict) -> int | None:
+    urls = [streaming_info.get('best_url')]
+    urls += [s.get('url') for s in streaming_info.get('streaming_urls') or ()]
+    expiries = [e for e in (url_expiry(u) for u in urls if u) if e]
+    return min(expiries) if expiries else None
+
+
+def is_expired(streaming_info: dict) -> bool:
+    """가장 먼저 만료되는 URL이 이미 만료됐는지 (만료 정보가 없으면 False)"""
+    expiry = _earliest_expiry(streaming_info)
+    return expiry is not None and expiry <= time.time()
+
+
+def _schedule(file_id: str, due_at: float):
+    if redis_client.is_available():
+        try:
+            redis_client.get_redis().zadd(_DUE_KEY, {file_id: due_at})
+            return
+        except Exception as e:
+            logging.warning(f"스트림 갱신 예약 실패, fallback 전환: {e}")
+            redis_client.mark_unavailable()
+    with _fallback_lock:
+        _fallback_due[file_id] = due_at
+
+
+def _forget(file_id: str):
+    if redis_client.is_available():
+        try:
+            pipe = redis_client.get_redis().pipeline(transaction=False)
+            pipe.zrem(_DUE_KEY, file_id)
+            pipe.zrem(_SEEN_KEY, file_id)
+            pipe.execute()
+            return
+        except Exception as e:
+            logging.warning(f"스트림 갱신 예약 삭제 실패: {e}")
+            redis_client.mark_unavailable()
+    with _fallback_lock:
+        _fallback_due.pop(file_id, None)
+        _fallback_seen.pop(file_id, None)
+
+
+def track(file_id: str, streaming_info: dict):
+    """streaming_info URL 만료 시각 기준으로 갱신 예약 — 만료 정보가 없으면 추적하지 않음"""
+    if not STREAM_REFRESH_ENABLED or not streaming_info:
+        return
+    expiry = _earliest_expiry(streaming_info)
+    if expiry is None:
+        return
+    _schedule(file_id, expiry - STREAM_REFRESH_LEAD)
+    touch(file_id)
+
+
+def touch(file_id: str):
+    """결과/재생/다운로드 접근 기록 — 최근 접근한 file_id만 갱신 대상, 추적 중이면 상태 만료 연장"""
+    if not STREAM_REFRESH_ENABLED:
+        return
+    now = time.time()
+    tracked = None
+    if redis_client.is_available():
+        try:
+            pipe = redis_client.get_redis().pipeline(transaction=False)
+            pipe.zadd(_SEEN_KEY, {file_id: now})
+            pipe.zscore(_DUE_KEY, file_id)
+            tracked = pipe.execute()[1] is not None
+        except Exception as e:
+            logging.warning(f"스트림 접근 기록 실패, fallback 전환: {e}")
+            redis_client.mark_unavailable()
+    if tracked is None:
+        with _fallback_lock:
+            _fallback_seen[file_id] = now
+            tracked = file_id in _fallback_due
+    if tracked:
+        keep_alive(file_id, _KEEP_SECONDS)
+
+
+def refresh(file_id: str) -> bool:
+    """재추출 후 streaming_info 교체 (update_status 원자적 병합) — 성공 시 True"""
+    from services.download_manager import extract_streaming_urls
+    from services.download_utils import ExtractionContext
+
+    status = get_status(file_id, fields=('status', 'url', 'streaming_info', 'max_height'))
+    video_url = status.get('url')
+    if status.get('status') != 'completed' or not status.get('streaming_info') or not video_url:
+        _forget(file_id)
+        return False
+
+    # 캐시에는 곧 만료될 URL이 들어 있으므로 캐시를 건너뛰고 원본에서 다시 추출
+    ctx = ExtractionContext(video_url, use_cache=False)
+    streaming_info = extract_streaming_urls(video_url, max_height=status.get('max_height'), ctx=ctx)
+    if not streaming_info or not streaming_info.get('best_url'):
+        logging.warning(f"스트림 URL 갱신 실패, {_RETRY_DELAY}초 후 재시도: {file_id}")
+        _schedule(file_id, time.time() + _RETRY_DELAY)
+        return False
+
+    update_status(file_id, {'streaming_info': streaming_info})
+    keep_alive(file_id, _KEEP_SECONDS)  # 상태 기록이 TTL을 STATUS_MAX_AGE로 되돌림
+    expiry = _earliest_expiry(streaming_info)
+    if expiry is None:
+        _forget(file_id)
+    else:
+        _schedule(file_id, expiry - STREAM_REFRESH_LEAD)
+    logging.info(f"스트림 URL 갱신 완료: {file_id}")
+    return True
+
+
+def _take_due(now: float) -> list[str]:
+    """갱신 시각이 된 file_id 중 최근 접근한 것 — 오래 접근하지 않은 항목은 추적 종료"""
+    active_since = now - STREAM_REFRESH_ACTIVE_WINDOW
+    if redis_client.is_available():
+        try:
+            r = redis_client.get_redis()
+            due = r.zrangebyscore(_DUE_KEY, '-inf', now, start=0, num=STREAM_REFRESH_BATCH * 4)
+            if not due:
+                return []
+            pipe = r.pipeline(transaction=False)
+            for file_id in due:
+                pipe.zscore(_SEEN_KEY, file_id)
+            seen = pipe.execute()
+            r.zremrangebyscore(_SEEN_KEY, '-inf', active_since)
+        except Exception as e:
+            logging.warning(f"스트림 갱신 대상 조회 실패: {e}")
+            redis_client.mark_unavailable()
+            return []
+    else:
+        with _fallback_lock:
+            due = [f for f, at in _fallback_due.items() if at <= now][:STREAM_REFRESH_BATCH * 4]
+            seen = [_fallback_seen.get(f) for f in due]
+
+    active = []
+    for file_id, last_seen in zip(due, seen):
+        if last_seen is None or float(last_seen) < active_since:
+            _forget(file_id)
+        else:
+            active.append(file_id)
+    return active[:STREAM_REFRESH_BATCH]
+
+
+def _hold_lock(ttl: int) -> bool:
+    """갱신 리더 잠금 획득 또는 연장 — 한 워커만 재추출 (잠금 값은 호스트:PID)"""
+    if not redis_client.is_available():
+        return True
+    try:
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        return bool(redis_client.get_redis().eval(_LUA_HOLD_LOCK, 1, _LOCK_KEY, owner, ttl))
+    except Exception:
+        return False
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(STREAM_REFRESH_INTERVAL)
+        if not _hold_lock(STREAM_REFRESH_INTERVAL * 2):
+            continue
+        for file_id in _take_due(time.time()):
+            # 재추출이 잠금 TTL보다 길어져 다른 워커가 같은 항목을 다시 추출하지 않도록 1건마다 연장
+            if not _hold_lock(STREAM_REFRESH_INTERVAL * 2 + _ITEM_LOCK_TTL):
+                logging.warning("스트림 갱신 리더 잠금을 잃어 이번 주기 중단")
+                break
+            try:
+                refresh(file_id)
+            except Exception as e:
+                logging.error(f"스트림 URL 갱신 중 오류: {file_id} - {e}", exc_info=True)
+                _schedule(file_id, time.time() + _RETRY_DELAY)
+
+
+def start_refresh_thread():
+    """스트림 갱신 스레드 시작"""
+    if not STREAM_REFRESH_ENABLED:
+        return
+    t = threading.Thread(target=_refresh_loop, daemon=True)
+    t.start()
+    logging.info("스트림 URL 갱신 스레드 시작됨")
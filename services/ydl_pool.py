@@ -0,0 +1,191 @@
+"""
+YoutubeDL 인스턴스 풀 — 같은 옵션의 추출/다운로드가 미리 만든 YoutubeDL을 빌려 쓰고 반납
+
+YoutubeDL 생성 시 추출기 목록/쿠키 저장소/HTTP 핸들러를 준비하고 with 블록이 끝나면 연결까지 닫는다.
+풀은 옵션이 같은 호출끼리 인스턴스를 재사용해 이 고정 비용과 yt-dlp 내부의 유지 연결을 워커당 한 번만 쓴다.
+
+- 키: 프로필(stealth / social / generic / default) + 호출별 값을 뺀 옵션 지문 — 생성 시 반영되는 옵션이 같을 때만 재사용
+- 호출별 값(PER_CALL_OPTIONS: 진행 훅/로거/저장 경로/조각 동시 수)은 빌려줄 때마다 다시 적용
+- 빌려줄 때 호출 단위 상태(다운로드 수/재생목록 단계/출력 메시지 기록)를 초기화, 반납 시 쿠키 비움
+- 예외로 끝난 인스턴스는 반납하지 않고 닫음, YDL_POOL_MAX_AGE초 지난 인스턴스는 새로 생성
+- 프로세스당 유휴 인스턴스는 YDL_POOL_SIZE개까지 (0이면 비활성화 — 매번 생성)
+- 초기화하는 내부 속성(CALL_STATE_ATTRS)이 설치된 yt-dlp에 없으면 경고 후 풀 비활성화 (yt-dlp 버전 무관하게 안전)
+
+YoutubeDL은 스레드 안전하지 않으므로 인스턴스는 빌린 스레드만 사용한다.
+"""
+import contextlib
+import json
+import logging
+import threading
+import time
+
+import yt_dlp
+
+from config import YDL_POOL_SIZE, YDL_POOL_MAX_AGE
+
+# 빌려줄 때마다 다시 적용하는 옵션 — yt-dlp가 생성 시가 아니라 사용 시점에 읽음 (progress_hooks는 직접 재등록)
+PER_CALL_OPTIONS = ('progress_hooks', 'logger', 'paths', 'concurrent_fragment_downloads')
+# 빌려줄 때 초기화하는 YoutubeDL 내부 속성 — 공개 API가 아니므로 yt-dlp 업데이트로 사라질 수 있음
+CALL_STATE_ATTRS = ('_download_retcode', '_num_downloads', '_num_videos', '_playlist_level',
+                    '_playlist_urls', '_printed_messages', '_progress_hooks')
+
+_lock = threading.Lock()
+_idle: list["PooledYDL"] = []  # 오래된 것이 앞
+_stats = {'hits': 0, 'misses': 0, 'recycled': 0, 'discarded': 0}
+_profile_stats: dict[str, dict] = {}
+_compatible: bool | None = None  # 첫 인스턴스 생성 시 확인 — False면 재사용하지 않음
+
+
+class PooledYDL:
+    """풀에서 빌린 YoutubeDL 1개"""
+
+    def __init__(self, key: str, profile: str, opts: dict):
+        self.key = key
+        self.profile = profile
+        self.ydl = yt_dlp.YoutubeDL(dict(opts))  # YoutubeDL이 params dict를 직접 수정하므로 복사본 전달
+        self.created = time.monotonic()
+        self.uses = 0
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.created > YDL_POOL_MAX_AGE
+
+    def prepare(self, opts: dict):
+        """호출 단위 상태 초기화 + 호출별 옵션 적용"""
+        ydl = self.ydl
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        ydl._num_videos = 0
+        ydl._playlist_level = 0
+        ydl._playlist_urls = set()
+        ydl._printed_messages = set()
+        for name in PER_CALL_OPTIONS:
+            if name in opts:
+                ydl.params[name] = opts[name]
+            else:
+                ydl.params.pop(name, None)
+        ydl._progress_hooks = []
+        for hook in opts.get('progress_hooks') or ():
+            ydl.add_progress_hook(hook)
+        self.uses += 1
+
+    def reset(self):
+        """반납 전 정리 — 다른 사용자 요청에 쿠키가 넘어가지 않게 비움"""
+        if 'cookiejar' in self.ydl.__dict__:
+            self.ydl.cookiejar.clear()
+        self.ydl._progress_hooks = []
+        self.ydl.params.pop('logger', None)
+
+    def close(self):
+        try:
+            self.ydl.close()
+        except Exception as e:
+            logging.debug(f"YoutubeDL 종료 중 오류 무시: {e}")
+
+
+def _check_compatible(ydl) -> bool:
+    """설치된 yt-dlp가 초기화 대상 내부 속성을 모두 갖는지 (프로세스당 1회 확인)"""
+    global _compatible
+    if _compatible is None:
+        missing = [name for name in CALL_STATE_ATTRS if not hasattr(ydl, name)]
+        if missing:
+            logging.warning(f"yt-dlp {yt_dlp.version.__version__}에 {', '.join(missing)} 속성이 없어 YoutubeDL 풀 비활성화")
+        _compatible = not missing
+    return _compatible
+
+
+def _enabled() -> bool:
+    return YDL_POOL_SIZE > 0 and _compatible is not False
+
+
+def profile_of(opts: dict) -> str:
+    """옵션 프로필 이름 — 사이트 종류별 옵션 분기(download_manager / download_utils)와 대응"""
+    if opts.get('sleep_interval') or opts.get('geo_bypass'):
+        return 'stealth'
+    if opts.get('force_generic_extractor'):
+        return 'generic'
+    if (opts.get('http_headers') or {}).get('Sec-Fetch-Mode') == 'cors':
+        return 'social'
+    return 'default'
+
+
+def _fingerprint(opts: dict) -> str:
+    fixed = {k: v for k, v in opts.items() if k not in PER_CALL_OPTIONS}
+    return json.dumps(fixed, sort_keys=True, default=repr)
+
+
+def _count(profile: str, name: str):
+    _stats[name] += 1
+    counts = _profile_stats.setdefault(profile, {'hits': 0, 'misses': 0})
+    if name in counts:
+        counts[name] += 1
+
+
+def checkout(opts: dict) -> PooledYDL:
+    """opts와 같은 유휴 인스턴스를 빌림 — 없으면 새로 생성"""
+    profile = profile_of(opts)
+    key = f"{profile}:{_fingerprint(opts)}"
+    entry, stale = None, []
+    with _lock:
+        for i in range(len(_idle) - 1, -1, -1):  # 최근 반납한 것부터 (유지 연결이 살아 있을 가능성)
+            if _idle[i].expired():
+                stale.append(_idle.pop(i))
+            elif entry is None and _idle[i].key == key:
+                entry = _idle.pop(i)
+        _stats['recycled'] += len(stale)
+        _count(profile, 'hits' if entry is not None else 'misses')
+    for old in stale:
+        old.close()
+
+    if entry is None:
+        entry = PooledYDL(key, profile, opts)
+        if not _check_compatible(entry.ydl):
+            return entry  # 새 인스턴스라 초기화 불필요, 반납 시 닫힘
+    entry.prepare(opts)
+    return entry
+
+
+def checkin(entry: PooledYDL, ok: bool = True):
+    """반납 — 실패했거나 풀이 가득 차면 가장 오래된 인스턴스를 닫음"""
+    if not ok or not _enabled() or entry.expired():
+        with _lock:
+            _stats['discarded' if not ok else 'recycled'] += 1
+        entry.close()
+        return
+    entry.reset()
+    with _lock:
+        _idle.append(entry)
+        evicted = _idle.pop(0) if len(_idle) > YDL_POOL_SIZE else None
+    if evicted is not None:
+        evicted.close()
+
+
+@contextlib.contextmanager
+def borrow(opts: dict):
+    """with borrow(opts) as ydl: — yt_dlp.YoutubeDL(opts) 대신 사용, 블록이 예외로 끝나면 인스턴스 폐기"""
+    entry = checkout(opts)
+    try:
+        yield entry.ydl
+    except BaseException:
+        checkin(entry, ok=False)
+        raise
+    checkin(entry)
+
+
+def clear():
+    """유휴 인스턴스 모두 닫기"""
+    with _lock:
+        entries = list(_idle)
+        _idle.clear()
+    for entry in entries:
+        entry.close()
+
+
+def stats() -> dict:
+    """풀 현황 (/health 용)"""
+    with _lock:
+        return {
+            'enabled': _enabled(),
+            'idle': len(_idle),
+            **_stats,
+            'profiles': {name: dict(counts) for name, counts in _profile_stats.items()},
+        }
@@ -2,13 +2,22 @@
 공통 유틸리티 함수들
 """
 import os
+import re
+import shutil
 import uuid
 import time
 import threading
 from ipaddress import ip_network, ip_address
+from urllib.parse import quote, urlsplit, urlunsplit, parse_qsl, urlencode
 
 fs_lock = threading.Lock()
 
+# 서명 URL 만료 시각(unix 초) 파라미터 — googlevideo expire=, CloudFront Expires= 등
+_EXPIRY_PARAMS = ('expire', 'expires', 'exp', 'x-expires')
+_EXPIRY_PATH = re.compile(r'/expire/(\d{9,11})(?:/|$)')
+# 같은 영상을 가리키는 URL 변형에서 제거할 추적/위치 파라미터
+_TRACKING_PARAMS = ('si', 'feature', 'pp', 't', 'start', 'fbclid', 'gclid', 'igshid', 'ref', 'share')
+
 
 def safe_path_join(*paths):
     """안전한 경로 결합"""
@@ -51,6 +60,12 @@ def check_ip_allowed(ip_str, allowed_ips):
         return False
 
 
+def attachment_disposition(filename):
+    """Content-Disposition: attachment 헤더 값 (ASCII fallback + UTF-8 인코딩 파일명)"""
+    ascii_filename = re.sub(r'[^\x00-\x7F]', '_', filename)
+    return f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{quote(filename)}"
+
+
 def readable_size(size_bytes):
     """파일 크기를 읽기 쉬운 형태로 변환"""
     if size_bytes < 1024:
@@ -61,3 +76,98 @@ def readable_size(size_bytes):
         return f"{size_bytes / (1024 * 1024):.1f} MB"
     else:
         return f"{size_bytes / (1024 * 1024 * 1024):.2f} GB"
+
+
+def _file_size(path, allocated=False):
+    if allocated:
+        return os.stat(path).st_blocks * 512
+    return os.path.getsize(path)
+
+
+def dir_size(path, allocated=False):
+    """디렉토리 내 파일 크기 합계 (하드링크도 각각 계산)
+
+    allocated=True면 실제 할당된 디스크 블록 기준 (sparse 파일의 빈 구간 제외)
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += _file_size(os.path.join(root, name), allocated)
+            except OSError:
+                pass
+    return total
+
+
+def evict_lru_entries(root, budget_bytes, allocated=False):
+    """root 하위 항목을 mtime(최근 접근) 오래된 순으로 삭제하여 예산 이하로 유지
+
+    '.'으로 시작하는 항목(작성 중 임시 디렉토리)은 건드리지 않는다.
+    allocated=True면 sparse 파일을 실제 할당 크기로 계산한다.
+    반환값: 삭제한 항목 수
+    """
+    if not os.path.isdir(root):
+        return 0
+
+    entries = []
+    for name in os.listdir(root):
+        if name.startswith('.'):
+            continue
+        path = os.path.join(root, name)
+        try:
+            mtime = os.path.getmtime(path)
+            size = dir_size(path, allocated) if os.path.isdir(path) else _file_size(path, allocated)
+        except OSError:
+            continue
+        entries.append((mtime, size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= budget_bytes:
+            break
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def url_expiry(url):
+    """서명 URL의 만료 시각(unix 초) — 만료 파라미터가 없으면 None"""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+
+    for key, value in parse_qsl(parts.query):
+        if key.lower() in _EXPIRY_PARAMS and value.isdigit() and 9 <= len(value) <= 11:
+            return int(value)
+
+    # googlevideo 일부 URL은 경로에 포함 (/expire/1700000000/)
+    m = _EXPIRY_PATH.search(parts.path)
+    return int(m.group(1)) if m else None
+
+
+def canonical_url(url):
+    """같은 영상 URL 변형을 하나로 — 호스트 소문자/www·m 제거, 추적 파라미터·fragment 제거, 쿼리 정렬"""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+
+    host = (parts.hostname or '').lower()
+    for prefix in ('www.', 'm.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    if host == 'youtu.be' and parts.path.strip('/'):
+        return f"https://youtube.com/watch?v={parts.path.strip('/')}"
+
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith('utm_'))
+    return urlunsplit(('https', host, parts.path.rstrip('/') or '/', urlencode(query), ''))
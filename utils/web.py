@@ -1,8 +1,15 @@
 """
-웹 관련 유틸리티 - IP 처리, 캐시 등
+웹 관련 유틸리티 - IP 처리, 캐시, 서버 파일 전송 등
 """
-from flask import request
-from config import CACHE_CONFIG
+import logging
+import os
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from flask import request, send_file, Response
+from config import CACHE_CONFIG, DOWNLOAD_FOLDER, FILE_OFFLOAD_MODE, FILE_OFFLOAD_ACCEL_PREFIX
+
+_SENDFILE_CHUNK = 1024 * 1024  # file_wrapper 미지원 서버에서 읽기 단위
 
 
 def get_client_ip():
@@ -34,3 +41,94 @@ def add_cache_headers(response):
         response.headers['Cache-Control'] = f'public, max-age={browser_ttl}, s-maxage={cdn_ttl}'
 
     return response
+
+
+def send_server_file(file_path, disposition, mimetype='video/mp4'):
+    """서버에 저장된 파일 전송 — FILE_OFFLOAD_MODE에 따라 프록시/커널에 전송을 넘김
+
+    x-accel / x-sendfile은 앞단 프록시가 Range를 처리하고, sendfile은 앱이 Range를 해석한 뒤
+    wsgi.file_wrapper로 넘겨 gunicorn이 os.sendfile로 보낸다. Content-Disposition은 모든 모드에서 유지.
+    """
+    response = None
+    if FILE_OFFLOAD_MODE == 'x-accel':
+        rel_path = os.path.relpath(os.path.abspath(file_path), os.path.abspath(DOWNLOAD_FOLDER))
+        if rel_path.startswith('..'):
+            logging.warning(f"X-Accel-Redirect 대상이 다운로드 폴더 밖이라 직접 전송: {file_path}")
+        else:
+            response = Response(mimetype=mimetype, direct_passthrough=True)
+            response.headers['X-Accel-Redirect'] = FILE_OFFLOAD_ACCEL_PREFIX + quote(rel_path.replace(os.sep, '/'))
+    elif FILE_OFFLOAD_MODE == 'x-sendfile':
+        response = Response(mimetype=mimetype, direct_passthrough=True)
+        # WSGI 헤더는 latin-1 — 비ASCII 경로는 UTF-8 바이트 그대로 전달
+        response.headers['X-Sendfile'] = os.path.abspath(file_path).encode('utf-8').decode('latin-1')
+    elif FILE_OFFLOAD_MODE == 'sendfile':
+        response = _sendfile_response(file_path, mimetype)
+
+    if response is None:
+        response = send_file(file_path, mimetype=mimetype, conditional=True)
+    response.headers['Content-Disposition'] = disposition
+    return response
+
+
+def _if_range_matches(etag, mtime):
+    """If-Range 조건 확인 — 파일이 바뀌었으면 Range를 무시하고 전체 전송"""
+    if_range = request.if_range
+    if if_range.etag:
+        return if_range.etag == etag
+    if if_range.date:
+        return int(if_range.date.timestamp()) == int(mtime)
+    return True
+
+
+def _iter_file(f, length):
+    try:
+        while length > 0:
+            chunk = f.read(min(_SENDFILE_CHUNK, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def _sendfile_response(file_path, mimetype):
+    """Range(단일 구간)를 직접 처리하는 파일 응답 — 본문은 wsgi.file_wrapper로 넘겨 zero-copy 전송"""
+    stat = os.stat(file_path)
+    size = stat.st_size
+    etag = f"{int(stat.st_mtime)}-{size}"
+
+    start, end, status = 0, size, 200
+    byte_range = request.range
+    if byte_range is not None and len(byte_range.ranges) == 1 and _if_range_matches(etag, stat.st_mtime):
+        span = byte_range.range_for_length(size)
+        if span is None:
+            response = Response(status=416)
+            response.headers['Content-Range'] = f"bytes */{size}"
+            response.headers['Accept-Ranges'] = 'bytes'
+            return response
+        start, end = span
+        status = 206
+    length = end - start
+
+    if request.method == 'HEAD':
+        body = []
+    else:
+        f = open(file_path, 'rb')
+        f.seek(start)
+        # gunicorn은 현재 파일 위치부터 Content-Length만큼 os.sendfile로 전송 (그 외 서버는 끝까지 보낼 때만 사용)
+        wrapper = request.environ.get('wsgi.file_wrapper')
+        server = request.environ.get('SERVER_SOFTWARE', '')
+        if wrapper is not None and (end == size or server.startswith('gunicorn')):
+            body = wrapper(f, _SENDFILE_CHUNK)
+        else:
+            body = _iter_file(f, length)
+
+    response = Response(body, status=status, mimetype=mimetype, direct_passthrough=True)
+    response.headers['Content-Length'] = str(length)
+    response.headers['Accept-Ranges'] = 'bytes'
+    if status == 206:
+        response.headers['Content-Range'] = f"bytes {start}-{end - 1}/{size}"
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+    return response
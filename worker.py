@@ -0,0 +1,72 @@
+"""
+다운로드 워커 프로세스 — 전역 작업 대기열(JOB_QUEUE_MODE=redis)의 작업 실행
+
+웹(gunicorn)과 분리되어 프로세스/호스트 단위로 늘릴 수 있다.
+프로세스당 추출 스레드 MAX_WORKERS개, 서버 다운로드 스레드 SERVER_DOWNLOAD_WORKERS개.
+DOWNLOAD_FOLDER는 웹 프로세스와 같은 디스크(볼륨)를 바라봐야 한다.
+
+실행: python worker.py
+"""
+import logging
+import signal
+import threading
+import time
+
+from config import MAX_WORKERS, SERVER_DOWNLOAD_WORKERS, REDIS_URL
+from infrastructure import redis_client, http_pool
+from services import job_queue
+
+logging.basicConfig(
+    filename='logs/worker.log',
+    level=logging.ERROR,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+_stop = threading.Event()
+
+
+def _lane_loop(lane: str):
+    """종료 신호 전까지 작업 대기/실행 — 실행 중 작업은 끝까지 수행"""
+    while not _stop.is_set():
+        if not redis_client.is_available() and not redis_client.check_health():
+            _stop.wait(5)
+            continue
+        try:
+            job_queue.run_next(lane)
+        except Exception as e:
+            logging.error(f"워커 작업 처리 오류 ({lane}): {e}", exc_info=True)
+            redis_client.mark_unavailable()
+            _stop.wait(1)
+
+
+def _handle_signal(signum, frame):
+    logging.warning(f"종료 신호 수신({signum}): 진행 중 작업 완료 후 종료")
+    _stop.set()
+
+
+def main():
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    redis_ok = redis_client.check_health()
+    logging.info(f"Redis 상태: {'연결됨' if redis_ok else '미연결'} ({REDIS_URL})")
+
+    threads = []
+    for lane, count in (('extract', MAX_WORKERS), ('server', SERVER_DOWNLOAD_WORKERS)):
+        for i in range(max(1, count)):
+            t = threading.Thread(target=_lane_loop, args=(lane,), name=f"worker-{lane}-{i}")
+            t.start()
+            threads.append(t)
+    logging.info(f"다운로드 워커 시작: 추출 {MAX_WORKERS}, 서버 다운로드 {SERVER_DOWNLOAD_WORKERS}")
+
+    # 메인 스레드는 신호 대기
+    while not _stop.is_set():
+        time.sleep(1)
+    for t in threads:
+        t.join()
+    http_pool.close_all()
+    logging.info("다운로드 워커 종료")
+
+
+if __name__ == '__main__':
+    main()